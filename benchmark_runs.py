@@ -0,0 +1,553 @@
+"""
+Benchmark harness for timing the main stages of the monitoring against
+synthetic run data, in the same vein as simulate_test_runs.py but with
+configurable data volumes and mocked Jira / DNAnexus backends with
+injectable latency.
+
+The following stages are timed end to end:
+
+    - get_runs : listing of run directories and dx-streaming-upload logs
+    - get_size : sizing of every generated run directory
+    - check_for_deletion : full checking of runs (simulated as a Monday)
+    - delete_runs : deletion of flagged runs (simulated as a Wednesday)
+
+By default Jira and DNAnexus calls are replaced with mocks that sleep for
+the given latency. With `--backend http` the real Jira and dxpy clients
+are used against the local fake servers in test/fake_servers.py, which
+additionally support injecting server errors and rate limiting.
+
+Results are written as JSON and may optionally be compared against a
+stored baseline results file, exiting non-zero if any stage is slower
+than the baseline by more than the given tolerance.
+
+Example usage:
+
+    python benchmark_runs.py --sequencers 4 --runs 50 --files 200 \\
+        --depth 3 --jira-latency 0.05 --dx-latency 0.1 \\
+        --output bench.json --baseline bench_baseline.json
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+from time import perf_counter, sleep
+from unittest.mock import Mock, patch
+
+from dateutil.relativedelta import relativedelta
+
+import monitor
+from bin import util
+from bin.jira import Jira
+from test.fake_servers import FakeDNAnexusServer, FakeJiraServer, populate
+
+
+# in the same way as simulate_test_runs.py, 04/03/2024 was a Monday
+# and 06/03/2024 was the following Wednesday
+MONDAY = datetime(2024, 3, 4)
+WEDNESDAY = datetime(2024, 3, 6)
+
+STAGES = ["get_runs", "get_size", "check_for_deletion", "delete_runs"]
+
+# fake servers started for the current benchmark repeat
+FAKE_SERVERS = []
+
+
+class SetUp:
+    """
+    Generate synthetic run directories and dx-streaming-upload logs
+
+    Parameters
+    ----------
+    root : str
+        directory to generate the test data in
+    n_seqs : int
+        number of sequencer directories to create
+    n_runs : int
+        number of runs to create per sequencer
+    n_files : int
+        number of files to create per run
+    depth : int
+        depth of nested sub directories files are spread across
+    file_size : int
+        size of each file in bytes (created as sparse files)
+    ansible_week : int
+        number of weeks at which runs are old enough to delete, half
+        of the runs are created older than this
+    """
+
+    def __init__(
+        self, root, n_seqs, n_runs, n_files, depth, file_size, ansible_week
+    ):
+        self.root = root
+        self.genetics_dir = os.path.join(root, "genetics")
+        self.logs_dir = os.path.join(root, "logs")
+        self.seqs = [f"seq{x}" for x in range(1, n_seqs + 1)]
+        self.n_runs = n_runs
+        self.n_files = n_files
+        self.depth = depth
+        self.file_size = file_size
+        self.ansible_week = ansible_week
+        self.runs = []
+
+        self.test_run_directories()
+        self.test_logs()
+
+    def test_run_directories(self) -> None:
+        """
+        Create the run directories, alternating runs are set to be
+        either old enough or not old enough to delete
+        """
+        for seq in self.seqs:
+            for idx in range(self.n_runs):
+                run = f"240101_{seq}_{idx:04}_BENCHMARK"
+                run_path = os.path.join(self.genetics_dir, seq, run)
+
+                for file_idx in range(self.n_files):
+                    # spread files over nested directories up to depth
+                    sub_dirs = [
+                        f"L{(file_idx + level) % 4:03}"
+                        for level in range(file_idx % (self.depth + 1))
+                    ]
+                    file_dir = os.path.join(run_path, *sub_dirs)
+                    os.makedirs(file_dir, exist_ok=True)
+
+                    with open(f"{file_dir}/file_{file_idx}.bcl", "wb") as f:
+                        f.truncate(self.file_size)
+
+                os.makedirs(run_path, exist_ok=True)
+
+                if idx % 2:
+                    weeks = self.ansible_week + 1 + idx % 5
+                else:
+                    weeks = 0
+
+                age = (MONDAY + relativedelta(weeks=-weeks, days=-1))
+                os.utime(run_path, (age.timestamp(), age.timestamp()))
+
+                self.runs.append((seq, run))
+
+    def test_logs(self) -> None:
+        """
+        Create a dx-streaming-upload log for each run
+        """
+        for seq, run in self.runs:
+            os.makedirs(os.path.join(self.logs_dir, seq), exist_ok=True)
+            log_file = os.path.join(
+                self.logs_dir, seq, f"run.{run}.lane.all.log"
+            )
+            open(log_file, "w").close()
+
+            # logs are last written when the upload finished, so are set
+            # to the same age as their run
+            age = os.path.getmtime(os.path.join(self.genetics_dir, seq, run))
+            os.utime(log_file, (age, age))
+
+
+class MockJira:
+    """
+    Stand in for bin.jira.Jira returning released tickets for every
+    run after the given latency
+
+    Parameters
+    ----------
+    latency : float
+        seconds to sleep for on each request
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def get_issue_detail(self, run, server):
+        self.calls += 1
+        sleep(self.latency)
+
+        return "MYE", "All samples released", f"EBH-{self.calls}"
+
+    def get_issue_statuses(self, keys):
+        self.calls += 1
+        sleep(self.latency)
+
+        return {key: "All samples released" for key in keys}
+
+    def create_issue(self, **kwargs):
+        self.calls += 1
+        sleep(self.latency)
+
+        return {"id": "10000", "key": "EBH-0"}
+
+
+def start_mocks(dx_latency, today, output_dir, mock_dx=True) -> None:
+    """
+    Patch over DNAnexus, Slack and datetime calls made from monitor
+
+    Parameters
+    ----------
+    dx_latency : float
+        seconds to sleep for on each DNAnexus request
+    today : datetime
+        datetime to simulate running on
+    output_dir : str
+        directory to write monitoring outputs to
+    mock_dx : bool
+        if to mock the DNAnexus calls, set to False when running
+        against the fake DNAnexus server
+    """
+
+    def uploaded(run):
+        sleep(dx_latency)
+        return True
+
+    def describe(run):
+        sleep(dx_latency)
+        return {"describe": {"id": "project-xxx"}}
+
+    def manifest(run):
+        sleep(dx_latency)
+        return {"files": 1, "bytes": 1024**5, "open": 0}
+
+    if mock_dx:
+        patch("monitor.check_run_uploaded", side_effect=uploaded).start()
+        patch("monitor.get_describe_data", side_effect=describe).start()
+        patch("monitor.get_upload_manifest", side_effect=manifest).start()
+
+    patch("monitor.post_message_to_slack").start()
+    patch("monitor.post_simple_message_to_slack").start()
+    patch("monitor.get_monitoring_dir", return_value=output_dir).start()
+    patch("monitor.datetime", Mock(today=lambda: today)).start()
+
+
+def start_fake_servers(args, runs) -> Jira:
+    """
+    Start the fake Jira and DNAnexus servers populated with the given
+    runs, and point dxpy at the fake DNAnexus server
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed command line arguments
+    runs : list
+        list of run IDs to populate the servers with
+
+    Returns
+    -------
+    Jira
+        Jira object using the fake Jira server
+    """
+    jira_server = FakeJiraServer(
+        latency=args.jira_latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=1,
+    ).start()
+    dx_server = FakeDNAnexusServer(
+        latency=args.dx_latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=1,
+    ).start()
+
+    FAKE_SERVERS.extend([jira_server, dx_server])
+
+    populate(
+        jira_server,
+        dx_server,
+        runs,
+        project="EBHD",
+        seed=1,
+        run_size=args.files * args.file_size,
+    )
+    dx_server.configure_dxpy()
+
+    return Jira(
+        token="token", email="email", api_url=jira_server.api_url, debug=True
+    )
+
+
+def time_stage(func, **kwargs) -> float:
+    """
+    Time a single call of the given function
+
+    Returns
+    -------
+    float
+        elapsed wall time in seconds
+
+    Raises
+    ------
+    RuntimeError
+        Raised if the stage exits (i.e. nothing to delete), as the
+        timing would not be of the full stage
+    """
+    start = perf_counter()
+
+    try:
+        func(**kwargs)
+    except SystemExit as err:
+        raise RuntimeError(
+            f"{func.__name__} exited early ({err.code}), check the "
+            "benchmark runs are valid for deletion"
+        )
+
+    return perf_counter() - start
+
+
+def run_benchmark(args) -> dict:
+    """
+    Generate the test data and time each stage, repeated the given
+    number of times with fresh data and keeping the fastest time
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed command line arguments
+
+    Returns
+    -------
+    dict
+        mapping of stage name to fastest time in seconds
+    """
+    timings = {stage: [] for stage in STAGES}
+
+    for repeat in range(1, args.repeats + 1):
+        print(f"Starting benchmark repeat {repeat} of {args.repeats}")
+
+        if os.path.exists(args.workdir):
+            shutil.rmtree(args.workdir)
+
+        data = SetUp(
+            root=args.workdir,
+            n_seqs=args.sequencers,
+            n_runs=args.runs,
+            n_files=args.files,
+            depth=args.depth,
+            file_size=args.file_size,
+            ansible_week=args.ansible_week,
+        )
+        pickle_file = os.path.join(args.workdir, "ansible_dict.pickle")
+        mock_dx = args.backend == "mock"
+
+        if mock_dx:
+            jira = MockJira(latency=args.jira_latency)
+        else:
+            jira = start_fake_servers(args, [run for _, run in data.runs])
+
+        timings["get_runs"].append(
+            time_stage(
+                util.get_runs,
+                seqs=data.seqs,
+                genetic_dir=data.genetics_dir,
+                log_path=data.logs_dir,
+            )
+        )
+
+        start = perf_counter()
+        for seq, run in data.runs:
+            util.get_size(os.path.join(data.genetics_dir, seq, run))
+        timings["get_size"].append(perf_counter() - start)
+
+        try:
+            start_mocks(args.dx_latency, MONDAY, args.workdir, mock_dx)
+            timings["check_for_deletion"].append(
+                time_stage(
+                    monitor.check_for_deletion,
+                    # the set up data has the same attributes as a root
+                    roots=[data],
+                    server_testing=False,
+                    slack_token="",
+                    pickle_file=pickle_file,
+                    debug=True,
+                    jira_assay=["MYE"],
+                    jira_url="",
+                    jira=jira,
+                )
+            )
+            patch.stopall()
+
+            start_mocks(args.dx_latency, WEDNESDAY, args.workdir, mock_dx)
+            timings["delete_runs"].append(
+                time_stage(
+                    monitor.delete_runs,
+                    pickle_file=pickle_file,
+                    genetics_dirs=[data.genetics_dir],
+                    jira_project_id="",
+                    jira_reporter_id="",
+                    slack_token="",
+                    server_testing=False,
+                    debug=True,
+                    jira=jira,
+                )
+            )
+        finally:
+            patch.stopall()
+
+            for server in FAKE_SERVERS:
+                server.stop()
+            FAKE_SERVERS.clear()
+
+    if not args.keep_data:
+        shutil.rmtree(args.workdir)
+
+    return {stage: round(min(times), 6) for stage, times in timings.items()}
+
+
+def compare_to_baseline(timings, baseline_file, tolerance) -> list:
+    """
+    Compare stage timings against those stored in the baseline file
+
+    Parameters
+    ----------
+    timings : dict
+        mapping of stage name to time in seconds
+    baseline_file : str
+        path to baseline JSON results file
+    tolerance : float
+        allowed fractional slowdown before flagging a regression
+
+    Returns
+    -------
+    list
+        list of regression messages, empty if none found
+    """
+    with open(baseline_file) as f:
+        baseline = json.load(f)["timings"]
+
+    regressions = []
+
+    for stage, seconds in timings.items():
+        if not baseline.get(stage):
+            print(f"{stage}: no baseline timing to compare against")
+            continue
+
+        ratio = seconds / baseline[stage]
+        print(
+            f"{stage}: {seconds:.4f}s vs baseline {baseline[stage]:.4f}s "
+            f"({ratio:.2f}x)"
+        )
+
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{stage} {ratio:.2f}x slower than baseline "
+                f"({seconds:.4f}s vs {baseline[stage]:.4f}s)"
+            )
+
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark monitoring stages against synthetic runs"
+    )
+    parser.add_argument("--sequencers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=20, help="per sequencer")
+    parser.add_argument("--files", type=int, default=100, help="per run")
+    parser.add_argument(
+        "--depth", type=int, default=3, help="max sub directory depth"
+    )
+    parser.add_argument(
+        "--file-size", type=int, default=1024 * 1024, help="bytes per file"
+    )
+    parser.add_argument("--ansible-week", type=int, default=2)
+    parser.add_argument(
+        "--jira-latency", type=float, default=0.0, help="seconds per request"
+    )
+    parser.add_argument(
+        "--dx-latency", type=float, default=0.0, help="seconds per request"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["mock", "http"],
+        default="mock",
+        help=(
+            "mock Jira / DNAnexus calls, or use the real clients against "
+            "local fake HTTP servers"
+        ),
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of fake server requests to fail (http backend only)",
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="fraction of fake server requests to rate limit (http only)",
+    )
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--workdir", default="benchmark_test")
+    parser.add_argument(
+        "--keep-data",
+        action="store_true",
+        help="don't delete the generated test data after running",
+    )
+    parser.add_argument(
+        "--output", default="benchmark_results.json", help="results file"
+    )
+    parser.add_argument(
+        "--baseline", help="baseline results file to compare against"
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="write the results to the --baseline file instead of comparing",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed fractional slowdown against the baseline",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    timings = run_benchmark(args)
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            k: v
+            for k, v in vars(args).items()
+            if k not in ["output", "baseline", "save_baseline", "keep_data"]
+        },
+        "timings": timings,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"Benchmark results written to {args.output}")
+    print(json.dumps(timings, indent=2))
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+        print(f"Baseline written to {args.baseline}")
+
+    elif args.baseline:
+        regressions = compare_to_baseline(
+            timings, args.baseline, args.tolerance
+        )
+
+        if regressions:
+            print("\nPerformance regressions detected:")
+            for regression in regressions:
+                print(f"\t{regression}")
+
+            sys.exit(1)
+
+        print("\nNo performance regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
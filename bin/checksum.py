@@ -0,0 +1,218 @@
+"""
+Checksum verification of run files against the MD5s DNAnexus records
+for each uploaded file, used for runs of the assays the deletion policy
+requires it for (checksum_assays) before they are deleted.
+
+DNAnexus records the MD5 of each part a file was uploaded in, so local
+files are hashed in the same parts. Files are streamed through a thread
+pool in large reads, with the total read rate capped so that hashing
+doesn't saturate /genetics I/O whilst the sequencers are writing to it.
+Hashes are cached by path, size and mtime and the cache written as
+hashing progresses, so an interrupted verification resumes from the
+files already hashed.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import threading
+from time import monotonic, sleep
+
+from .helper import get_logger
+
+log = get_logger("checksum log")
+
+CHECKSUM_CACHE = "ansible_checksums.json"
+
+# files hashed concurrently
+CHECKSUM_WORKERS = 4
+
+# bytes read from a file at a time
+READ_SIZE = 8 * 1024**2
+
+# seconds between writing the cache whilst hashing
+SAVE_INTERVAL = 60
+
+
+class RateLimiter:
+    """
+    Cap on the total bytes read per second across threads
+
+    Parameters
+    ----------
+    rate : int
+        maximum bytes per second, None for no cap
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.lock = threading.Lock()
+        # time the bytes read so far were allowed from, a second before
+        # the first read to allow the same burst as after being idle
+        self.start = monotonic() - 1
+        self.total = 0
+
+    def consume(self, n_bytes) -> None:
+        """
+        Account for bytes read, sleeping until they are within the rate
+        """
+        if not self.rate:
+            return
+
+        with self.lock:
+            now = monotonic()
+            # don't bank time spent idle, allowing at most a second's
+            # worth of reads in a burst
+            self.start = max(self.start, now - self.total / self.rate - 1)
+            self.total += n_bytes
+            wait = self.start + self.total / self.rate - now
+
+        if wait > 0:
+            sleep(wait)
+
+
+class ChecksumEngine:
+    """
+    Hashes files in parts, reusing cached hashes of unchanged files
+
+    Parameters
+    ----------
+    path : str
+        JSON file to cache hashes in, None to only cache in memory
+    rate : int
+        (optional) maximum bytes read per second across all files
+    workers : int
+        number of files hashed concurrently
+    """
+
+    def __init__(self, path=None, rate=None, workers=CHECKSUM_WORKERS):
+        self.path = path
+        self.limiter = RateLimiter(rate)
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.entries = {}
+        self.last_save = monotonic()
+
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as err:
+                log.warning(f"Unable to read checksum cache: {err}")
+
+    def hash_parts(self, path, part_sizes) -> list:
+        """
+        Get the MD5 of each consecutive part of a file
+
+        Parameters
+        ----------
+        path : str
+            file to hash
+        part_sizes : list
+            size of each part in bytes, the last part runs to the end
+            of the file
+
+        Returns
+        -------
+        list
+            hex MD5 of each part
+        """
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime, list(part_sizes)]
+
+        with self.lock:
+            entry = self.entries.get(path)
+
+        if entry and entry[:3] == key:
+            return entry[3]
+
+        md5s = []
+        buffer = memoryview(bytearray(READ_SIZE))
+
+        with open(path, "rb", buffering=0) as f:
+            for idx, part_size in enumerate(part_sizes):
+                md5 = hashlib.md5()
+                last = idx == len(part_sizes) - 1
+                remaining = part_size
+
+                while last or remaining > 0:
+                    size = READ_SIZE if last else min(READ_SIZE, remaining)
+                    n_bytes = f.readinto(buffer[:size])
+
+                    if not n_bytes:
+                        break
+
+                    md5.update(buffer[:n_bytes])
+                    remaining -= n_bytes
+                    self.limiter.consume(n_bytes)
+
+                md5s.append(md5.hexdigest())
+
+        with self.lock:
+            self.entries[path] = [*key, md5s]
+            save = monotonic() - self.last_save > SAVE_INTERVAL
+
+        if save:
+            self.save()
+
+        return md5s
+
+    def verify(self, files) -> list:
+        """
+        Hash files in parallel and compare them against their expected
+        part MD5s
+
+        Parameters
+        ----------
+        files : dict
+            mapping of path to list of (size, MD5) of each part
+
+        Returns
+        -------
+        list
+            paths of files not matching their expected MD5s
+        """
+
+        def check(path):
+            parts = files[path]
+            md5s = self.hash_parts(path, [x[0] for x in parts])
+
+            return md5s != [x[1] for x in parts]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            mismatched = [
+                path
+                for path, differs in zip(files, executor.map(check, files))
+                if differs
+            ]
+
+        self.save()
+
+        return mismatched
+
+    def save(self) -> None:
+        """
+        Write the cache to its file, dropping files no longer present
+        (i.e. from deleted runs)
+        """
+        with self.lock:
+            self.last_save = monotonic()
+
+            if not self.path:
+                return
+
+            entries = dict(self.entries)
+
+        entries = {
+            path: entry
+            for path, entry in entries.items()
+            if os.path.exists(path)
+        }
+
+        try:
+            with self.save_lock, open(self.path, "w") as f:
+                json.dump(entries, f)
+        except OSError as err:
+            log.warning(f"Unable to write checksum cache: {err}")
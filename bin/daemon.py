@@ -0,0 +1,236 @@
+"""
+Long running daemon mode, keeps the process resident and runs the
+monitoring cycle on an internal daily schedule instead of being started
+by cron. A local HTTP endpoint reports health and status:
+
+    - GET /health : liveness and outcome of the last cycle
+    - GET /status : as above plus history of recent cycles
+"""
+
+from collections import deque
+from datetime import datetime, timedelta
+import gc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import resource
+import signal
+import threading
+from time import perf_counter
+
+from .helper import get_logger
+
+log = get_logger("daemon log")
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    """
+    Request handler for the health / status endpoint
+    """
+
+    def do_GET(self):
+        if self.path == "/health":
+            payload = self.server.monitor_daemon.health()
+        elif self.path == "/status":
+            payload = self.server.monitor_daemon.status()
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(payload, default=str).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # don't log every health check request
+        pass
+
+
+class Daemon:
+    """
+    Runs the given cycle function once a day at the given time and
+    serves the health / status endpoint
+
+    Parameters
+    ----------
+    cycle : callable
+        function to run each cycle, called without arguments
+    run_time : str
+        time of day to run the cycle at in HH:MM format
+    port : int
+        port to serve the health / status endpoint on, None to disable
+        and 0 to use any free port
+    host : str
+        address to serve the health / status endpoint on
+    history : int
+        number of previous cycle results to keep
+    """
+
+    def __init__(
+        self,
+        cycle,
+        run_time="06:00",
+        port=8080,
+        host="127.0.0.1",
+        history=30,
+    ):
+        self.cycle = cycle
+        self.run_time = datetime.strptime(run_time, "%H:%M").time()
+        self.port = port
+        self.host = host
+        self.started = datetime.now()
+        self.next_run = None
+        self.running = False
+        # bounded so a long lived daemon doesn't grow without limit
+        self.history = deque(maxlen=history)
+        self.stop_event = threading.Event()
+        self.httpd = None
+
+    def get_next_run(self, now: datetime) -> datetime:
+        """
+        Get the next datetime to run the cycle at
+
+        Parameters
+        ----------
+        now : datetime
+            current datetime
+
+        Returns
+        -------
+        datetime
+            next datetime after now at the scheduled run time
+        """
+        next_run = datetime.combine(now.date(), self.run_time)
+
+        if next_run <= now:
+            next_run += timedelta(days=1)
+
+        return next_run
+
+    def run_cycle(self) -> None:
+        """
+        Run a single cycle, recording the outcome. Errors and exits
+        (i.e. from sys.exit() in delete_runs()) are caught so that the
+        daemon stays up for the next cycle
+        """
+        log.info("Starting scheduled monitoring cycle")
+
+        self.running = True
+        started = datetime.now()
+        start = perf_counter()
+        error = None
+
+        try:
+            self.cycle()
+        except SystemExit as exit_err:
+            if exit_err.code not in [0, None]:
+                error = f"exited: {exit_err.code}"
+        except Exception as err:
+            log.exception("Error during monitoring cycle")
+            error = f"{type(err).__name__}: {err}"
+        finally:
+            self.running = False
+
+        self.history.append(
+            {
+                "started": started.isoformat(),
+                "seconds": round(perf_counter() - start, 2),
+                "status": "error" if error else "ok",
+                "error": error,
+            }
+        )
+
+        # release anything left over from the cycle before sleeping
+        gc.collect()
+
+        log.info(
+            f"Monitoring cycle finished ({self.history[-1]['status']}) "
+            f"in {self.history[-1]['seconds']}s"
+        )
+
+    def health(self) -> dict:
+        """
+        Summary of the daemon state for the /health endpoint
+        """
+        last = self.history[-1] if self.history else None
+
+        return {
+            "status": "ok",
+            "started": self.started.isoformat(),
+            "running": self.running,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "last_run": last,
+            # ru_maxrss is in KB on Linux
+            "max_rss_mb": round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+            ),
+        }
+
+    def status(self) -> dict:
+        """
+        Daemon state and history of recent cycles for /status
+        """
+        return {**self.health(), "history": list(self.history)}
+
+    def start_server(self) -> None:
+        """
+        Start serving the health / status endpoint in a background thread
+        """
+        if self.port is None:
+            return
+
+        self.httpd = ThreadingHTTPServer(
+            (self.host, self.port), _StatusHandler
+        )
+        self.httpd.daemon_threads = True
+        self.httpd.monitor_daemon = self
+
+        threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        ).start()
+
+        self.port = self.httpd.server_address[1]
+
+        log.info(f"Serving health endpoint on {self.host}:{self.port}")
+
+    def stop(self, *args) -> None:
+        """
+        Stop the daemon, used as the handler for SIGTERM / SIGINT
+        """
+        log.info("Stopping daemon")
+        self.stop_event.set()
+
+    def run_forever(self, run_now=False) -> None:
+        """
+        Run the cycle on schedule until stopped
+
+        Parameters
+        ----------
+        run_now : bool
+            if to run a cycle immediately on starting
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.start_server()
+
+        if run_now:
+            self.run_cycle()
+
+        while not self.stop_event.is_set():
+            self.next_run = self.get_next_run(datetime.now())
+            wait = (self.next_run - datetime.now()).total_seconds()
+
+            log.info(f"Next monitoring cycle scheduled for {self.next_run}")
+
+            if self.stop_event.wait(max(wait, 0)):
+                break
+
+            self.run_cycle()
+
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
@@ -0,0 +1,140 @@
+"""
+Append only JSON lines log of the decision made for each run on every
+invocation, for auditing and analysing reclaim rates and ticket latency
+over time without parsing the free text logs.
+
+Each line is a single JSON object with the invocation ID, stage (check
+or delete), run ID, the evidence the decision was made from, the
+decision, reason, size and timings. The file is rotated at midnight and
+rotated files are compressed with gzip.
+"""
+
+from datetime import datetime
+import gzip
+import json
+import logging
+from logging.handlers import TimedRotatingFileHandler
+import os
+import shutil
+import uuid
+
+DECISION_LOG = "ansible_decisions.jsonl"
+
+
+def compress_rotated(source, dest) -> None:
+    """
+    Rotator for the decision log, compresses the rotated file with gzip
+    """
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+
+    os.remove(source)
+
+
+class DecisionLog:
+    """
+    Writer for the JSON lines decision log
+
+    Parameters
+    ----------
+    path : str
+        file to write to
+    backup_count : int
+        number of rotated files to keep, 0 to keep all
+    """
+
+    def __init__(self, path, backup_count=0):
+        self.path = path
+        self.invocation = uuid.uuid4().hex
+
+        # delay opening so that nothing is created if no runs are checked
+        self.handler = TimedRotatingFileHandler(
+            path, when="midnight", backupCount=backup_count, delay=True
+        )
+        self.handler.namer = lambda name: f"{name}.gz"
+        self.handler.rotator = compress_rotated
+
+    def record(self, stage, run, decision, reason, **fields) -> dict:
+        """
+        Append a record for a single run
+
+        Parameters
+        ----------
+        stage : str
+            stage the decision was made in, i.e. check or delete
+        run : str
+            run ID
+        decision : str
+            decision made for the run
+        reason : str
+            reason for the decision
+        **fields
+            any other details to record, i.e. evidence, size and timings
+
+        Returns
+        -------
+        dict
+            record written
+        """
+        entry = {
+            "time": datetime.now().isoformat(),
+            "invocation": self.invocation,
+            "stage": stage,
+            "run": run,
+            "decision": decision,
+            "reason": reason,
+            **fields,
+        }
+
+        self.handler.handle(
+            logging.makeLogRecord({"msg": json.dumps(entry, default=str)})
+        )
+
+        return entry
+
+    def close(self) -> None:
+        self.handler.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_decisions(path) -> list:
+    """
+    Read all records from a decision log, including any rotated and
+    compressed files next to it, oldest first
+
+    Parameters
+    ----------
+    path : str
+        path to the current decision log
+
+    Returns
+    -------
+    list
+        list of decision records
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+
+    # rotated files are named <name>.<YYYY-mm-dd>.gz, so sort by date
+    files = sorted(
+        os.path.join(directory, x)
+        for x in os.listdir(directory)
+        if x.startswith(f"{name}.") and x.endswith(".gz")
+    )
+
+    if os.path.exists(path):
+        files.append(path)
+
+    records = []
+
+    for file in files:
+        opener = gzip.open if file.endswith(".gz") else open
+
+        with opener(file, "rt") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+
+    return records
@@ -0,0 +1,92 @@
+"""
+Lazily gathered evidence for the decision made on a single run.
+
+Each check (Jira lookup, StagingArea52 upload check, 002 project
+describe, sizing and upload manifest verification) is only made the
+first time one of its fields is used, so runs decided early (i.e. too
+young to delete, or skipped by a policy rule) never make the slower
+checks they don't need. The time taken by each check made is kept for
+the decision log.
+"""
+
+from time import perf_counter
+
+# field -> check giving it and index into the check's result, for
+# checks giving more than one field
+FIELDS = {
+    "assay": ("jira", 0),
+    "status": ("jira", 1),
+    "key": ("jira", 2),
+    "uploaded": ("uploaded", None),
+    "project": ("project", None),
+    "size": ("size", 0),
+    "size_error": ("size", 1),
+    "manifest": ("manifest", None),
+    "checksums": ("checksums", None),
+}
+
+
+class RunEvidence:
+    """
+    Evidence for a single run, fetched on first use
+
+    Parameters
+    ----------
+    checks : dict
+        mapping of check name (jira, uploaded, project, size and
+        manifest) to a callable taking no arguments making the check,
+        the jira check returns the assay, status and key as from
+        get_issue_detail() and the size check the size and its error
+        bound (None if exact). Checks may be added or replaced later
+        with refine()
+    """
+
+    def __init__(self, checks):
+        self.checks = checks
+        self.results = {}
+        self.timings = {}
+
+    def check(self, name):
+        """
+        Make the given check if not already made, and return its result
+        """
+        if name not in self.results:
+            start = perf_counter()
+            self.results[name] = self.checks[name]()
+            self.timings[name] = perf_counter() - start
+
+        return self.results[name]
+
+    def __getitem__(self, field):
+        name, idx = FIELDS[field]
+        result = self.check(name)
+
+        return result if idx is None else result[idx]
+
+    def get(self, field, default=None):
+        """
+        Get a field only if its check has already been made, without
+        making the check
+        """
+        name, _ = FIELDS[field]
+
+        if name not in self.results:
+            return default
+
+        return self[field]
+
+    def refine(self, name, check) -> None:
+        """
+        Replace a check with a more exact one (i.e. exactly sizing a run
+        in place of estimating it) or add a check only made for some
+        runs, made the next time it is used
+        """
+        self.checks[name] = check
+        self.results.pop(name, None)
+
+    def collect(self) -> None:
+        """
+        Make every check not already made, i.e. for full reporting
+        """
+        for name in self.checks:
+            self.check(name)
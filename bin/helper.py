@@ -4,10 +4,17 @@ Script can be imported and will generate log file in
 directory defined below
 """
 
+import atexit
+import json
 import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    TimedRotatingFileHandler,
+)
 import os
 from pathlib import Path
+import queue
 import sys
 
 
@@ -29,24 +36,167 @@ else:
     Path(LOG_FILE).touch(exist_ok=True)
 
 
-def get_console_handler():
+def get_monitoring_dir() -> str:
+    """
+    Get the directory to write monitoring outputs to, this will be
+    /log/monitoring if running in the Docker container and the current
+    working directory otherwise
+    """
+    if os.path.exists("/log/monitoring"):
+        return "/log/monitoring"
+
+    return os.getcwd()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatter writing each record as a single line of JSON, for
+    ingestion of the log file by log aggregation tools
+    """
+
+    def format(self, record) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "module": record.module,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, default=str)
+
+
+# handlers shared between all loggers from get_logger(), these are only
+# created once so that fetching a logger again doesn't duplicate output
+# or open another file descriptor
+_HANDLERS = []
+_LISTENER = None
+_LOGGERS = set()
+
+
+def get_formatter(log_format=None) -> logging.Formatter:
+    """
+    Get the formatter for the given format, defaults to the value of
+    ANSIBLE_LOG_FORMAT (text or json)
+    """
+    log_format = log_format or os.environ.get("ANSIBLE_LOG_FORMAT", "text")
+
+    if log_format.lower() == "json":
+        return JsonFormatter()
+
+    return FORMATTER
+
+
+def get_console_handler(formatter=FORMATTER):
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(FORMATTER)
+    console_handler.setFormatter(formatter)
     return console_handler
 
 
-def get_file_handler():
+def get_file_handler(formatter=FORMATTER):
     file_handler = TimedRotatingFileHandler(LOG_FILE, when="midnight")
-    file_handler.setFormatter(FORMATTER)
+    file_handler.setFormatter(formatter)
     return file_handler
 
 
+def stop_logging() -> None:
+    """
+    Stop the queue listener (if any) and close the shared handlers,
+    registered to run on exit to flush any queued records
+    """
+    global _LISTENER
+
+    if _LISTENER:
+        _LISTENER.stop()
+        _LISTENER = None
+
+    for logger_name in _LOGGERS:
+        logger = logging.getLogger(logger_name)
+
+        for handler in _HANDLERS:
+            logger.removeHandler(handler)
+
+    for handler in _HANDLERS:
+        handler.close()
+
+    _HANDLERS.clear()
+
+
+def configure_logging(log_format=None, use_queue=None) -> list:
+    """
+    Create the handlers shared by all loggers, replacing any previously
+    configured ones
+
+    Parameters
+    ----------
+    log_format : str
+        format to write logs in, text or json. Defaults to the value of
+        ANSIBLE_LOG_FORMAT
+    use_queue : bool
+        if to write through a QueueHandler with the console and file
+        handlers run by a QueueListener in a background thread, moving
+        file I/O off the calling thread. Defaults to if ANSIBLE_LOG_QUEUE
+        is set
+
+    Returns
+    -------
+    list
+        handlers to add to each logger
+    """
+    global _LISTENER
+
+    stop_logging()
+
+    if use_queue is None:
+        use_queue = os.environ.get("ANSIBLE_LOG_QUEUE", "").lower() in [
+            "1",
+            "true",
+        ]
+
+    formatter = get_formatter(log_format)
+    handlers = [get_console_handler(formatter), get_file_handler(formatter)]
+
+    if use_queue:
+        log_queue = queue.SimpleQueue()
+        _LISTENER = QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        _LISTENER.start()
+
+        handlers = [QueueHandler(log_queue)]
+
+    _HANDLERS.extend(handlers)
+
+    for logger_name in _LOGGERS:
+        logger = logging.getLogger(logger_name)
+
+        for handler in _HANDLERS:
+            logger.addHandler(handler)
+
+    return _HANDLERS
+
+
 def get_logger(logger_name):
+    if not _HANDLERS:
+        configure_logging()
+
     logger = logging.getLogger(logger_name)
     logger.setLevel(logging.DEBUG)
-    logger.addHandler(get_console_handler())
-    logger.addHandler(get_file_handler())
+
+    # addHandler() ignores handlers already added, so fetching the same
+    # logger again doesn't duplicate its output
+    for handler in _HANDLERS:
+        logger.addHandler(handler)
 
     logger.propagate = False
+    _LOGGERS.add(logger_name)
 
     return logger
+
+
+atexit.register(stop_logging)
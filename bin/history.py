@@ -0,0 +1,281 @@
+"""
+SQLite store of historical disk usage, per sequencer usage and bytes
+reclaimed by deletion, sampled on each check and deletion. Used to
+forecast how many days until the genetics directory fills up for the
+Monday Slack alerts.
+
+Also stores the exact size and geometry of each run sized, used to
+calibrate estimating the size of runs from their geometry.
+"""
+
+from datetime import datetime, timedelta
+import sqlite3
+
+from .helper import get_logger
+
+log = get_logger("history log")
+
+HISTORY_DB = "ansible_history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    time TEXT NOT NULL,
+    path TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    used INTEGER NOT NULL,
+    free INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usage_path_time ON usage (path, time);
+CREATE TABLE IF NOT EXISTS sequencer_usage (
+    time TEXT NOT NULL,
+    path TEXT,
+    seq TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    runs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reclaimed (
+    time TEXT NOT NULL,
+    path TEXT NOT NULL,
+    run TEXT NOT NULL,
+    seq TEXT NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reclaimed_path_time ON reclaimed (path, time);
+CREATE TABLE IF NOT EXISTS run_sizes (
+    run TEXT PRIMARY KEY,
+    time TEXT NOT NULL,
+    instrument TEXT NOT NULL,
+    units INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+"""
+
+
+class HistoryStore:
+    """
+    Time series store of usage samples in a SQLite database
+
+    Parameters
+    ----------
+    path : str
+        SQLite database file, created if it doesn't exist
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+        columns = [
+            x[1]
+            for x in self.conn.execute("PRAGMA table_info(sequencer_usage)")
+        ]
+
+        if "path" not in columns:
+            # stores from before multiple roots were supported, their
+            # samples are left without a path
+            with self.conn:
+                self.conn.execute(
+                    "ALTER TABLE sequencer_usage ADD COLUMN path TEXT"
+                )
+
+    def add_usage(self, time, path, usage) -> None:
+        """
+        Add a disk usage sample
+
+        Parameters
+        ----------
+        time : datetime
+            time of the sample
+        path : str
+            path the usage was sampled for
+        usage : tuple
+            total, used and free bytes from shutil.disk_usage()
+        """
+        total, used, free = usage
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO usage VALUES (?, ?, ?, ?, ?)",
+                (time.isoformat(), path, total, used, free),
+            )
+
+    def add_sequencer_usage(self, time, path, sequencers) -> None:
+        """
+        Add a sample of the bytes used by each sequencer's runs
+
+        Parameters
+        ----------
+        time : datetime
+            time of the sample
+        path : str
+            path the runs were sampled from (i.e. the genetics directory)
+        sequencers : dict
+            mapping of sequencer ID to dict with total bytes and runs
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO sequencer_usage (time, path, seq, bytes, runs) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (time.isoformat(), path, seq, x["bytes"], x["runs"])
+                    for seq, x in sequencers.items()
+                ],
+            )
+
+    def add_reclaimed(self, time, path, run, seq, size) -> None:
+        """
+        Record the bytes reclaimed by deleting a run
+
+        Parameters
+        ----------
+        time : datetime
+            time of deletion
+        path : str
+            path the run was deleted from (i.e. the genetics directory)
+        run : str
+            run ID
+        seq : str
+            sequencer ID
+        size : int
+            size of the run in bytes
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO reclaimed VALUES (?, ?, ?, ?, ?)",
+                (time.isoformat(), path, run, seq, int(size)),
+            )
+
+    def add_run_sizes(self, time, samples) -> None:
+        """
+        Add the exact sizes of runs with their geometry, replacing any
+        previous sample of the same run
+
+        Parameters
+        ----------
+        time : datetime
+            time the runs were sized
+        samples : dict
+            mapping of run ID to tuple of instrument, geometry units
+            (cycles x lanes x tiles) and size in bytes
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO run_sizes VALUES (?, ?, ?, ?, ?)",
+                [
+                    (run, time.isoformat(), instrument, units, int(size))
+                    for run, (instrument, units, size) in samples.items()
+                ],
+            )
+
+    def get_run_sizes(self) -> dict:
+        """
+        Get the exact sizes of all runs sized with their geometry
+
+        Returns
+        -------
+        dict
+            mapping of run ID to tuple of instrument, geometry units and
+            size in bytes
+        """
+        rows = self.conn.execute(
+            "SELECT run, instrument, units, bytes FROM run_sizes ORDER BY time"
+        )
+
+        return {x[0]: tuple(x[1:]) for x in rows}
+
+    def get_usage(self, path, since) -> list:
+        """
+        Get the usage samples for a path since the given time
+
+        Returns
+        -------
+        list
+            list of (time, total, used, free) tuples, oldest first
+        """
+        rows = self.conn.execute(
+            "SELECT time, total, used, free FROM usage "
+            "WHERE path = ? AND time >= ? ORDER BY time",
+            (path, since.isoformat()),
+        )
+
+        return [(datetime.fromisoformat(x[0]), *x[1:]) for x in rows]
+
+    def get_reclaimed(self, path, since) -> list:
+        """
+        Get the deletions from a path since the given time
+
+        Returns
+        -------
+        list
+            list of (time, bytes) tuples, oldest first
+        """
+        rows = self.conn.execute(
+            "SELECT time, bytes FROM reclaimed "
+            "WHERE path = ? AND time >= ? ORDER BY time",
+            (path, since.isoformat()),
+        )
+
+        return [(datetime.fromisoformat(x[0]), x[1]) for x in rows]
+
+    def days_until_full(self, path, now, window_days=28):
+        """
+        Project the number of days until the path is full from the rate
+        it has filled over the given window.
+
+        Bytes reclaimed by deletion in the window are added back on to
+        the later samples so that the rate is that of new data arriving,
+        i.e. the forecast is for if nothing further were deleted.
+
+        Parameters
+        ----------
+        path : str
+            path to forecast for
+        now : datetime
+            time to forecast from
+        window_days : int
+            number of days of samples to fit the fill rate to
+
+        Returns
+        -------
+        float | None
+            days until full, None if there are too few samples or usage
+            is not increasing
+        """
+        since = now - timedelta(days=window_days)
+        samples = self.get_usage(path, since)
+        reclaimed = self.get_reclaimed(path, since)
+
+        if len(samples) < 2 or samples[-1][0] == samples[0][0]:
+            return None
+
+        # least squares fit of used bytes (with deletions added back)
+        # against days since the first sample
+        xs = []
+        ys = []
+
+        for time, _, used, _ in samples:
+            xs.append((time - samples[0][0]).total_seconds() / 86400)
+            ys.append(used + sum(x[1] for x in reclaimed if x[0] <= time))
+
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+        slope /= sum((x - mean_x) ** 2 for x in xs)
+
+        if slope <= 0:
+            return None
+
+        free = samples[-1][3]
+        elapsed = (now - samples[-1][0]).total_seconds() / 86400
+
+        return max(free / slope - elapsed, 0)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -7,6 +7,10 @@ from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from urllib3.util import Retry
 
+from .helper import get_logger
+
+log = get_logger("jira log")
+
 
 class Assignee(object):
     """
@@ -230,6 +234,66 @@ class Jira:
 
         return response.json()
 
+    def get_issue_statuses(self, keys: list, batch_size: int = 100) -> dict:
+        """
+        Get the current status of issues by key, querying for all of
+        them at once with `key in (...)` and only returning the status
+        field
+
+        Keys which don't exist or can't be queried are left out of the
+        result, so callers can fall back to a summary search for them
+
+        Parameters:
+            keys: issue keys e.g. EBH-981
+            batch_size: number of keys per query (Jira returns at most
+                100 issues per page)
+
+        Returns:
+            dict: mapping of issue key to status name
+        """
+        url = f"{self.api_url}/api/3/search"
+        keys = sorted(set(keys))
+        statuses = {}
+
+        for idx in range(0, len(keys), batch_size):
+            batch = keys[idx : idx + batch_size]
+            start = 0
+
+            while True:
+                query = {
+                    "jql": f"key in ({', '.join(batch)})",
+                    "fields": "status",
+                    "startAt": start,
+                    "maxResults": batch_size,
+                    # don't fail the whole query for deleted keys
+                    "validateQuery": "warn",
+                }
+                response = self.http.get(
+                    url, headers=self.headers, params=query, auth=self.auth
+                )
+
+                if not response.ok:
+                    # keys left out fall back to a summary search each
+                    log.warning(
+                        f"Jira status query failed ({response.status_code})"
+                        f" for {len(batch)} keys, falling back to a "
+                        f"search per run: {response.text[:500]}"
+                    )
+                    break
+
+                data = response.json()
+                issues = data.get("issues", [])
+
+                for issue in issues:
+                    statuses[issue["key"]] = issue["fields"]["status"]["name"]
+
+                start += len(issues)
+
+                if not issues or start >= data.get("total", 0):
+                    break
+
+        return statuses
+
     def get_assay(self, issue: dict):
         """
         Get assay options of an issue
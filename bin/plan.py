@@ -0,0 +1,272 @@
+"""
+Functions for building, writing and reading a deletion plan, this is a
+machine readable record of the decision made for every run checked in
+check_for_deletion() that may be written as JSON or CSV and later used
+as the input to delete_runs() in place of the pickle file
+"""
+
+import csv
+from datetime import datetime
+import json
+import os
+
+from .helper import get_logger
+
+log = get_logger("plan log")
+
+# decisions that may be made for a run
+DELETE = "delete"
+MANUAL_REVIEW = "manual_review"
+SKIP = "skip"
+
+# columns written when outputting the plan as CSV
+CSV_COLUMNS = [
+    "run",
+    "decision",
+    "reason",
+    "rule",
+    "root",
+    "seq",
+    "status",
+    "key",
+    "assay",
+    "created",
+    "duration",
+    "uploaded",
+    "old_enough",
+    "retention_weeks",
+    "url",
+    "size",
+    "size_error",
+]
+
+
+def get_totals(runs: dict) -> dict:
+    """
+    Sum the sizes of runs per sequencer and per assay from the details
+    already gathered when checking them. Runs too young to delete or
+    still active aren't sized, they add their last known or estimated
+    size if any and are otherwise counted as unsized. They may not have
+    been looked up in Jira, runs without an assay are left out of the
+    assay totals
+
+    Parameters
+    ----------
+    runs : dict
+        mapping of run ID to dict of run details, each including the
+        sequencer, assay, size and created date
+
+    Returns
+    -------
+    dict
+        total bytes, number of runs, number of runs without a size and
+        oldest run for each sequencer and assay, largest first
+    """
+    totals = {"sequencers": {}, "assays": {}}
+
+    for run, details in sorted(runs.items()):
+        for group, name in [
+            ("sequencers", details["seq"]),
+            ("assays", details["assay"]),
+        ]:
+            if name is None:
+                continue
+
+            total = totals[group].setdefault(
+                name,
+                {
+                    "bytes": 0,
+                    "runs": 0,
+                    "unsized": 0,
+                    "oldest_run": run,
+                    "oldest": None,
+                },
+            )
+            total["bytes"] += int(details["size"] or 0)
+            total["runs"] += 1
+            total["unsized"] += details["size"] is None
+
+            if total["oldest"] is None or details["created"] < total["oldest"]:
+                total["oldest_run"] = run
+                total["oldest"] = details["created"]
+
+    return {
+        group: dict(
+            sorted(values.items(), key=lambda x: x[1]["bytes"], reverse=True)
+        )
+        for group, values in totals.items()
+    }
+
+
+def build_plan(
+    runs: dict, usage: tuple, today: datetime, filesystems: dict = None
+) -> dict:
+    """
+    Build the plan from the per run decisions
+
+    Parameters
+    ----------
+    runs : dict
+        mapping of run ID to dict of run details, each including the
+        decision and reason
+    usage : tuple
+        disk usage of the genetics directory from shutil.disk_usage()
+    today : datetime
+        date of checking
+    filesystems : dict
+        (optional) mapping of each genetics root to its disk usage, for
+        when checking more than one root
+
+    Returns
+    -------
+    dict
+        plan with per run decisions, summary totals and totals per
+        filesystem, sequencer and assay
+    """
+    total, used, free = usage
+
+    reclaimed = sum(
+        int(x["size"]) for x in runs.values() if x["decision"] == DELETE
+    )
+
+    # usage and projected reclaimed bytes per genetics root
+    per_root = {}
+
+    for root, root_usage in (filesystems or {}).items():
+        root_total, root_used, root_free = root_usage
+        root_reclaimed = sum(
+            int(x["size"])
+            for x in runs.values()
+            if x["decision"] == DELETE and x.get("root") == root
+        )
+        per_root[root] = {
+            "total": root_total,
+            "used": root_used,
+            "free": root_free,
+            "projected_reclaimed_bytes": root_reclaimed,
+            "projected_used_bytes": root_used - root_reclaimed,
+        }
+
+    return {
+        "generated": today.isoformat(),
+        "usage": {"total": total, "used": used, "free": free},
+        "summary": {
+            DELETE: sum(1 for x in runs.values() if x["decision"] == DELETE),
+            MANUAL_REVIEW: sum(
+                1 for x in runs.values() if x["decision"] == MANUAL_REVIEW
+            ),
+            SKIP: sum(1 for x in runs.values() if x["decision"] == SKIP),
+            "projected_reclaimed_bytes": reclaimed,
+            "projected_used_bytes": used - reclaimed,
+        },
+        "filesystems": per_root,
+        "totals": get_totals(runs),
+        "runs": runs,
+    }
+
+
+def write_plan(plan: dict, path: str) -> None:
+    """
+    Write the plan to the given file, as CSV if the file ends in .csv
+    and JSON otherwise
+
+    Parameters
+    ----------
+    plan : dict
+        plan as returned from build_plan()
+    path : str
+        file to write to
+    """
+    log.info(f"Writing deletion plan to {path}")
+
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=CSV_COLUMNS, extrasaction="ignore"
+            )
+            writer.writeheader()
+
+            for run, details in plan["runs"].items():
+                writer.writerow({"run": run, **details})
+    else:
+        with open(path, "w") as f:
+            json.dump(plan, f, indent=2, default=str)
+
+
+def read_plan(path: str) -> dict:
+    """
+    Read the per run decisions from a JSON or CSV plan file
+
+    Parameters
+    ----------
+    path : str
+        plan file to read
+
+    Returns
+    -------
+    dict
+        mapping of run ID to dict of run details
+
+    Raises
+    ------
+    FileNotFoundError
+        Raised if the plan file does not exist
+    """
+    log.info(f"Reading deletion plan from {path}")
+
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Plan file {path} does not exist")
+
+    if path.lower().endswith(".csv"):
+        runs = {}
+
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                run = row.pop("run")
+                row["size"] = int(row["size"] or 0)
+                row["size_error"] = (
+                    int(row["size_error"]) if row.get("size_error") else None
+                )
+                row["uploaded"] = row["uploaded"] == "True"
+                row["old_enough"] = row["old_enough"] == "True"
+
+                if row.get("retention_weeks"):
+                    row["retention_weeks"] = int(row["retention_weeks"])
+                else:
+                    row.pop("retention_weeks", None)
+
+                row["key"] = row["key"] or None
+                row["rule"] = row.get("rule") or None
+                # CSV plans don't hold the 002 project describe data,
+                # only its URL
+                if row["url"] and row["url"] != "NA":
+                    row["project"] = {"url": row["url"]}
+                else:
+                    row["project"] = {}
+                runs[run] = row
+
+        return runs
+
+    with open(path) as f:
+        return json.load(f)["runs"]
+
+
+def get_runs_to_delete(runs: dict) -> dict:
+    """
+    Select the runs from a plan marked for deletion
+
+    Parameters
+    ----------
+    runs : dict
+        mapping of run ID to dict of run details from read_plan()
+
+    Returns
+    -------
+    dict
+        mapping of run ID to dict of run details to delete
+    """
+    return {
+        run: details
+        for run, details in runs.items()
+        if details["decision"] == DELETE
+    }
@@ -0,0 +1,332 @@
+"""
+Declarative deletion policy. The rules for which old enough runs may be
+automatically deleted are read from a JSON or YAML file (set with
+ANSIBLE_POLICY) and compiled once into predicates, with the first rule
+to match a run giving the decision and the reason for it.
+
+Each rule may set:
+
+    - name : name of the rule, recorded against the runs it matches
+    - statuses : list of Jira statuses the rule applies to
+    - uploaded : if the run must (true) or must not (false) have been
+        uploaded to StagingArea52
+    - project : if the run must (true) or must not (false) have a 002
+        project
+    - assays : list of assays the rule applies to, defaults to the
+        assays automatically deleted (JIRA_ASSAY)
+    - min_weeks : minimum age in weeks for the rule to apply, a run
+        matching the rule apart from its age is skipped until it is old
+        enough
+    - reason : reason for deleting the run, may include {status},
+        {assay} and {rule}
+
+Runs which are old enough but match no rule are flagged for manual
+review. If no rules are given the default rules are used.
+
+The policy may also give a retention table of the number of weeks to
+keep runs of each assay for, e.g. {"retention": {"MYE": 1, "TWE": 6}}.
+Runs of assays not in the table are kept for ANSIBLE_WEEK weeks.
+
+The assays whose runs have their files checked against the MD5s recorded
+by DNAnexus before deletion may be given as checksum_assays, e.g.
+{"checksum_assays": ["TSO500"]}.
+"""
+
+from collections import namedtuple
+import json
+import os
+
+from .helper import get_logger
+from .plan import DELETE, SKIP
+
+log = get_logger("policy log")
+
+# default rules, matching those used before policies were configurable
+DEFAULT_POLICY = {
+    "rules": [
+        {
+            "name": "samples_released",
+            "statuses": ["ALL SAMPLES RELEASED"],
+            "uploaded": True,
+            "project": True,
+            "reason": "uploaded, has 002 project and samples released",
+        },
+        {
+            "name": "data_not_processed_or_released",
+            "statuses": [
+                "DATA CANNOT BE PROCESSED",
+                "DATA CANNOT BE RELEASED",
+            ],
+            "uploaded": True,
+            "reason": "uploaded and Jira status {status}",
+        },
+    ]
+}
+
+POLICY_KEYS = {"rules", "retention", "checksum_assays"}
+
+RULE_KEYS = {
+    "name",
+    "statuses",
+    "uploaded",
+    "project",
+    "assays",
+    "min_weeks",
+    "reason",
+}
+
+# outcome of evaluating a run against the policy, decision is one of
+# DELETE, SKIP (matched but not yet old enough) or None (no rule matched)
+Match = namedtuple("Match", ["decision", "rule", "reason"])
+
+
+def read_policy_file(path) -> dict:
+    """
+    Read a policy from a JSON or YAML file, YAML requires PyYAML to be
+    installed
+
+    Parameters
+    ----------
+    path : str
+        policy file
+
+    Returns
+    -------
+    dict
+        policy configuration
+
+    Raises
+    ------
+    ImportError
+        Raised if a YAML policy is given and PyYAML is not installed
+    """
+    with open(path) as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(
+                    "PyYAML is required to read YAML policy files, install "
+                    "it or give the policy as JSON"
+                )
+
+            return yaml.safe_load(f)
+
+        return json.load(f)
+
+
+class Policy:
+    """
+    Deletion policy compiled from its configuration
+
+    Parameters
+    ----------
+    config : dict
+        policy configuration with a list of rules
+    assays : list
+        assays automatically deleted (JIRA_ASSAY), used for rules that
+        don't give their own assays
+    """
+
+    def __init__(self, config, assays=None):
+        self.rules = []
+        self.delete_statuses = []
+
+        unknown = set(config) - POLICY_KEYS
+
+        assert not unknown, (
+            f"Error - unknown keys in policy: {', '.join(sorted(unknown))}"
+        )
+
+        # weeks to keep runs for per assay
+        self.retention = {
+            assay: int(weeks)
+            for assay, weeks in config.get("retention", {}).items()
+        }
+
+        assert all(x >= 0 for x in self.retention.values()), (
+            "Error - policy retention weeks must not be negative"
+        )
+
+        # assays to verify the checksums of before deleting
+        self.checksum_assays = frozenset(config.get("checksum_assays", []))
+
+        for idx, rule in enumerate(
+            config.get("rules", DEFAULT_POLICY["rules"])
+        ):
+            unknown = set(rule) - RULE_KEYS
+
+            assert not unknown, (
+                f"Error - unknown keys in policy rule {idx + 1}: "
+                f"{', '.join(sorted(unknown))}"
+            )
+
+            assert rule.get("statuses"), (
+                f"Error - policy rule {idx + 1} does not give any statuses"
+            )
+
+            self.rules.append(self.compile_rule(rule, idx, assays))
+
+            for status in rule["statuses"]:
+                if status.upper() not in self.delete_statuses:
+                    self.delete_statuses.append(status.upper())
+
+    @staticmethod
+    def compile_rule(rule, idx, assays) -> tuple:
+        """
+        Compile a rule into its name, a predicate on the run details and
+        its minimum age
+
+        Returns
+        -------
+        tuple
+            name, predicate, minimum weeks (or None) and reason
+        """
+        name = rule.get("name", f"rule_{idx + 1}")
+        statuses = frozenset(x.upper() for x in rule["statuses"])
+        rule_assays = frozenset(rule.get("assays") or assays or [])
+
+        # only check the conditions the rule gives
+        checks = [
+            lambda run: run["status"].upper() in statuses,
+            lambda run: run["assay"] in rule_assays,
+        ]
+
+        if "uploaded" in rule:
+            uploaded = bool(rule["uploaded"])
+            checks.append(lambda run: bool(run["uploaded"]) == uploaded)
+
+        if "project" in rule:
+            project = bool(rule["project"])
+            checks.append(lambda run: bool(run["project"]) == project)
+
+        def predicate(run):
+            return all(check(run) for check in checks)
+
+        return (
+            name,
+            predicate,
+            rule.get("min_weeks"),
+            rule.get("reason", "matched rule {rule}"),
+        )
+
+    def get_retention_weeks(self, assay, default) -> int:
+        """
+        Get the number of weeks to keep runs of the given assay for
+
+        Parameters
+        ----------
+        assay : str
+            Jira ticket assay
+        default : int
+            weeks to keep runs of assays not in the retention table for
+            (i.e. ANSIBLE_WEEK)
+
+        Returns
+        -------
+        int
+            number of weeks
+        """
+        return self.retention.get(assay, default)
+
+    def evaluate(self, uploaded, project, status, assay, weeks) -> Match:
+        """
+        Find the first rule matching a run
+
+        Parameters
+        ----------
+        uploaded : bool
+            if the run is uploaded to StagingArea52
+        project : bool
+            if the run has a 002 project
+        status : str
+            Jira ticket status
+        assay : str
+            Jira ticket assay
+        weeks : float
+            age of the run in weeks
+
+        Returns
+        -------
+        Match
+            decision, name of the rule matched and reason, the decision
+            and rule are None if no rule matched
+        """
+        return self.match(
+            {
+                "uploaded": uploaded,
+                "project": project,
+                "status": status,
+                "assay": assay,
+            },
+            weeks,
+        )
+
+    def match(self, run, weeks) -> Match:
+        """
+        Find the first rule matching a run from a mapping of its
+        details, which may be lazily fetched (i.e. a RunEvidence). Each
+        rule's conditions are checked in order of status, assay,
+        upload and 002 project, stopping at the first not met, so only
+        the details needed to reach a decision are used
+
+        Parameters
+        ----------
+        run : mapping
+            run details with the uploaded, project, status and assay
+        weeks : float
+            age of the run in weeks
+
+        Returns
+        -------
+        Match
+            as from evaluate()
+        """
+        for name, predicate, min_weeks, reason in self.rules:
+            if not predicate(run):
+                continue
+
+            if min_weeks is not None and weeks < min_weeks:
+                return Match(
+                    SKIP,
+                    name,
+                    f"rule {name} requires runs older than {min_weeks} weeks",
+                )
+
+            return Match(
+                DELETE,
+                name,
+                reason.format(
+                    status=run["status"].upper(), assay=run["assay"], rule=name
+                ),
+            )
+
+        return Match(None, None, None)
+
+
+def get_policy(assays=None, path=None) -> Policy:
+    """
+    Get the deletion policy from the given file, or from ANSIBLE_POLICY
+    if set, else the default policy
+
+    Parameters
+    ----------
+    assays : list
+        assays automatically deleted (JIRA_ASSAY), may be None if only
+        using the statuses valid for deletion
+    path : str
+        (optional) policy file to read
+
+    Returns
+    -------
+    Policy
+        compiled deletion policy
+    """
+    path = path or os.environ.get("ANSIBLE_POLICY")
+
+    if not path:
+        return Policy(DEFAULT_POLICY, assays)
+
+    log.info(f"Reading deletion policy from {path}")
+
+    return Policy(read_policy_file(path), assays)
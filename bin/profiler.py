@@ -0,0 +1,174 @@
+"""
+Optional profiling of a whole monitoring run, enabled by setting the
+ANSIBLE_PROFILE environment variable to one of the following modes:
+
+    - cprofile : deterministic profiling, writes a pstats .prof file
+    - pyinstrument : sampling profiling, writes a speedscope .json file
+        (requires pyinstrument to be installed)
+
+Profile outputs are written to /log/monitoring (or the current directory
+if not running in the container) with a timestamped name, and a summary
+of the hottest functions is added to the log.
+"""
+
+import cProfile
+from datetime import datetime
+import io
+import os
+import pstats
+
+from .helper import get_logger, get_monitoring_dir
+
+log = get_logger("profiler log")
+
+# number of functions to include in the summary added to the log
+TOP_N = 25
+
+
+def get_profile_prefix() -> str:
+    """
+    Build the timestamped path prefix to write the profile output to
+
+    Returns
+    -------
+    str
+        path prefix without file extension
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    return os.path.join(get_monitoring_dir(), f"ansible_profile_{timestamp}")
+
+
+def log_hot_functions(stats: pstats.Stats, top_n: int = TOP_N) -> None:
+    """
+    Add the top N functions by cumulative time to the log
+
+    Parameters
+    ----------
+    stats : pstats.Stats
+        stats object from the finished profile
+    top_n : int
+        number of functions to log
+    """
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+
+    log.info(f"Top {top_n} functions by cumulative time:")
+
+    for line in stream.getvalue().splitlines():
+        if line.strip():
+            log.info(line)
+
+
+def run_with_cprofile(func, top_n: int = TOP_N):
+    """
+    Run the given function under cProfile, dumping the pstats file
+    even if the function exits early (i.e. through sys.exit())
+
+    Parameters
+    ----------
+    func : callable
+        function to profile, called without arguments
+    top_n : int
+        number of functions to include in the log summary
+
+    Returns
+    -------
+    any
+        return value of func
+    """
+    profiler = cProfile.Profile()
+
+    try:
+        return profiler.runcall(func)
+    finally:
+        outfile = f"{get_profile_prefix()}.prof"
+        profiler.dump_stats(outfile)
+
+        log.info(f"cProfile stats written to {outfile}")
+        log_hot_functions(pstats.Stats(profiler), top_n)
+
+
+def run_with_pyinstrument(func, top_n: int = TOP_N):
+    """
+    Run the given function under the pyinstrument sampling profiler,
+    writing a speedscope file. Falls back to cProfile if pyinstrument
+    is not installed.
+
+    Parameters
+    ----------
+    func : callable
+        function to profile, called without arguments
+    top_n : int
+        number of lines of the call tree to include in the log summary
+
+    Returns
+    -------
+    any
+        return value of func
+    """
+    try:
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+    except ImportError:
+        log.warning(
+            "pyinstrument not installed, falling back to cProfile profiling"
+        )
+        return run_with_cprofile(func, top_n)
+
+    profiler = Profiler()
+    profiler.start()
+
+    try:
+        return func()
+    finally:
+        profiler.stop()
+
+        outfile = f"{get_profile_prefix()}.speedscope.json"
+
+        with open(outfile, "w") as f:
+            f.write(profiler.output(renderer=SpeedscopeRenderer()))
+
+        log.info(f"pyinstrument speedscope profile written to {outfile}")
+        log.info(f"Top {top_n} lines of sampled call tree:")
+
+        summary = profiler.output_text(unicode=False, color=False)
+
+        for line in summary.splitlines()[:top_n]:
+            if line.strip():
+                log.info(line)
+
+
+def run_with_profiler(func, mode: str, top_n: int = TOP_N):
+    """
+    Run the given function with the profiler selected by mode
+
+    Parameters
+    ----------
+    func : callable
+        function to profile, called without arguments
+    mode : str
+        profiling mode from ANSIBLE_PROFILE (cprofile or pyinstrument)
+    top_n : int
+        number of functions to include in the log summary
+
+    Returns
+    -------
+    any
+        return value of func
+    """
+    mode = mode.strip().lower()
+
+    log.info(f"Running with profiling enabled ({mode})")
+
+    if mode in ["cprofile", "true", "1"]:
+        return run_with_cprofile(func, top_n)
+    elif mode == "pyinstrument":
+        return run_with_pyinstrument(func, top_n)
+    else:
+        log.warning(
+            f"Unknown ANSIBLE_PROFILE mode '{mode}', expected one of "
+            "cprofile or pyinstrument. Running without profiling"
+        )
+        return func()
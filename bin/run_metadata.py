@@ -0,0 +1,270 @@
+"""
+Index of run metadata parsed from the RunInfo.xml and RunParameters.xml
+files written by the sequencer, giving the instrument, flowcell, run
+date and run geometry (cycles, lanes and tiles) without walking the run.
+
+Each run's files are parsed once and the result cached in a JSON file
+keyed by the files' mtimes, so later checks only need to stat them.
+"""
+
+from datetime import datetime
+import json
+import os
+import threading
+from xml.etree import ElementTree
+
+from .helper import get_logger
+
+log = get_logger("run metadata log")
+
+RUN_METADATA_CACHE = "ansible_run_metadata.json"
+
+RUN_INFO = "RunInfo.xml"
+
+# MiSeq and HiSeq runs name the file with a lower case r
+RUN_PARAMETERS = ["RunParameters.xml", "runParameters.xml"]
+
+# formats of the run dates written by different instruments
+DATE_FORMATS = [
+    "%y%m%d",
+    "%Y%m%d",
+    "%m/%d/%Y %I:%M:%S %p",
+    "%Y-%m-%dT%H:%M:%SZ",
+    "%Y-%m-%dT%H:%M:%S",
+]
+
+
+def parse_date(value):
+    """
+    Parse a run date in any of the formats written by the sequencers
+
+    Returns
+    -------
+    datetime | None
+        run date, None if not in a known format
+    """
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format)
+        except ValueError:
+            continue
+
+    return None
+
+
+def parse_run_info(path) -> dict:
+    """
+    Parse the run details and geometry from a RunInfo.xml file
+
+    Parameters
+    ----------
+    path : str
+        path to RunInfo.xml
+
+    Returns
+    -------
+    dict
+        run ID, instrument, flowcell, run date, reads (cycles and if
+        indexed), total cycles, lanes and tiles per lane
+    """
+    run = ElementTree.parse(path).getroot().find("Run")
+
+    reads = [
+        {
+            "cycles": int(x.get("NumCycles", 0)),
+            "indexed": x.get("IsIndexedRead") == "Y",
+        }
+        for x in run.iter("Read")
+    ]
+
+    layout = run.find("FlowcellLayout")
+    lanes = None
+    tiles = None
+
+    if layout is not None:
+        lanes = int(layout.get("LaneCount", 0)) or None
+        # tiles imaged per lane, over each surface and swath
+        tiles = 1
+
+        for attribute in ["SurfaceCount", "SwathCount", "TileCount"]:
+            tiles *= int(layout.get(attribute, 1))
+
+    date = parse_date(run.findtext("Date", ""))
+
+    return {
+        "run_id": run.get("Id"),
+        "instrument": run.findtext("Instrument"),
+        "flowcell": run.findtext("Flowcell"),
+        "run_date": date.isoformat() if date else None,
+        "reads": reads,
+        "cycles": sum(x["cycles"] for x in reads),
+        "lanes": lanes,
+        "tiles": tiles,
+    }
+
+
+def parse_run_parameters(path) -> dict:
+    """
+    Parse the instrument type and run start date from a
+    RunParameters.xml file, used where RunInfo.xml doesn't give them
+
+    Parameters
+    ----------
+    path : str
+        path to RunParameters.xml
+
+    Returns
+    -------
+    dict
+        instrument type and run start date, either may be None
+    """
+    root = ElementTree.parse(path).getroot()
+
+    instrument_type = None
+    date = None
+
+    for element in root.iter():
+        if element.tag in ["InstrumentType", "ApplicationName"]:
+            instrument_type = instrument_type or (element.text or "").strip()
+        elif element.tag == "RunStartDate" and date is None:
+            date = parse_date(element.text or "")
+
+    return {
+        "instrument_type": instrument_type or None,
+        "run_date": date.isoformat() if date else None,
+    }
+
+
+def get_run_date(metadata):
+    """
+    Get the run date from run metadata
+
+    Returns
+    -------
+    datetime | None
+        run date, None if no metadata or the run date is not known
+    """
+    if not metadata or not metadata.get("run_date"):
+        return None
+
+    return datetime.fromisoformat(metadata["run_date"])
+
+
+class RunMetadataIndex:
+    """
+    Cache of the metadata parsed from each run's RunInfo.xml and
+    RunParameters.xml, keyed by the run path and the files' mtimes
+
+    Parameters
+    ----------
+    path : str
+        JSON file to keep the cache in, None to only cache in memory
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.seen = set()
+
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as err:
+                log.warning(f"Unable to read run metadata cache: {err}")
+
+    @staticmethod
+    def get_files(run_path) -> dict:
+        """
+        Get the mtime of each metadata file present in the run
+
+        Returns
+        -------
+        dict
+            mapping of file name to mtime
+        """
+        files = {}
+
+        for name in [RUN_INFO, *RUN_PARAMETERS]:
+            try:
+                files[name] = os.path.getmtime(os.path.join(run_path, name))
+            except OSError:
+                continue
+
+        return files
+
+    def get(self, run_path):
+        """
+        Get the metadata of a run, parsing its files only if not cached
+        or modified since they were cached
+
+        Parameters
+        ----------
+        run_path : str
+            path to the run directory
+
+        Returns
+        -------
+        dict | None
+            run metadata, None if the run has no RunInfo.xml or it
+            can't be parsed
+        """
+        files = self.get_files(run_path)
+
+        with self.lock:
+            self.seen.add(run_path)
+            entry = self.entries.get(run_path)
+
+        if entry and entry["files"] == files:
+            return entry["metadata"]
+
+        metadata = None
+
+        if RUN_INFO in files:
+            try:
+                metadata = parse_run_info(os.path.join(run_path, RUN_INFO))
+
+                for name in RUN_PARAMETERS:
+                    if name in files:
+                        parameters = parse_run_parameters(
+                            os.path.join(run_path, name)
+                        )
+                        metadata["instrument_type"] = parameters[
+                            "instrument_type"
+                        ]
+                        metadata["run_date"] = (
+                            metadata["run_date"] or parameters["run_date"]
+                        )
+                        break
+            except (ElementTree.ParseError, AttributeError, ValueError) as err:
+                log.warning(
+                    f"Unable to parse run metadata of {run_path}: {err}"
+                )
+                metadata = None
+
+        with self.lock:
+            self.entries[run_path] = {"files": files, "metadata": metadata}
+
+        return metadata
+
+    def save(self) -> None:
+        """
+        Write the cache to its file, dropping runs not looked up since
+        it was read (i.e. deleted runs)
+        """
+        if not self.path:
+            return
+
+        with self.lock:
+            entries = {
+                path: entry
+                for path, entry in self.entries.items()
+                if path in self.seen
+            }
+
+        try:
+            with open(self.path, "w") as f:
+                json.dump(entries, f)
+        except OSError as err:
+            log.warning(f"Unable to write run metadata cache: {err}")
@@ -0,0 +1,233 @@
+"""
+Streaming discovery of runs to check, used by check_root() in place of
+collecting the full run and log listings before checking any run.
+
+Runs are yielded as each sequencer directory is listed, with the run
+directory mtime (used as the created date) from a single stat. The
+listing is run ahead of the checks in a background thread through a
+bounded queue, so cheap filters on the age of the run can be applied
+as runs are found and only the runs passing them reach the slower Jira,
+DNAnexus and sizing checks.
+
+Runs still being sequenced or uploaded are found from the sequencer's
+completion markers and the mtime of their dx-streaming-upload log, so
+that they can be skipped without sizing a directory that is still
+growing.
+"""
+
+import os
+from queue import Full, Queue
+import threading
+
+from .helper import get_logger
+
+log = get_logger("scan log")
+
+# maximum number of runs listed ahead of the run being checked
+SCAN_QUEUE_SIZE = 64
+
+# marks the end of the items in the queue
+_DONE = object()
+
+# files written by the sequencer once it has finished writing the run
+COMPLETION_MARKERS = ["RTAComplete.txt", "CopyComplete.txt"]
+
+# runs with their upload log modified within this many hours are still
+# being uploaded
+UPLOAD_ACTIVE_HOURS = 24
+
+# runs without a completion marker modified within this many days are
+# still being sequenced, older runs without one are taken as complete
+# (i.e. from sequencers not writing the markers)
+SEQUENCING_ACTIVE_DAYS = 7
+
+
+def iter_runs(seqs, genetics_dir, logs_dir):
+    """
+    Yield the runs of each sequencer that have a dx-streaming-upload log
+    (i.e. runs dx-streaming-upload has uploaded), one sequencer
+    directory at a time
+
+    Parameters
+    ----------
+    seqs : list
+        list of sequencer IDs
+    genetics_dir : str
+        parent path to run directories
+    logs_dir : str
+        parent path to dx-streaming-upload log directory
+
+    Yields
+    ------
+    tuple
+        run ID, sequencer ID and path to the run's upload log
+    """
+    for seq in seqs:
+        # logs are named run.<run ID>.lane.all.log
+        logged = {
+            x.split(".")[1].strip(): os.path.join(logs_dir, seq, x)
+            for x in os.listdir(os.path.join(logs_dir, seq))
+        }
+        runs = sorted(
+            x.strip() for x in os.listdir(os.path.join(genetics_dir, seq))
+        )
+
+        log.info(
+            f"{len(runs)} folders and {len(logged)} logs in {seq} detected"
+        )
+
+        for run in runs:
+            if run in logged:
+                yield run, seq, logged[run]
+
+
+def iter_inventory(inventory, logs_dir):
+    """
+    Yield the runs with a dx-streaming-upload log from an inventory in
+    the same format as returned from get_runs() (i.e. from a RunWatcher)
+
+    Parameters
+    ----------
+    inventory : tuple
+        run directories, run IDs with logs and mapping of run to
+        sequencer, as from get_runs()
+    logs_dir : str
+        parent path to dx-streaming-upload log directory
+
+    Yields
+    ------
+    tuple
+        run ID, sequencer ID and path to the run's upload log
+    """
+    genetic_directory, logs_directory, tmp_seq = inventory
+
+    for run in sorted(set(genetic_directory) & set(logs_directory)):
+        seq = tmp_seq[run]
+
+        yield run, seq, os.path.join(logs_dir, seq, f"run.{run}.lane.all.log")
+
+
+def stat_runs(runs, genetics_dir):
+    """
+    Add the mtimes of each run directory and upload log to the runs
+    yielded from iter_runs() or iter_inventory(), skipping any runs
+    removed since listing
+
+    Yields
+    ------
+    tuple
+        run ID, sequencer ID, mtime of the run directory and mtime of
+        the upload log (None if not found)
+    """
+    for run, seq, log_path in runs:
+        try:
+            mtime = os.path.getmtime(os.path.join(genetics_dir, seq, run))
+        except FileNotFoundError:
+            log.info(f"{run} removed since listing {seq}, not checking")
+            continue
+
+        try:
+            log_mtime = os.path.getmtime(log_path)
+        except FileNotFoundError:
+            log_mtime = None
+
+        yield run, seq, mtime, log_mtime
+
+
+def get_activity(run_path, mtime, log_mtime, now):
+    """
+    Check if a run is still being sequenced or uploaded, from the mtime
+    of its upload log and its sequencer completion markers. The markers
+    are only looked for on recently modified runs
+
+    Parameters
+    ----------
+    run_path : str
+        path to the run directory
+    mtime : float
+        mtime of the run directory
+    log_mtime : float
+        mtime of the run's dx-streaming-upload log, None if not found
+    now : datetime
+        current time
+
+    Returns
+    -------
+    str | None
+        what the run is still doing, None if it is not active
+    """
+    now = now.timestamp()
+
+    if log_mtime is not None and now - log_mtime < UPLOAD_ACTIVE_HOURS * 3600:
+        hours = max((now - log_mtime) / 3600, 0)
+
+        return f"uploading, log modified {hours:.1f} hours ago"
+
+    if now - mtime < SEQUENCING_ACTIVE_DAYS * 86400 and not any(
+        os.path.exists(os.path.join(run_path, x)) for x in COMPLETION_MARKERS
+    ):
+        return "sequencing, no completion marker"
+
+    return None
+
+
+def prefetch(iterable, maxsize=SCAN_QUEUE_SIZE):
+    """
+    Iterate over the given iterable in a background thread, passing
+    items through a bounded queue so that it runs at most maxsize items
+    ahead of the consumer. Errors raised whilst iterating are re-raised
+    in the consumer
+
+    Parameters
+    ----------
+    iterable : iterable
+        iterable to consume in the background, i.e. a generator
+    maxsize : int
+        maximum number of items to hold in the queue
+
+    Yields
+    ------
+    object
+        items from the iterable, in order
+    """
+    queue = Queue(maxsize=maxsize)
+    stop = threading.Event()
+    error = []
+
+    def put(item) -> bool:
+        # don't block forever if the consumer has stopped
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as err:
+            error.append(err)
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = queue.get()
+
+            if item is _DONE:
+                break
+
+            yield item
+    finally:
+        stop.set()
+
+    if error:
+        raise error[0]
@@ -0,0 +1,130 @@
+"""
+Estimate the size of runs from their geometry (cycles x lanes x tiles,
+from RunInfo.xml) in place of walking the run directory.
+
+The bytes written per unit of geometry are calibrated per instrument
+from the exact sizes of previous runs, kept in the history database.
+Each estimate has an error bound of two standard deviations of the
+calibration runs' bytes per unit, and instruments with too few
+calibration runs are not estimated.
+"""
+
+from statistics import mean, median, stdev
+import threading
+
+from .helper import get_logger
+
+log = get_logger("size estimate log")
+
+# minimum number of runs sized to estimate an instrument's runs from
+MIN_CALIBRATION_RUNS = 3
+
+# number of the most recently sized runs per instrument to calibrate from
+MAX_CALIBRATION_RUNS = 50
+
+
+def get_units(metadata):
+    """
+    Get the geometry units of a run, the number of tile images written
+
+    Parameters
+    ----------
+    metadata : dict
+        run metadata from RunMetadataIndex.get()
+
+    Returns
+    -------
+    int | None
+        cycles x lanes x tiles per lane, None if the geometry is unknown
+    """
+    if not metadata:
+        return None
+
+    units = 1
+
+    for field in ["cycles", "lanes", "tiles"]:
+        if not metadata.get(field):
+            return None
+
+        units *= metadata[field]
+
+    return units
+
+
+class SizeEstimator:
+    """
+    Run size estimator calibrated from the exact sizes of previous runs
+
+    Parameters
+    ----------
+    samples : dict
+        mapping of run ID to tuple of instrument, geometry units and
+        exact size in bytes, i.e. from HistoryStore.get_run_sizes()
+    """
+
+    def __init__(self, samples=None):
+        self.lock = threading.Lock()
+        self.samples = dict(samples or {})
+        # runs sized since created, to add to the history
+        self.new_samples = {}
+
+    def add(self, run, metadata, size) -> None:
+        """
+        Add the exact size of a run to calibrate from, if its geometry
+        is known
+        """
+        units = get_units(metadata)
+
+        if not units or not metadata.get("instrument"):
+            return
+
+        with self.lock:
+            sample = (metadata["instrument"], units, int(size))
+            self.samples[run] = sample
+            self.new_samples[run] = sample
+
+    def get_ratios(self, instrument) -> list:
+        """
+        Get the bytes per unit of the most recent runs of an instrument
+        """
+        with self.lock:
+            ratios = [
+                size / units
+                for sample_instrument, units, size in self.samples.values()
+                if sample_instrument == instrument and units
+            ]
+
+        return ratios[-MAX_CALIBRATION_RUNS:]
+
+    def estimate(self, metadata):
+        """
+        Estimate the size of a run from its geometry
+
+        Parameters
+        ----------
+        metadata : dict
+            run metadata from RunMetadataIndex.get()
+
+        Returns
+        -------
+        tuple | None
+            estimated size and error bound in bytes, None if the run's
+            geometry is unknown or its instrument has too few
+            calibration runs
+        """
+        units = get_units(metadata)
+
+        if not units:
+            return None
+
+        ratios = self.get_ratios(metadata.get("instrument"))
+
+        if len(ratios) < MIN_CALIBRATION_RUNS:
+            return None
+
+        # median is robust to the odd run with extra files in it, the
+        # error bound is from the spread of all calibration runs
+        size = median(ratios) * units
+        error = 2 * stdev(ratios, mean(ratios)) * units
+
+        return int(size), int(error)
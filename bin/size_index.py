@@ -0,0 +1,229 @@
+"""
+Index of the size of each run directory's subtrees, so that re-sizing a
+run that has changed (i.e. one still being written to) only lists the
+directories that have changed rather than every file in the run.
+
+Each directory is cached with its mtime, the total size of the files
+directly in it and its subdirectories. A directory's mtime changes when
+entries are added to, removed from or renamed within it, so on re-sizing
+every directory is stat'ed but only those with a changed mtime are
+listed and their files stat'ed again. For a growing run this is usually
+only the newest cycle directory of each lane. The number of files in
+each subtree is kept alongside its size, giving the local manifest the
+upload is verified against.
+
+Files written to in place (i.e. appended to) don't change their
+directory's mtime, so runs are only indexed once the sequencer has
+written a completion marker. Runs without one are listed in full each
+time they're sized and never kept in the index.
+"""
+
+import json
+import os
+import threading
+from time import time
+
+from .helper import get_logger
+from .scan import COMPLETION_MARKERS
+
+log = get_logger("size index log")
+
+SIZE_INDEX_CACHE = "ansible_size_index.json"
+
+# directories modified within this many seconds of being listed aren't
+# cached, as entries added within the mtime resolution of the filesystem
+# wouldn't change the mtime
+RACY_SECONDS = 2
+
+# positions in each cached directory entry: mtime, total bytes, bytes of
+# the files directly in the directory, subdirectory entries, total number
+# of files and number of files directly in the directory
+MTIME, TOTAL, FILES, DIRS, COUNT, N_FILES = range(6)
+
+
+class SizeIndex:
+    """
+    Cache of the sizes of each run's subdirectories, keyed by the run
+    path and each directory's mtime
+
+    Parameters
+    ----------
+    path : str
+        JSON file to keep the index in, None to only index in memory
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        # number of directories listed and reused, for logging
+        self.listed = 0
+        self.reused = 0
+
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as err:
+                log.warning(f"Unable to read size index: {err}")
+
+    def get_size(self, run_path) -> int:
+        """
+        Get the size of a run, only listing the directories changed
+        since it was last sized
+
+        Parameters
+        ----------
+        run_path : str
+            path to the run directory
+
+        Returns
+        -------
+        int
+            size of the run in bytes
+        """
+        return self.get_manifest(run_path)[1]
+
+    def get_indexed_size(self, run_path) -> int:
+        """
+        Get the size of a run as last indexed, without listing or
+        stat'ing anything
+
+        Parameters
+        ----------
+        run_path : str
+            path to the run directory
+
+        Returns
+        -------
+        int
+            size of the run in bytes when last sized, None if the run
+            isn't indexed
+        """
+        with self.lock:
+            entry = self.entries.get(run_path)
+
+        return entry[TOTAL] if entry else None
+
+    def get_manifest(self, run_path) -> tuple:
+        """
+        Get the number of files in a run and their total size, only
+        listing the directories changed since it was last sized. Runs
+        without a completion marker may still have files appended to,
+        so are listed in full and not indexed
+
+        Parameters
+        ----------
+        run_path : str
+            path to the run directory
+
+        Returns
+        -------
+        tuple
+            number of files and size of the run in bytes
+        """
+        counts = [0, 0]
+        complete = any(
+            os.path.exists(os.path.join(run_path, x))
+            for x in COMPLETION_MARKERS
+        )
+
+        with self.lock:
+            # incomplete runs are never kept in the index
+            entry = self.entries.pop(run_path, None)
+
+        entry = self.size_dir(run_path, entry if complete else None, counts)
+
+        with self.lock:
+            if complete:
+                self.entries[run_path] = entry
+
+            self.listed += counts[0]
+            self.reused += counts[1]
+
+        return entry[COUNT], entry[TOTAL]
+
+    def size_dir(self, path, entry, counts) -> list:
+        """
+        Size a directory from its cached entry, listing it again only if
+        its mtime has changed
+
+        Parameters
+        ----------
+        path : str
+            path to the directory
+        entry : list
+            cached entry of the directory, None if not cached
+        counts : list
+            number of directories listed and reused, added to
+
+        Returns
+        -------
+        list
+            directory entry, as described for MTIME to N_FILES
+        """
+        mtime = os.stat(path).st_mtime
+        dirs = {}
+
+        if entry and len(entry) == N_FILES + 1 and entry[MTIME] == mtime:
+            counts[1] += 1
+            files = entry[FILES]
+            n_files = entry[N_FILES]
+
+            for name, child in entry[DIRS].items():
+                try:
+                    dirs[name] = self.size_dir(
+                        os.path.join(path, name), child, counts
+                    )
+                except FileNotFoundError:
+                    # removed since stat'ing its parent
+                    continue
+        else:
+            counts[0] += 1
+            files = 0
+            n_files = 0
+            cached = entry[DIRS] if entry else {}
+
+            with os.scandir(path) as it:
+                for item in it:
+                    if item.is_file():
+                        files += item.stat().st_size
+                        n_files += 1
+                    elif item.is_dir():
+                        dirs[item.name] = self.size_dir(
+                            item.path, cached.get(item.name), counts
+                        )
+
+            if time() - mtime < RACY_SECONDS:
+                mtime = None
+
+        total = files + sum(x[TOTAL] for x in dirs.values())
+        count = n_files + sum(x[COUNT] for x in dirs.values())
+
+        return [mtime, total, files, dirs, count, n_files]
+
+    def save(self) -> None:
+        """
+        Write the index to its file, dropping runs no longer present
+        (i.e. deleted runs)
+        """
+        log.info(
+            f"Sized runs listing {self.listed} directories, "
+            f"{self.reused} unchanged directories reused"
+        )
+
+        if not self.path:
+            return
+
+        with self.lock:
+            entries = {
+                path: entry
+                for path, entry in self.entries.items()
+                if os.path.isdir(path)
+            }
+
+        try:
+            with open(self.path, "w") as f:
+                json.dump(entries, f)
+        except OSError as err:
+            log.warning(f"Unable to write size index: {err}")
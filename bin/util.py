@@ -3,17 +3,19 @@ import datetime as dt
 import json
 import os
 import pickle
-import requests
 
-import dxpy as dx
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
-from dateutil.relativedelta import relativedelta
+# dxpy and requests are imported in the functions that use them, they
+# are slow to import and not needed on every run (e.g. a skipped
+# delete_runs() or the status command)
 
 from .helper import get_logger
+from .policy import get_policy
 
 log = get_logger("util log")
 
+# DNAnexus project runs are uploaded to by dx-streaming-upload
+STAGING_PROJECT = "project-FpVG0G84X7kzq58g19vF1YJQ"
+
 
 def post_simple_message_to_slack(
     message: str,
@@ -22,6 +24,8 @@ def post_simple_message_to_slack(
     debug: bool,
 ) -> None:
 
+    import requests
+
     if debug:
         channel = "egg-test"
 
@@ -51,6 +55,10 @@ def post_message_to_slack(
     today: dt.datetime = None,
     jira_url: str = None,
     action: str = None,
+    days_until_full: float = None,
+    totals: dict = None,
+    filesystems: dict = None,
+    delete_statuses: list = None,
 ) -> None:
     """
     Function to send Slack notification
@@ -59,11 +67,22 @@ def post_message_to_slack(
         token: slack token
         data: str or dict
         debug: whether debug mode (channel: egg-test) or not
+        n_weeks: weeks to keep runs for, for runs without their own
+            retention_weeks
         usage: disk size usage (tuple)
         today: datetime
         jira_url: jira_slack_notify url
         action: type of message to send (i.e. manual, delete)
+        days_until_full: (optional) forecast days until disk is full
+        totals: (optional) per sequencer and assay totals of all runs
+        filesystems: (optional) disk usage (tuple) per genetics root
+        delete_statuses: (optional) Jira statuses valid for deletion,
+            defaults to those of the deletion policy
     """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util import Retry
+
     log.info(f"Sending POST request to channel: #{channel}")
 
     http = requests.Session()
@@ -74,11 +93,8 @@ def post_message_to_slack(
         channel = "egg-test"
 
     # allowed states for Jira tickets to be in for automated deletion
-    jira_delete_status = [
-        "ALL SAMPLES RELEASED",
-        "DATA CANNOT BE PROCESSED",
-        "DATA CANNOT BE RELEASED",
-    ]
+    if delete_statuses is None:
+        delete_statuses = get_policy().delete_statuses
 
     # complicated msg sending where message is a dict which need to be
     # compiled into multiple Slack messages (if too long)
@@ -92,6 +108,8 @@ def post_message_to_slack(
 
     for run, body in data.items():
         seq = body["seq"]
+        # runs from before multiple roots were supported have no root
+        path = os.path.join(body.get("root", "/genetics"), seq, run)
         key = body["key"]
         status = body["status"]
         assay = body["assay"]
@@ -111,7 +129,7 @@ def post_message_to_slack(
             if duration.days > 1 and key is None:
                 # if there's no Jira ticket and run is older than 1 day
                 final_msg.append(
-                    f"`/genetics/{seq}/{run}`\n"
+                    f"`{path}`\n"
                     "Run is missing associated Jira ticket"
                 )
                 final_msg.append(
@@ -123,18 +141,30 @@ def post_message_to_slack(
             elif not uploaded:
                 # not found run data in StagingArea52
                 final_msg.append(
-                    f"`/genetics/{seq}/{run}`\n"
+                    f"`{path}`\n"
                     "Run does not appear to have uploaded to StagingArea52\n"
                 )
-            elif not project:
-                # does not appear to be a 002 project
+            elif (body.get("manifest") or {}).get("mismatch"):
+                # uploaded files don't cover the local run
+                final_msg.append(
+                    f"`{path}`\n"
+                    "Run upload to StagingArea52 appears incomplete: "
+                    f"{body['manifest']['mismatch']}\n"
+                )
+            elif (body.get("checksums") or {}).get("mismatch"):
+                # local files not verified against their upload
                 final_msg.append(
-                    f"`/genetics/{seq}/{run}`\n" "Run has no 002 project\n"
+                    f"`{path}`\n"
+                    "Run files not verified against their upload to "
+                    f"StagingArea52: {body['checksums']['mismatch']}\n"
                 )
+            elif not project:
+                # does not appear to be a 002 project
+                final_msg.append(f"`{path}`\nRun has no 002 project\n")
             elif key == "Multiple":
                 # Found more than one Jira ticket for the given run ID
                 final_msg.append(
-                    f"`/genetics/{seq}/{run}`\n"
+                    f"`{path}`\n"
                     "Run has more than one matching Jira ticket\n"
                 )
                 final_msg.append(
@@ -142,13 +172,16 @@ def post_message_to_slack(
                     f">{duration.days // 7} weeks "
                     f"{duration.days % 7} days ago\n"
                 )
-            elif (int(duration.days) >= int(n_weeks * 7)) and (
-                status.upper().replace("_", " ") not in jira_delete_status
+            elif (
+                int(duration.days)
+                >= int(body.get("retention_weeks", n_weeks) * 7)
+            ) and (
+                status.upper().replace("_", " ") not in delete_statuses
             ):
                 # run is old enough to be deleted but ticket
                 # not in done state => alert us
                 final_msg.append(
-                    f"`/genetics/{seq}/{run}`\n"
+                    f"`{path}`\n"
                     "Jira ticket not in closed state "
                     f"<{jira_url}{key}|{status}>"
                 )
@@ -177,7 +210,7 @@ def post_message_to_slack(
             duration = today - created_dt
 
             final_msg.append(
-                f"`/genetics/{seq}/{run}`\n"
+                f"`{path}`\n"
                 f"<{jira_url}{key}|{status}> | {assay} | {sizeof_fmt(size)}"
             )
             final_msg.append(
@@ -227,6 +260,38 @@ def post_message_to_slack(
         # currently should not reach here since we control the action param
         raise RuntimeError(f"Action parameter not supported: {action}")
 
+    if filesystems and len(filesystems) > 1:
+        # more than one genetics root => add the usage of each
+        for root, (total, used, _) in filesystems.items():
+            pretext += (
+                f"\n{root}: {sizeof_fmt(used)}/{sizeof_fmt(total)} | "
+                f"{used / total * 100:.2f}%"
+            )
+
+            if action == "delete":
+                root_size = sum(
+                    int(x["size"])
+                    for x in data.values()
+                    if x.get("root") == root
+                )
+                pretext += (
+                    f" ({(used - root_size) / total * 100:.2f}% after "
+                    "deletion)"
+                )
+
+    if days_until_full is not None:
+        pretext += (
+            "\nProjected days until full at current fill rate: "
+            f"{days_until_full:.0f}"
+        )
+
+    if totals:
+        pretext += (
+            f"\nUsage by sequencer:\n{format_totals(totals, 'sequencers')}"
+            "\nUsage by assay (runs looked up in Jira only):\n"
+            f"{format_totals(totals, 'assays')}"
+        )
+
     # number above 7,700 seems to get weird truncation
     if len(text_data) < 7700:
         try:
@@ -322,6 +387,8 @@ def dx_login(token: str) -> bool:
     Output: boolean
     """
 
+    import dxpy as dx
+
     try:
         DX_SECURITY_CONTEXT = {
             "auth_token_type": "Bearer",
@@ -350,11 +417,13 @@ def check_run_uploaded(directory: str) -> bool:
         boolean
     """
 
+    import dxpy as dx
+
     # should return data if there's a file
     # return None if no file
     dx_obj = dx.find_one_data_object(
         zero_ok=True,
-        project="project-FpVG0G84X7kzq58g19vF1YJQ",
+        project=STAGING_PROJECT,
         folder=f"/{directory}",
     )
 
@@ -364,7 +433,7 @@ def check_run_uploaded(directory: str) -> bool:
     # check /processed directory in staging52 too
     dx_obj = dx.find_one_data_object(
         zero_ok=True,
-        project="project-FpVG0G84X7kzq58g19vF1YJQ",
+        project=STAGING_PROJECT,
         folder=f"/processed/{directory}",
     )
 
@@ -374,6 +443,93 @@ def check_run_uploaded(directory: str) -> bool:
     return False
 
 
+def get_upload_manifest(directory: str) -> dict:
+    """
+    Function to get the number and total size of the files uploaded for
+    a run to stagingArea52, from one paged search of the run's folder
+    (or its folder in /processed) describing only the name, size and
+    state of each file
+
+    Input:
+        directory: run ID
+    Return:
+        dict of number of files, total bytes and number of files not
+        yet closed (i.e. still uploading)
+    """
+
+    import dxpy as dx
+
+    files = []
+
+    for folder in [f"/{directory}", f"/processed/{directory}"]:
+        files = list(
+            dx.find_data_objects(
+                classname="file",
+                project=STAGING_PROJECT,
+                folder=folder,
+                recurse=True,
+                describe={
+                    "fields": {"name": True, "size": True, "state": True}
+                },
+            )
+        )
+
+        if files:
+            break
+
+    return {
+        "files": len(files),
+        "bytes": sum(x["describe"].get("size", 0) for x in files),
+        "open": sum(x["describe"].get("state") != "closed" for x in files),
+    }
+
+
+def get_uploaded_parts(directory: str) -> dict:
+    """
+    Function to get the MD5 of each part of the files uploaded for a
+    run to stagingArea52, from one paged search of the run's folder (or
+    its folder in /processed)
+
+    Input:
+        directory: run ID
+    Return:
+        dict of file path relative to the run folder to list of the
+        size and MD5 of each of its parts, in order
+    """
+
+    import dxpy as dx
+
+    for folder in [f"/{directory}", f"/processed/{directory}"]:
+        files = list(
+            dx.find_data_objects(
+                classname="file",
+                project=STAGING_PROJECT,
+                folder=folder,
+                recurse=True,
+                describe={
+                    "fields": {"name": True, "folder": True, "parts": True}
+                },
+            )
+        )
+
+        if files:
+            break
+
+    uploaded = {}
+
+    for file in files:
+        describe = file["describe"]
+        parts = describe.get("parts") or {}
+        sub_folder = describe["folder"][len(folder) :].strip("/")
+
+        uploaded[os.path.join(sub_folder, describe["name"])] = [
+            (parts[x]["size"], parts[x]["md5"])
+            for x in sorted(parts, key=int)
+        ]
+
+    return uploaded
+
+
 def get_describe_data(project: str) -> list:
     """
     Function to see if there is 002 project and its describe data
@@ -383,6 +539,7 @@ def get_describe_data(project: str) -> list:
     Return:
         dict of project describe data
     """
+    import dxpy as dx
 
     projects = list(
         dx.search.find_projects(
@@ -521,7 +678,7 @@ def check_age(date: dt.datetime, today: dt.datetime, week: int) -> bool:
 
     Return: boolean
     """
-    return date + relativedelta(weeks=+int(week)) < today
+    return date + dt.timedelta(weeks=int(week)) < today
 
 
 def clear_memory(pickle_path: str) -> None:
@@ -539,7 +696,8 @@ def clear_memory(pickle_path: str) -> None:
 def sizeof_fmt(num: int, suffix="B") -> str:
     """
     Function to turn bytes to human readable file size format
-    Taken from https://stackoverflow.com/questions/1094841/get-human-readable-version-of-file-size
+    Taken from https://stackoverflow.com/questions/1094841 (get human
+    readable version of file size)
     Input:
         num: bytes
         suffix: default B, (optional)
@@ -554,6 +712,23 @@ def sizeof_fmt(num: int, suffix="B") -> str:
     return f"{num:.1f}Yi{suffix}"
 
 
+def format_totals(totals: dict, group: str) -> str:
+    """
+    Function to format the per sequencer or per assay totals as text
+    Inputs:
+        totals: totals from plan.get_totals()
+        group: sequencers or assays
+
+    Return: one line per sequencer / assay
+    """
+    return "\n".join(
+        f"{name}: {sizeof_fmt(x['bytes'])} | {x['runs']} runs"
+        + (f" ({x['unsized']} unsized)" if x.get("unsized") else "")
+        + f" | oldest {x['oldest_run']} ({x['oldest']})"
+        for name, x in totals[group].items()
+    )
+
+
 def get_size(path: str) -> int:
     """
     Function to get size of directory
@@ -0,0 +1,562 @@
+"""
+Watcher keeping a live inventory of run directories and
+dx-streaming-upload logs, for use in daemon mode in place of listing
+every directory with get_runs() on each cycle.
+
+Uses Linux inotify (through ctypes, no extra dependencies) on each
+ANSIBLE_GENETICDIR/<seq> and ANSIBLE_LOGSDIR/<seq> directory. Runs still
+being sequenced have every directory within them watched, so files
+written to lanes and cycles mark the run as changed, whilst finished
+runs only have their top level watched to keep within the inotify watch
+limit. A run's directories stop being watched once the sequencer writes
+its completion marker. Sequencer directories not present are retried at
+the poll interval. Falls back to polling the directories at a fixed
+interval where inotify is unavailable (or the watch limit is reached),
+polling only sees the top level of each run and its upload log.
+"""
+
+import ctypes
+import ctypes.util
+from datetime import datetime
+import errno
+import os
+import select
+import struct
+import threading
+from time import monotonic
+
+from .helper import get_logger
+from .scan import COMPLETION_MARKERS, get_activity
+
+log = get_logger("watcher log")
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+
+# struct inotify_event {int wd; uint32 mask; uint32 cookie; uint32 len;}
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def load_inotify():
+    """
+    Load the inotify functions from libc
+
+    Returns
+    -------
+    ctypes.CDLL | None
+        libc with inotify functions, None if inotify is unavailable
+    """
+    try:
+        libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        libc.inotify_init1
+        libc.inotify_add_watch
+        libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+
+    return libc
+
+
+class RunWatcher:
+    """
+    Live inventory of run directories and upload logs per sequencer
+
+    Parameters
+    ----------
+    seqs : list
+        list of sequencer IDs
+    genetics_dir : str
+        parent path to run directories
+    logs_dir : str
+        parent path to dx-streaming-upload log directory
+    poll_interval : int
+        seconds between polls when inotify is unavailable
+    use_inotify : bool
+        if to use inotify when available, set False to force polling
+    """
+
+    def __init__(
+        self,
+        seqs,
+        genetics_dir,
+        logs_dir,
+        poll_interval=300,
+        use_inotify=True,
+    ):
+        self.seqs = seqs
+        self.genetics_dir = genetics_dir
+        self.logs_dir = logs_dir
+        self.poll_interval = poll_interval
+
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        # run ID -> sequencer, run ID -> mtime and log run ID -> mtime
+        self.runs = {}
+        self.run_mtimes = {}
+        self.logs = {}
+        self.changed = set()
+
+        # inotify state, watch descriptor -> (type, sequencer, run, path),
+        # run ID -> set of watch descriptors of its directories, runs with
+        # every directory watched and (type, sequencer) of the sequencer
+        # directories not found to watch
+        self.libc = load_inotify() if use_inotify else None
+        self.fd = None
+        self.watches = {}
+        self.run_watches = {}
+        self.recursive = set()
+        self.missing = set()
+
+        self.rescan()
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self.fd is not None else "polling"
+
+    def scan(self) -> tuple:
+        """
+        List the current run directories and logs with their mtimes
+
+        Returns
+        -------
+        tuple
+            dicts of run -> sequencer, run -> mtime and log run -> mtime
+        """
+        runs = {}
+        run_mtimes = {}
+        logs = {}
+
+        for seq in self.seqs:
+            try:
+                with os.scandir(os.path.join(self.genetics_dir, seq)) as it:
+                    for entry in it:
+                        run = entry.name.strip()
+                        runs[run] = seq
+                        run_mtimes[run] = entry.stat().st_mtime
+            except FileNotFoundError:
+                # sequencer directory not (yet) present => no runs
+                log.warning(f"{seq} not found in {self.genetics_dir}")
+
+            try:
+                with os.scandir(os.path.join(self.logs_dir, seq)) as it:
+                    for entry in it:
+                        logs[self.log_to_run(entry.name)] = (
+                            entry.stat().st_mtime
+                        )
+            except FileNotFoundError:
+                log.warning(f"{seq} not found in {self.logs_dir}")
+
+        return runs, run_mtimes, logs
+
+    @staticmethod
+    def log_to_run(name) -> str:
+        """
+        Get the run ID from a dx-streaming-upload log file name, in the
+        same way as get_runs() (i.e. run.<run ID>.lane.all.log)
+        """
+        return name.split(".")[1].strip()
+
+    def rescan(self) -> None:
+        """
+        Rescan all directories, marking any runs with a different
+        mtime to the last scan as changed
+        """
+        runs, run_mtimes, logs = self.scan()
+
+        with self.lock:
+            for run in set(run_mtimes) | set(self.run_mtimes):
+                if run_mtimes.get(run) != self.run_mtimes.get(run):
+                    self.changed.add(run)
+
+            for run in set(logs) | set(self.logs):
+                if logs.get(run) != self.logs.get(run):
+                    self.changed.add(run)
+
+            self.runs = runs
+            self.run_mtimes = run_mtimes
+            self.logs = logs
+
+    def snapshot(self) -> tuple:
+        """
+        Get the current inventory in the same format as get_runs()
+
+        Returns
+        -------
+        genetic_directory : list
+            list of identified run directories
+        logs_directory : list
+            list of run IDs with log files identified
+        tmp_seq : dict
+            mapping of run directory to sequencer ID it came from
+        """
+        with self.lock:
+            return list(self.runs), list(self.logs), dict(self.runs)
+
+    def pop_changed(self) -> set:
+        """
+        Get the runs added, removed or modified since the last call
+
+        Returns
+        -------
+        set
+            set of changed run IDs
+        """
+        with self.lock:
+            changed = self.changed
+            self.changed = set()
+
+        return changed
+
+    def add_watch(self, path, watch_type, seq, run=None) -> bool:
+        """
+        Add an inotify watch on the given path, sequencer directories
+        not found are added to those to retry
+
+        Returns
+        -------
+        bool
+            True if the watch was added
+        """
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(path), WATCH_MASK
+        )
+
+        if wd < 0:
+            err = ctypes.get_errno()
+
+            if err == errno.ENOSPC:
+                # run out of inotify watches => can't reliably watch
+                raise OSError(err, "inotify watch limit reached")
+
+            if err == errno.ENOENT and not run:
+                self.missing.add((watch_type, seq))
+
+            log.warning(f"Unable to watch {path}: {os.strerror(err)}")
+            return False
+
+        self.watches[wd] = (watch_type, seq, run, path)
+
+        if run:
+            self.run_watches.setdefault(run, set()).add(wd)
+
+        return True
+
+    def is_active(self, run) -> bool:
+        """
+        Check if a run is still being sequenced, from its mtime and
+        completion markers as for skipping active runs
+        """
+        seq = self.runs.get(run)
+        mtime = self.run_mtimes.get(run)
+
+        if seq is None or mtime is None:
+            # only just created => still being written
+            return True
+
+        run_path = os.path.join(self.genetics_dir, seq, run)
+
+        return bool(get_activity(run_path, mtime, None, datetime.now()))
+
+    def add_run_watches(self, path, seq, run, recursive=True) -> None:
+        """
+        Add inotify watches on a run directory and, if recursive, every
+        directory within it, or on a directory created within a run
+        """
+        if not recursive:
+            self.add_watch(path, "run", seq, run)
+            return
+
+        self.recursive.add(run)
+
+        for dir_path, _, _ in os.walk(path):
+            self.add_watch(dir_path, "run", seq, run)
+
+    def remove_run_subwatches(self, run) -> None:
+        """
+        Stop watching the directories within a run once it has finished,
+        keeping the watch on the run directory itself
+        """
+        self.recursive.discard(run)
+
+        for wd in list(self.run_watches.get(run, [])):
+            _, seq, _, path = self.watches[wd]
+
+            if path != os.path.join(self.genetics_dir, seq, run):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                self.watches.pop(wd)
+                self.run_watches[run].discard(wd)
+
+    def watch_seq_runs(self, seq) -> None:
+        """
+        Add watches on the runs of a sequencer not already watched
+        """
+        for run, run_seq in self.snapshot()[2].items():
+            run_path = os.path.join(self.genetics_dir, seq, run)
+
+            if (
+                run_seq == seq
+                and run not in self.run_watches
+                and os.path.isdir(run_path)
+            ):
+                self.add_run_watches(
+                    run_path, seq, run, recursive=self.is_active(run)
+                )
+
+    def retry_missing(self) -> None:
+        """
+        Retry watching the sequencer directories not found previously,
+        rescanning to pick up the runs of any now found
+        """
+        found = []
+
+        for watch_type, seq in sorted(self.missing):
+            if watch_type == "genetics":
+                path = os.path.join(self.genetics_dir, seq)
+            else:
+                path = os.path.join(self.logs_dir, seq)
+
+            if os.path.isdir(path) and self.add_watch(path, watch_type, seq):
+                log.info(f"Watching {path} now found")
+                self.missing.discard((watch_type, seq))
+                found.append((watch_type, seq))
+
+        if found:
+            self.rescan()
+
+            for watch_type, seq in found:
+                if watch_type == "genetics":
+                    self.watch_seq_runs(seq)
+
+    def start_inotify(self) -> bool:
+        """
+        Set up inotify watches on all sequencer and run directories
+
+        Returns
+        -------
+        bool
+            True if inotify was set up, False if unavailable
+        """
+        if not self.libc:
+            return False
+
+        fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if fd < 0:
+            log.warning(
+                f"inotify unavailable: {os.strerror(ctypes.get_errno())}"
+            )
+            return False
+
+        self.fd = fd
+
+        try:
+            for seq in self.seqs:
+                self.add_watch(
+                    os.path.join(self.genetics_dir, seq), "genetics", seq
+                )
+                self.add_watch(os.path.join(self.logs_dir, seq), "logs", seq)
+                self.watch_seq_runs(seq)
+        except OSError as err:
+            log.warning(f"Falling back to polling: {err}")
+            os.close(self.fd)
+            self.fd = None
+            self.watches = {}
+            self.run_watches = {}
+            self.recursive = set()
+            self.missing = set()
+
+            return False
+
+        return True
+
+    def handle_event(self, wd, mask, name) -> None:
+        """
+        Update the inventory from a single inotify event
+        """
+        if mask & IN_Q_OVERFLOW:
+            # events were dropped => rescan everything
+            log.warning("inotify event queue overflowed, rescanning")
+            self.rescan()
+            return
+
+        if wd not in self.watches:
+            return
+
+        watch_type, seq, run, watch_path = self.watches[wd]
+
+        if mask & IN_IGNORED:
+            # watch removed, i.e. the directory was deleted
+            self.watches.pop(wd)
+
+            if run in self.run_watches:
+                self.run_watches[run].discard(wd)
+
+                if not self.run_watches[run]:
+                    self.run_watches.pop(run)
+                    self.recursive.discard(run)
+            return
+
+        if watch_type == "run":
+            with self.lock:
+                self.changed.add(run)
+
+            created = mask & (IN_CREATE | IN_MOVED_TO)
+
+            if name in COMPLETION_MARKERS and created:
+                # run finished sequencing => only watch its top level
+                self.remove_run_subwatches(run)
+            elif (
+                name and mask & IN_ISDIR and created and run in self.recursive
+            ):
+                # new lane / cycle directory => watch it too
+                try:
+                    self.add_run_watches(
+                        os.path.join(watch_path, name), seq, run
+                    )
+                except OSError as err:
+                    log.warning(f"Unable to watch new directory: {err}")
+            return
+
+        if not name:
+            return
+
+        if watch_type == "genetics":
+            path = os.path.join(self.genetics_dir, seq, name)
+
+            with self.lock:
+                self.changed.add(name)
+
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.runs.pop(name, None)
+                    self.run_mtimes.pop(name, None)
+                    return
+
+                self.runs[name] = seq
+
+            if (
+                mask & (IN_CREATE | IN_MOVED_TO)
+                and mask & IN_ISDIR
+                and name not in self.run_watches
+            ):
+                try:
+                    self.add_run_watches(path, seq, name)
+                except OSError as err:
+                    log.warning(f"Unable to watch new run {path}: {err}")
+
+        elif watch_type == "logs":
+            try:
+                run = self.log_to_run(name)
+            except IndexError:
+                return
+
+            with self.lock:
+                self.changed.add(run)
+
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.logs.pop(run, None)
+                else:
+                    self.logs[run] = None
+
+    def read_events(self) -> None:
+        """
+        Read and handle all pending inotify events
+        """
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            self.handle_event(wd, mask, os.fsdecode(name))
+
+    def run(self) -> None:
+        """
+        Watch loop, run in a background thread by start()
+        """
+        last_retry = monotonic()
+
+        while not self.stop_event.is_set():
+            if self.fd is not None:
+                ready, _, _ = select.select([self.fd], [], [], 1.0)
+
+                if ready:
+                    self.read_events()
+
+                if (
+                    self.missing
+                    and monotonic() - last_retry > self.poll_interval
+                ):
+                    last_retry = monotonic()
+
+                    try:
+                        self.retry_missing()
+                    except OSError as err:
+                        log.warning(f"Unable to watch sequencer: {err}")
+            else:
+                if self.stop_event.wait(self.poll_interval):
+                    break
+
+                self.rescan()
+
+    def start(self):
+        """
+        Start watching in a background thread, using inotify where
+        available and polling otherwise
+        """
+        self.start_inotify()
+
+        log.info(
+            f"Watching {len(self.runs)} runs across {len(self.seqs)} "
+            f"sequencers using {self.mode}"
+        )
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop watching and close the inotify file descriptor
+        """
+        self.stop_event.set()
+
+        if self.thread:
+            self.thread.join()
+
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -1,8 +1,14 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+import json
 import os
 import pickle
 import shutil
+import sqlite3
 import sys
+from time import perf_counter
 from types import SimpleNamespace
 
 from bin.util import (
@@ -16,16 +22,44 @@ from bin.util import (
     clear_memory,
     get_describe_data,
     get_size,
+    get_upload_manifest,
+    get_uploaded_parts,
     get_date,
     get_duration,
-    get_runs,
+    sizeof_fmt,
+    format_totals,
 )
 
-from bin.helper import get_logger
-from bin.jira import Jira
+from bin.helper import get_logger, get_monitoring_dir
+from bin import plan, scan
+from bin.checksum import CHECKSUM_CACHE, ChecksumEngine
+from bin.decision_log import DECISION_LOG, DecisionLog
+from bin.evidence import RunEvidence
+from bin.history import HISTORY_DB, HistoryStore
+from bin.size_estimate import SizeEstimator
+from bin.size_index import SIZE_INDEX_CACHE, SizeIndex
+from bin.policy import get_policy
+from bin.run_metadata import (
+    RUN_METADATA_CACHE,
+    RunMetadataIndex,
+    get_run_date,
+)
 
 log = get_logger("main log")
 
+# runs verified concurrently ahead of the run being deleted
+VERIFY_WORKERS = 4
+
+# minimum size of the files uploaded for a run relative to the local run,
+# the run is uploaded as gzipped tarballs but the bulk of it (the base
+# calls) is already compressed so compresses little further
+MIN_UPLOAD_FRACTION = 0.5
+
+# minimum size of the files checksummed for a run relative to the local
+# run for its content to count as verified, the bulk of a run is uploaded
+# as tarballs with no local copy to check
+MIN_CHECKSUM_FRACTION = 0.5
+
 
 def get_env_variables() -> SimpleNamespace:
     """
@@ -77,28 +111,154 @@ def get_env_variables() -> SimpleNamespace:
         f"{', '.join(missing)}"
     )
 
-    # fix required types
-    selected_env.seqs = [x.strip() for x in selected_env.seqs.split(",")]
+    # fix required types, multiple genetics roots may be given by
+    # separating the values for each root with ';'
+    genetics_dirs = [x.strip() for x in selected_env.genetics_dir.split(";")]
+    logs_dirs = [x.strip() for x in selected_env.logs_dir.split(";")]
+    seqs = [
+        [seq.strip() for seq in x.split(",")]
+        for x in selected_env.seqs.split(";")
+    ]
+    weeks = [int(x) for x in selected_env.ansible_week.split(";")]
+
+    if len(weeks) == 1:
+        # same number of weeks for every root
+        weeks = weeks * len(genetics_dirs)
+
+    assert len(genetics_dirs) == len(logs_dirs) == len(seqs) == len(weeks), (
+        "Error - ANSIBLE_GENETICDIR, ANSIBLE_LOGSDIR, ANSIBLE_SEQ and "
+        "ANSIBLE_WEEK must have the same number of ';' separated values"
+    )
+
+    selected_env.roots = [
+        SimpleNamespace(
+            genetics_dir=genetics_dir,
+            logs_dir=logs_dir,
+            seqs=root_seqs,
+            ansible_week=week,
+        )
+        for genetics_dir, logs_dir, root_seqs, week in zip(
+            genetics_dirs, logs_dirs, seqs, weeks
+        )
+    ]
+    selected_env.genetics_dirs = genetics_dirs
+
+    # only the per root values should be used from here
+    del selected_env.genetics_dir, selected_env.logs_dir, selected_env.seqs
     selected_env.jira_assay = [
         x.strip() for x in selected_env.jira_assay.split(",")
     ]
 
+    # deletion rules, from ANSIBLE_POLICY if set
+    selected_env.policy = get_policy(selected_env.jira_assay)
+
+    # if to estimate run sizes from their geometry, runs to delete are
+    # always sized exactly
+    selected_env.size_mode = os.environ.get("ANSIBLE_SIZE_MODE", "exact")
+
+    assert selected_env.size_mode in ["exact", "estimate"], (
+        "Error - ANSIBLE_SIZE_MODE must be one of exact or estimate"
+    )
+
+    # MB/s to cap checksum verification reads to, 0 for no cap
+    selected_env.checksum_rate = int(
+        os.environ.get("ANSIBLE_CHECKSUM_RATE", 100)
+    )
+
+    assert selected_env.checksum_rate >= 0, (
+        "Error - ANSIBLE_CHECKSUM_RATE must not be negative"
+    )
+
     selected_env.server_testing = (
         True if selected_env.server_testing.lower() == "true" else False
     )
     selected_env.debug = (
         True if selected_env.debug.lower() == "true" else False
     )
-    selected_env.ansible_week = int(selected_env.ansible_week)
+    # shortest number of weeks across the roots, used for the Slack alerts
+    selected_env.ansible_week = min(weeks)
 
     return selected_env
 
 
+def get_disk_usage(genetics_dirs) -> tuple:
+    """
+    Get the disk usage of each genetics root and in total, roots on the
+    same filesystem are only counted once towards the total
+
+    Parameters
+    ----------
+    genetics_dirs : list
+        list of genetics root directories
+
+    Returns
+    -------
+    tuple
+        total, used and free bytes across all filesystems
+    dict
+        mapping of each genetics root to its disk usage
+    """
+    filesystems = {}
+    devices = {}
+
+    for genetics_dir in genetics_dirs:
+        filesystems[genetics_dir] = shutil.disk_usage(genetics_dir)
+        devices.setdefault(
+            os.stat(genetics_dir).st_dev, filesystems[genetics_dir]
+        )
+
+    usage = tuple(sum(x) for x in zip(*devices.values()))
+
+    return usage, filesystems
+
+
+def get_manual_review_reason(
+    uploaded, project_data, status, assay, key, jira_assay, delete_statuses
+) -> str:
+    """
+    Get the reason a run old enough to delete was not automatically
+    flagged for deletion
+
+    Parameters
+    ----------
+    uploaded : bool
+        if run found in StagingArea52
+    project_data : dict
+        describe data of the 002 project, empty if none found
+    status : str
+        Jira ticket status
+    assay : str
+        Jira ticket assay
+    key : str
+        Jira ticket key, None if no ticket and 'Multiple' if more than one
+    jira_assay : list
+        list of Jira assay codes we automatically delete runs for
+    delete_statuses : list
+        Jira statuses valid for deletion from the deletion policy
+
+    Returns
+    -------
+    str
+        reason for requiring manual review
+    """
+    if key is None:
+        return "no Jira ticket found"
+    elif key == "Multiple":
+        return "more than one Jira ticket found"
+    elif not uploaded:
+        return "not uploaded to StagingArea52"
+    elif assay not in jira_assay:
+        return f"assay {assay} not automatically deleted"
+    elif status.upper() not in delete_statuses:
+        return f"Jira status {status.upper()} not valid for deletion"
+    elif not project_data:
+        return "no 002 project found"
+    else:
+        return "did not meet deletion criteria"
+
+
 def check_for_deletion(
-    seqs,
-    genetics_dir,
-    logs_dir,
-    ansible_week,
+    roots,
     server_testing,
     slack_token,
     pickle_file,
@@ -106,7 +266,15 @@ def check_for_deletion(
     jira_assay,
     jira_url,
     jira,
-) -> None:
+    dry_run=False,
+    notify_day=1,
+    inventory=None,
+    size_cache=None,
+    policy=None,
+    full_evidence=False,
+    size_mode="exact",
+    checksum_rate=None,
+) -> dict:
     """
     Check for runs to delete, will be called everyday and check for
     runs that can be automatically deleted against the following criteria:
@@ -119,20 +287,22 @@ def check_for_deletion(
             - DATA CANNOT BE PROCESSED
             - DATA CANNOT BE RELEASED
 
+    These are the default deletion policy rules, the rules may instead
+    be given in a policy file (see bin/policy.py).
+
     Any runs that are old enough but do not meet the above criteria will
     be added to a Slack alert for manual review. The pickle file will
-    only be updated on a Monday ahead of deletion on the Wednesday
+    only be updated on the notification day (Monday by default) ahead
+    of deletion on the Wednesday
+
+    Each genetics root is checked concurrently, with a single set of
+    notifications covering all of them
 
     Inputs
     ------
-    seqs : list
-        list of sequencer IDs to check runs against
-    genetics_dir : str
-        parent path to run directories
-    logs_dir : str
-        parent path to dx-streaming-upload log directory
-    ansible_week : int
-        number of weeks at which to automatically delete a run
+    roots : list
+        list of genetics roots from get_env_variables(), each with the
+        genetics_dir, logs_dir, seqs and ansible_week to check it with
     server_testing : bool
         if running on server, if true will check for Jira tickets
         on the production helpdesk instead of development helpdesk
@@ -148,393 +318,1558 @@ def check_for_deletion(
         URL endpoint for our Jira
     jira : jira.Jira
         Jira class object for querying Jira
+    dry_run : bool
+        if True, only build the plan and don't write the pickle file,
+        caches or usage history, or send any Slack notifications
+    notify_day : int
+        ISO weekday to update the pickle file and send Slack alerts on,
+        if None these will be done on any day
+    inventory : dict
+        (optional) mapping of genetics_dir to run inventory in the same
+        format as returned from get_runs() (i.e. from a RunWatcher) to
+        use instead of listing the run and log directories
+    size_cache : dict
+        (optional) mapping of run path to previously calculated size
+        to reuse, runs not in the cache are sized and added to it
+    policy : bin.policy.Policy
+        (optional) deletion policy to check runs against, defaults to
+        the policy from get_policy()
+    full_evidence : bool
+        if True, make every check for every run for reporting, instead
+        of only the checks needed to decide each run
+    size_mode : str
+        exact to size every run checked by walking it, or estimate to
+        estimate sizes from the run geometry where possible and only
+        exactly size runs to delete
+    checksum_rate : int
+        (optional) MB/s to cap reads to when verifying the checksums of
+        runs to delete of the policy's checksum_assays
 
     Outputs
     -------
     file
         pickle file with details on runs to automatically delete store in
+    file
+        JSON lines decision log with a record for every run checked
+
+    Returns
+    -------
+    dict
+        deletion plan with the decision and reason for every run checked
     """
     to_delete = {}  # to store runs marked for deletion
     manual_review = {}  # to store runs that need manually reviewing
+    plan_runs = {}  # to store decisions for every run checked
 
-    genetic_directory, logs_directory, tmp_seq = get_runs(
-        seqs, genetics_dir, logs_dir
-    )
-
-    # get /genetic disk usage stat
-    init_usage = shutil.disk_usage(genetics_dir)
+    # get /genetic disk usage stat, in total and per root
+    init_usage, filesystems = get_disk_usage([x.genetics_dir for x in roots])
     today = datetime.today()
 
-    # Get the duplicates between two directories /genetics & /var/log/ =>
-    # valid sequencing runs that dx-streaming-upload has uploaded
-    local_runs = sorted(set(genetic_directory) & set(logs_directory))
+    decisions = DecisionLog(os.path.join(get_monitoring_dir(), DECISION_LOG))
 
-    log.info(f"Found {len(local_runs)} run directories")
+    if policy is None:
+        policy = get_policy(jira_assay)
 
-    for run in local_runs:
-        log.info(f"Checking state of {run}")
-        # check if run in stagingArea52 DNAnexus project
-        uploaded = check_run_uploaded(run)
+    run_metadata = RunMetadataIndex(
+        os.path.join(get_monitoring_dir(), RUN_METADATA_CACHE)
+    )
+    size_estimator = load_size_estimator()
+    size_index = SizeIndex(
+        os.path.join(get_monitoring_dir(), SIZE_INDEX_CACHE)
+    )
+    # dry runs don't read whole runs to hash them, the checksums of runs
+    # planned for deletion are verified when notifying from the plan
+    checksum_engine = (
+        None if dry_run else get_checksum_engine(checksum_rate)
+    )
 
-        # get the sequencer the run is from
-        seq = tmp_seq[run]
+    # check each root concurrently, these are largely spent waiting on
+    # the filesystem, Jira and DNAnexus
+    with ThreadPoolExecutor(max_workers=len(roots)) as executor:
+        results = executor.map(
+            lambda root: check_root(
+                root=root,
+                today=today,
+                server_testing=server_testing,
+                jira_assay=jira_assay,
+                jira=jira,
+                decisions=decisions,
+                dry_run=dry_run,
+                inventory=(inventory or {}).get(root.genetics_dir),
+                size_cache=size_cache,
+                policy=policy,
+                full_evidence=full_evidence,
+                run_metadata=run_metadata,
+                size_estimator=size_estimator,
+                estimate_sizes=size_mode == "estimate",
+                size_index=size_index,
+                checksum_engine=checksum_engine,
+            ),
+            roots,
+        )
 
-        # get run size
-        run_path = f"{genetics_dir}/{seq}/{run}"
-        run_size = get_size(run_path)
+        for root_delete, root_review, root_runs in results:
+            to_delete.update(root_delete)
+            manual_review.update(root_review)
+            plan_runs.update(root_runs)
 
-        # get 002 project describe data
-        project_data = get_describe_data(run)
+    decisions.close()
 
-        if project_data:
-            # found 002 project => generate link
-            trimmed_id = (
-                project_data.get("describe", "")
-                .get("id", "")
-                .replace("project-", "")
-            )
-            url = (
-                f"https://platform.dnanexus.com/panx/projects/"
-                f"{trimmed_id}/data"
-            )
-        else:
-            url = "NA"
+    if not dry_run:
+        # dry runs only plan, without updating any caches or history
+        run_metadata.save()
+        size_index.save()
+        record_run_sizes(today, size_estimator.new_samples)
 
-        # get run created date
-        created_date = get_date(os.path.getmtime(run_path))
-        created_on = created_date.strftime("%Y-%m-%d")
-        duration = get_duration(today, created_date)
+    deletion_plan = plan.build_plan(
+        plan_runs, init_usage, today, filesystems=filesystems
+    )
 
-        # check age of run
-        old_enough = check_age(created_date, today, ansible_week)
+    # record usage and forecast each filesystem filling, alerting on the
+    # first forecast to fill
+    forecasts = []
+
+    for root in roots:
+        days = record_usage_history(
+            root.genetics_dir,
+            today,
+            filesystems[root.genetics_dir],
+            seq_usage=plan.get_totals(
+                {
+                    run: details
+                    for run, details in plan_runs.items()
+                    if details["root"] == root.genetics_dir
+                }
+            )["sequencers"],
+            dry_run=dry_run,
+        )
+        deletion_plan["filesystems"][root.genetics_dir][
+            "days_until_full"
+        ] = days
 
-        # get run Jira details
-        assay, status, key = jira.get_issue_detail(run, server_testing)
+        if days is not None:
+            forecasts.append(days)
 
-        delete = False
+    days_until_full = min(forecasts) if forecasts else None
+    deletion_plan["usage"]["days_until_full"] = days_until_full
 
+    if dry_run:
+        # only planning => don't pickle or send anything
         log.info(
-            f"Following data found: old enough: {old_enough}; uploaded: "
-            f"{uploaded}; 002 project: {url}; Jira status: {status}"
+            f"Dry run: {len(to_delete)} runs would be deleted and "
+            f"{len(manual_review)} runs would need manual review"
         )
 
-        if not old_enough:
-            # run less than defined no. weeks to wait to delete => skip
-            log.info(
-                f"{run} {created_on} ::: {round(duration.days / 7, 2)}"
-                f" weeks - not old enough to delete"
-            )
-
-            continue
-
-        if uploaded:
-            # found uploaded run in StagingArea52 => check it has
-            # been processed and its Jira state
-            if (
-                project_data
-                and status.upper() == "ALL SAMPLES RELEASED"
-                and assay in jira_assay
-            ):
-                # run has been released and is an assay we automatically
-                # delete => flag for deletion
-                log.info(
-                    f"{run} {created_on} ::: {round(duration.days / 7, 2)}"
-                    f" weeks - flagged for deletion"
-                )
-
-                delete = True
-            elif (
-                status.upper()
-                in ["DATA CANNOT BE PROCESSED", "DATA CANNOT BE RELEASED"]
-                and assay in jira_assay
-            ):
-                # run uploaded and is an assay we automatically delete
-                # but either can't be processed or was processed but not
-                # released (i.e. low quality) => flag these to delete
-                log.info(
-                    f"{run} {created_on} ::: {round(duration.days / 7, 2)}"
-                    f" weeks - uploaded but not processed / released - "
-                    "flagged for deletion"
-                )
-                delete = True
-
-        if delete:
-            # enough criteria passed above to delete
-            to_delete[run] = {
-                "seq": seq,
-                "status": status,
-                "key": key,
-                "assay": assay,
-                "created": created_on,
-                "duration": round(duration.days / 7, 2),
-                "uploaded": uploaded,
-                "project": project_data,
-                "old_enough": old_enough,
-                "url": url,
-                "size": run_size,
-            }
-        else:
-            # run old enough to delete but not passed checks => flag
-            # up to review manually
-            log.info(
-                f"{run} {created_on} ::: {round(duration.days / 7, 2)}"
-                f" weeks - run not passed checks - flag for manual review"
-            )
-
-            manual_review[run] = {
-                "seq": seq,
-                "status": status,
-                "uploaded": uploaded,
-                "project": project_data,
-                "key": key,
-                "assay": assay,
-                "created": created_on,
-                "duration": round(duration.days / 7, 2),
-                "old_enough": old_enough,
-                "url": url,
-                "size": run_size,
-            }
-
-    if to_delete and today.isoweekday() == 1:
-        # found more than one run to delete and today is Monday =>
-        # update the pickle file for deletion on Wednesday
-        log.info("Writing runs flagged to delete into pickle file")
-        with open(pickle_file, "wb") as f:
-            pickle.dump(to_delete, f)
+        return deletion_plan
 
-        # alert us that some runs will be deleted on the next Wednesday
-        post_message_to_slack(
-            channel="egg-alerts",
-            token=slack_token,
-            data=to_delete,
+    if notify_day is None or today.isoweekday() == notify_day:
+        # today is the notification day (Monday by default) => update the
+        # pickle file for deletion and send the Slack alerts
+        send_notifications(
+            to_delete=to_delete,
+            manual_review=manual_review,
+            pickle_file=pickle_file,
+            slack_token=slack_token,
             debug=debug,
-            n_weeks=ansible_week,
+            ansible_week=min(x.ansible_week for x in roots),
             usage=init_usage,
             today=today,
             jira_url=jira_url,
-            action="delete",
+            days_until_full=days_until_full,
+            totals=deletion_plan["totals"],
+            filesystems=filesystems,
+            delete_statuses=policy.delete_statuses,
         )
 
-    if manual_review and today.isoweekday() == 1:
-        # found more than one run requiring manually reviewing, only
-        # send alerts for these on a Monday morning to not get too spammy
-        post_message_to_slack(
-            channel="egg-alerts",
-            token=slack_token,
-            data=manual_review,
-            debug=debug,
-            n_weeks=ansible_week,
-            usage=init_usage,
-            today=today,
-            jira_url=jira_url,
-            action="manual",
-        )
+    return deletion_plan
 
 
-def delete_runs(
-    pickle_file,
-    genetics_dir,
-    jira_project_id,
-    jira_reporter_id,
-    slack_token,
+def check_root(
+    root,
+    today,
     server_testing,
-    debug,
+    jira_assay,
     jira,
-) -> None:
+    decisions,
+    dry_run=False,
+    inventory=None,
+    size_cache=None,
+    policy=None,
+    full_evidence=False,
+    run_metadata=None,
+    size_estimator=None,
+    estimate_sizes=False,
+    size_index=None,
+    checksum_engine=None,
+) -> tuple:
     """
-    Delete the specified runs in the pickle file that have been
-    previously checked and flagged for automatic deletion
+    Check the runs in a single genetics root for deletion
 
     Inputs
     ------
-    pickle : str
-        pickle file with runs to be deleted
-    genetics_dir : str
-        parent dir of sequencing runs
-    jira_project_id : str
-        ID of Jira project
-    jira_reporter_id : str
-        ID reporting to Jira as
-    slack_token : str
-        Slack API token
+    root : SimpleNamespace
+        genetics root with the genetics_dir, logs_dir, seqs and
+        ansible_week to check it with
+    today : datetime
+        date of checking
     server_testing : bool
-        controls if running test
-    debug : bool
-        controls debug level
-    jira : Jira
-        jira.Jira object
-    """
-    deleted_details = dict()
-    deleted_runs = []
+        if running on server, if true will check for Jira tickets
+        on the production helpdesk instead of development helpdesk
+    jira_assay : list
+        list of Jira assay codes we automatically delete runs for
+    jira : jira.Jira
+        Jira class object for querying Jira
+    decisions : DecisionLog
+        decision log to record each run's decision in
+    dry_run : bool
+        if the check is a dry run
+    inventory : tuple
+        (optional) run inventory of the root in the same format as
+        returned from get_runs() to use instead of listing directories
+    size_cache : dict
+        (optional) mapping of run path to previously calculated size
+    policy : bin.policy.Policy
+        (optional) deletion policy to check runs against, defaults to
+        the policy from get_policy()
+    full_evidence : bool
+        if True, make every check for every run for reporting
+    run_metadata : bin.run_metadata.RunMetadataIndex
+        (optional) index of run metadata to date runs from, runs
+        without metadata (or if not given) are dated from their mtime
+    size_estimator : bin.size_estimate.SizeEstimator
+        (optional) estimator to add the exact sizes of runs to, and to
+        estimate sizes from if estimate_sizes is set
+    estimate_sizes : bool
+        if True, estimate run sizes from their geometry where possible
+        instead of walking them, runs to delete are still sized exactly
+    size_index : bin.size_index.SizeIndex
+        (optional) index of run subtree sizes to size runs from, only
+        listing the directories changed since last sized
+    checksum_engine : bin.checksum.ChecksumEngine
+        (optional) engine to verify the checksums of runs to delete of
+        the policy's checksum_assays with, if not given these runs are
+        left to be verified when notifying
 
-    # allowed states for Jira tickets to be in for automated deletion
-    jira_delete_status = [
-        "ALL SAMPLES RELEASED",
-        "DATA CANNOT BE PROCESSED",
-        "DATA CANNOT BE RELEASED",
-    ]
+    Returns
+    -------
+    tuple
+        dicts of runs to delete, runs for manual review and the
+        decisions for every run checked
+    """
+    to_delete = {}
+    manual_review = {}
+    plan_runs = {}
 
-    # get /genetic disk usage stat
-    init_usage = shutil.disk_usage(genetics_dir)
-    today = datetime.today()
+    if policy is None:
+        policy = get_policy(jira_assay)
 
-    if today.isoweekday() != 3:
-        # today is not a Wednesday => don't do anything
-        log.info(
-            f"Today is {today.strftime('%A')} therefore no "
-            "deletion will be performed"
+    # runs are listed and their age checked as each sequencer directory
+    # is read, ahead of the slower checks below
+    if inventory:
+        candidates = scan.iter_inventory(inventory, root.logs_dir)
+    else:
+        candidates = scan.iter_runs(
+            root.seqs, root.genetics_dir, root.logs_dir
         )
 
-        return
+    # shortest time runs of any assay are kept for, runs younger than
+    # this can't be old enough to delete whatever their Jira details
+    min_weeks = min([root.ansible_week, *policy.retention.values()])
 
-    runs_pickle = read_or_new_pickle(pickle_file)
+    for run, seq, mtime, log_mtime in scan.prefetch(
+        scan.stat_runs(candidates, root.genetics_dir)
+    ):
+        log.info(f"Checking state of {run}")
 
-    if not runs_pickle:
-        # pickle file empty or doesn't exist => exit
-        log.info(
-            f"pickle file {pickle_file} empty or doesn't exist, nothing "
-            "to delete. Exiting now."
-        )
-        sys.exit(0)
+        run_path = os.path.join(root.genetics_dir, seq, run)
 
-    for run, values in runs_pickle.items():
-        # last check to see if Jira status is still valid for deleting
-        _, status, _ = jira.get_issue_detail(run, server_testing)
+        # get run created date, from the sequencer's run date where
+        # known as the directory mtime changes if anything touches it
+        metadata = run_metadata.get(run_path) if run_metadata else None
+        created_date = get_run_date(metadata) or get_date(mtime)
+        created_on = created_date.strftime("%Y-%m-%d")
+        duration = get_duration(today, created_date)
+        weeks = round(duration.days / 7, 2)
+
+        # each check is only made when first needed for the decision
+        evidence = RunEvidence(
+            {
+                "jira": partial(jira.get_issue_detail, run, server_testing),
+                "uploaded": partial(check_run_uploaded, run),
+                "project": partial(get_describe_data, run),
+                "size": partial(
+                    estimate_run_size if estimate_sizes else measure_run_size,
+                    run,
+                    run_path,
+                    size_cache,
+                    metadata,
+                    size_estimator,
+                    size_index,
+                ),
+                "manifest": partial(
+                    verify_upload_manifest, run, run_path, size_index
+                ),
+            }
+        )
 
-        seq = values["seq"].strip()
-        key = values["key"].strip()
-        assay = values["assay"].strip()
-        size = str(values["size"]).strip()
+        # runs still being sequenced or uploaded are never checked or
+        # sized, as the directory may still be growing
+        activity = scan.get_activity(run_path, mtime, log_mtime, today)
 
-        if status.upper() not in jira_delete_status:
-            log.info(
-                f"Jira status not valid to delete ({status}) - skipping "
-                f"deletion of {genetics_dir}/{seq}/{run}"
-            )
-            continue
+        if full_evidence and not activity:
+            # reporting on every run => make all checks up front
+            evidence.collect()
 
-        run_path = os.path.join(genetics_dir, seq, run)
+        retention_weeks = min_weeks
+        old_enough = check_age(created_date, today, min_weeks)
 
-        if not seq or not run or not os.path.exists(run_path):
-            # sense check that the full path to the run exists so we
-            # don't accidentally try delete the whole of /genetics
-            error = (
-                ":warning: ANSIBLE-MONITORING: Error in deleting run, full "
-                f"path does not seem valid!\nSequencer dir: {seq}\nRun dir: "
-                f"{run}\nFull path: {run_path}. Stopping further deletion"
+        if old_enough and not activity:
+            # check age of run against the retention for its assay
+            retention_weeks = policy.get_retention_weeks(
+                evidence["assay"], root.ansible_week
             )
+            old_enough = check_age(created_date, today, retention_weeks)
 
-            log.error(error)
-
-            post_simple_message_to_slack(
-                message=error,
-                channel="egg-alerts",
-                slack_token=slack_token,
-                debug=debug,
+        if activity:
+            log.info(
+                f"{run} {created_on} ::: {weeks} weeks - run still active "
+                f"({activity})"
             )
+            decision = plan.SKIP
+            reason = f"run still active: {activity}"
+            rule = None
+        elif not old_enough:
+            # run less than defined no. weeks to wait to delete => skip
+            log.info(
+                f"{run} {created_on} ::: {weeks} weeks - not old enough "
+                "to delete"
+            )
+            decision = plan.SKIP
+            reason = f"not older than {retention_weeks} weeks"
+            rule = None
+        else:
+            # check the run against the deletion policy rules, i.e. that
+            # it's uploaded, processed and its Jira state valid to delete
+            match = policy.match(evidence, duration.days / 7)
+            decision = match.decision or plan.MANUAL_REVIEW
+            reason = match.reason
+            rule = match.rule
+
+            if decision == plan.DELETE and estimate_sizes:
+                # runs to delete are sized exactly to account for the
+                # space reclaimed
+                evidence.refine(
+                    "size",
+                    partial(
+                        measure_run_size,
+                        run,
+                        run_path,
+                        size_cache,
+                        metadata,
+                        size_estimator,
+                        size_index,
+                    ),
+                )
 
-            sys.exit("END SCRIPT")
+            if decision == plan.DELETE:
+                # check everything in the run was uploaded before it may
+                # be deleted
+                mismatch = evidence["manifest"]["mismatch"]
 
-        try:
-            log.info(f"DELETING {genetics_dir}/{seq}/{run}")
-            shutil.rmtree(f"{genetics_dir}/{seq}/{run}")
+                if mismatch:
+                    decision = plan.MANUAL_REVIEW
+                    reason = f"upload incomplete: {mismatch}"
+
+            if (
+                decision == plan.DELETE
+                and evidence["assay"] in policy.checksum_assays
+            ):
+                if checksum_engine is None:
+                    reason = f"{reason}, checksums verified on notifying"
+                else:
+                    # check the content of the run matches its upload,
+                    # only added here so collecting evidence never
+                    # hashes a run
+                    evidence.refine(
+                        "checksums",
+                        partial(
+                            verify_run_checksums,
+                            run,
+                            run_path,
+                            checksum_engine,
+                            size_index,
+                        ),
+                    )
+                    mismatch = evidence["checksums"]["mismatch"]
+
+                    if mismatch:
+                        decision = plan.MANUAL_REVIEW
+                        reason = f"checksums not verified: {mismatch}"
+
+            if decision != plan.SKIP:
+                # runs to delete or review are reported in full
+                evidence.collect()
+
+        if "size" not in evidence.results:
+            # runs decided without sizing (i.e. too young or still
+            # active) are never walked, they're counted in the totals
+            # from what's already known of their size, else unsized
+            evidence.refine(
+                "size",
+                partial(
+                    get_known_size,
+                    run,
+                    run_path,
+                    size_cache,
+                    metadata,
+                    size_estimator,
+                    size_index,
+                ),
+            )
+            evidence.check("size")
 
-            deleted_details[run] = {
+        details = get_evidence_details(evidence)
+        details.update(
+            {
+                "root": root.genetics_dir,
                 "seq": seq,
-                "status": status,
-                "key": key,
-                "assay": assay,
-                "size": size,
+                "created": created_on,
+                "duration": weeks,
+                "old_enough": old_enough,
+                "retention_weeks": retention_weeks,
+                "active": activity,
+                "metadata": metadata,
             }
+        )
 
-            deleted_runs.append(f"{genetics_dir}/{seq}/{run} {today}\n")
-
-        except OSError as err:
-            log.error(
-                f"Error in deleting {genetics_dir}/{seq}/{run}. Stopping "
-                "further automatic deletion."
+        if "project" in evidence.results:
+            log.info(
+                f"Following data found: old enough: {old_enough}; "
+                f"uploaded: {details['uploaded']}; 002 project: "
+                f"{details['url']}; Jira status: {details['status']}"
             )
 
-            clear_memory(pickle_file)
+        if decision == plan.DELETE:
+            # enough criteria passed above to delete
+            log.info(
+                f"{run} {created_on} ::: {weeks} weeks - flagged for "
+                f"deletion by rule {rule}"
+            )
 
-            msg = (
-                ":warning:"
-                f"ANSIBLE-MONITORING: ERROR with deleting `{run}`."
-                " Stopping further automatic deletion."
-                f"\n```{err}```"
+            to_delete[run] = details
+        elif decision == plan.SKIP and rule:
+            # matches a rule with a longer minimum age => skip for now
+            log.info(f"{run} {created_on} ::: {weeks} weeks - {reason}")
+        elif decision == plan.MANUAL_REVIEW:
+            # run old enough to delete but not passed checks => flag
+            # up to review manually
+            log.info(
+                f"{run} {created_on} ::: {weeks} weeks - run not passed "
+                "checks - flag for manual review"
             )
 
-            post_simple_message_to_slack(
-                message=msg,
-                channel="egg-alerts",
-                slack_token=slack_token,
-                debug=debug,
+            manual_review[run] = details
+            reason = reason or get_manual_review_reason(
+                details["uploaded"],
+                details["project"],
+                details["status"],
+                details["assay"],
+                details["key"],
+                jira_assay,
+                policy.delete_statuses,
             )
 
-            sys.exit("END SCRIPT")
+        plan_runs[run] = {
+            **details,
+            "decision": decision,
+            "reason": reason,
+            "rule": rule,
+        }
 
-    if deleted_details:
-        # something deleted => create Jira ticket to acknowledge
+        record_check_decision(
+            decisions, run, plan_runs[run], evidence.timings, dry_run
+        )
 
-        # get after deletion disk usage
-        post_usage = shutil.disk_usage(genetics_dir)
-        # make datetime into str type
-        jira_date = today.strftime("%d/%m/%Y")
+    log.info(f"Checked {len(plan_runs)} runs in {root.genetics_dir}")
 
-        # format disk usage for Jira issue description
-        init_total = round(init_usage[0] / 1024 / 1024 / 1024, 2)
-        init_used = round(init_usage[1] / 1024 / 1024 / 1024, 2)
-        init_percent = round((init_usage[1] / init_usage[0]) * 100, 2)
+    return to_delete, manual_review, plan_runs
 
-        p_total = round(post_usage[0] / 1024 / 1024 / 1024, 2)
-        p_used = round(post_usage[1] / 1024 / 1024 / 1024, 2)
-        p_percent = round((post_usage[1] / post_usage[0]) * 100, 2)
 
-        # format deleted run for issue description
-        jira_data = [
-            f"{k} in /genetics/{v['seq']}" for k, v in deleted_details.items()
-        ]
+def get_run_size(run, run_path, size_cache=None, size_index=None) -> int:
+    """
+    Get the size of a run, reusing the size from the cache if given
 
-        # description body
-        body = "\n".join(jira_data)
+    Inputs
+    ------
+    run : str
+        run ID
+    run_path : str
+        path to the run directory
+    size_cache : dict
+        (optional) mapping of run path to previously calculated size,
+        runs not in the cache are sized and added to it
+    size_index : bin.size_index.SizeIndex
+        (optional) index of run subtree sizes, to only list the
+        directories changed since the run was last sized
 
-        desc = f"Runs deleted on {jira_date}\n"
+    Returns
+    -------
+    int
+        size of the run in bytes
+    """
+    if size_cache is not None and run_path in size_cache:
+        return size_cache[run_path]
 
-        # all disk space data
-        disk_usage = (
-            "\n/genetics disk usage before: "
-            f"{init_used} / {init_total} {init_percent}%"
-            "\n/genetics disk usage after: "
-            f"{p_used} / {p_total} {p_percent}%"
-        )
+    if size_index is not None:
+        run_size = size_index.get_size(run_path)
+    else:
+        run_size = get_size(run_path)
 
-        desc += body + disk_usage
+    if size_cache is not None:
+        size_cache[run_path] = run_size
 
-        # create Jira issue
-        # issue type for acknowledgement 10124
-        # helpdesk 10042 for debug 10040 for prod
+    return run_size
 
-        log.info("Creating Jira acknowledgement issue")
-        issue_title = (
-            f"{jira_date} Automated deletion of runs from ansible server"
-        )
-        response = jira.create_issue(
-            summary=issue_title,
-            issue_id=10124,
-            project_id=jira_project_id,
-            reporter_id=jira_reporter_id,
-            priority_id=3,
-            desc=desc,
-            assay=False,
-        )
 
-        if "id" in response:
-            # log the raised issue key for reference in future
-            issue_key = response["key"]
-            log.info(f"{issue_key} {jira_project_id}")
-        else:
-            # if jira ticket creation issue
-            # send msg to Slack - stop script
+def measure_run_size(
+    run,
+    run_path,
+    size_cache=None,
+    metadata=None,
+    size_estimator=None,
+    size_index=None,
+) -> tuple:
+    """
+    Exactly size a run, adding its size to calibrate estimates from
+
+    Inputs
+    ------
+    run : str
+        run ID
+    run_path : str
+        path to the run directory
+    size_cache : dict
+        (optional) mapping of run path to previously calculated size
+    metadata : dict
+        (optional) run metadata giving the run's geometry
+    size_estimator : bin.size_estimate.SizeEstimator
+        (optional) estimator to add the run's size to
+    size_index : bin.size_index.SizeIndex
+        (optional) index of run subtree sizes to size the run from
+
+    Returns
+    -------
+    tuple
+        size of the run in bytes and error bound (None as exact)
+    """
+    size = get_run_size(run, run_path, size_cache, size_index)
+
+    if size_estimator is not None and metadata:
+        size_estimator.add(run, metadata, size)
+
+    return size, None
+
+
+def estimate_run_size(
+    run,
+    run_path,
+    size_cache=None,
+    metadata=None,
+    size_estimator=None,
+    size_index=None,
+) -> tuple:
+    """
+    Estimate the size of a run from its geometry, exactly sizing it if
+    it can't be estimated. Previously calculated sizes are reused
+
+    Inputs
+    ------
+    as for measure_run_size()
+
+    Returns
+    -------
+    tuple
+        size of the run in bytes and error bound of the estimate (None
+        if exactly sized)
+    """
+    if size_cache is not None and run_path in size_cache:
+        return size_cache[run_path], None
+
+    estimate = size_estimator.estimate(metadata) if size_estimator else None
+
+    if estimate:
+        return estimate
+
+    return measure_run_size(
+        run, run_path, size_cache, metadata, size_estimator, size_index
+    )
+
+
+def get_known_size(
+    run,
+    run_path,
+    size_cache=None,
+    metadata=None,
+    size_estimator=None,
+    size_index=None,
+) -> tuple:
+    """
+    Get the size of a run without walking it, from a previously
+    calculated size, the size index or else an estimate from the run
+    geometry
+
+    Inputs
+    ------
+    as for measure_run_size()
+
+    Returns
+    -------
+    tuple
+        size of the run in bytes and error bound of the size (None if
+        exact), or (None, None) if the size isn't known
+    """
+    if size_cache is not None and run_path in size_cache:
+        return size_cache[run_path], None
+
+    if size_index is not None:
+        size = size_index.get_indexed_size(run_path)
+
+        if size is not None:
+            return size, None
+
+    estimate = size_estimator.estimate(metadata) if size_estimator else None
+
+    return estimate or (None, None)
+
+
+def verify_upload_manifest(run, run_path, size_index=None) -> dict:
+    """
+    Compare the files in a run against the files uploaded for it to
+    StagingArea52. The files are uploaded as tarballs so the number of
+    files can't be compared directly, instead every uploaded file must
+    be closed and the uploaded bytes at least MIN_UPLOAD_FRACTION of
+    the local run
+
+    Inputs
+    ------
+    run : str
+        run ID
+    run_path : str
+        path to the run directory
+    size_index : bin.size_index.SizeIndex
+        (optional) index of run subtree sizes to get the local files
+        from, reusing the listing made when sizing the run
+
+    Returns
+    -------
+    dict
+        number and bytes of the local and uploaded files, number of
+        uploaded files not closed and the mismatch found (None if the
+        upload is complete)
+    """
+    if size_index is None:
+        size_index = SizeIndex()
+
+    local_files, local_bytes = size_index.get_manifest(run_path)
+    remote = get_upload_manifest(run)
+
+    if not remote["files"]:
+        mismatch = "no files uploaded"
+    elif remote["open"]:
+        mismatch = f"{remote['open']} uploaded files not closed"
+    elif remote["bytes"] < local_bytes * MIN_UPLOAD_FRACTION:
+        mismatch = (
+            f"{sizeof_fmt(remote['bytes'])} uploaded of "
+            f"{sizeof_fmt(local_bytes)} local"
+        )
+    else:
+        mismatch = None
+
+    if mismatch:
+        log.info(f"{run} upload does not match local run: {mismatch}")
+
+    return {
+        "local_files": local_files,
+        "local_bytes": local_bytes,
+        "remote_files": remote["files"],
+        "remote_bytes": remote["bytes"],
+        "open_files": remote["open"],
+        "mismatch": mismatch,
+    }
+
+
+def get_checksum_engine(checksum_rate=None) -> ChecksumEngine:
+    """
+    Get the checksum engine caching hashes in the monitoring directory
+
+    Inputs
+    ------
+    checksum_rate : int
+        (optional) MB/s to cap reads to, None for no cap
+
+    Returns
+    -------
+    bin.checksum.ChecksumEngine
+        engine to verify run checksums with
+    """
+    return ChecksumEngine(
+        os.path.join(get_monitoring_dir(), CHECKSUM_CACHE),
+        rate=checksum_rate * 1024**2 if checksum_rate else None,
+    )
+
+
+def verify_run_checksums(
+    run, run_path, checksum_engine, size_index=None
+) -> dict:
+    """
+    Check the files of a run against the MD5s of their upload to
+    StagingArea52. Only files uploaded as they are can be checked, the
+    tarballs uploaded by dx-streaming-upload have no local copy. Runs
+    are only verified if the files checked make up at least
+    MIN_CHECKSUM_FRACTION of the local run, otherwise they're taken as
+    a mismatch without hashing anything
+
+    Inputs
+    ------
+    run : str
+        run ID
+    run_path : str
+        path to the run directory
+    checksum_engine : bin.checksum.ChecksumEngine
+        engine to hash the files with
+    size_index : bin.size_index.SizeIndex
+        (optional) index of run subtree sizes to get the size of the
+        local run from
+
+    Returns
+    -------
+    dict
+        number and bytes of the files checked, bytes of the local run,
+        files not matching their upload and the mismatch found (None if
+        verified)
+    """
+    if size_index is None:
+        size_index = SizeIndex()
+
+    _, local_bytes = size_index.get_manifest(run_path)
+    files = {}
+
+    for path, parts in get_uploaded_parts(run).items():
+        local_path = os.path.join(run_path, path)
+
+        if os.path.isfile(local_path):
+            files[local_path] = parts
+
+    checked = sum(size for x in files.values() for size, _ in x)
+    mismatched = []
+
+    if not files:
+        # nothing verified => not safe to delete without review
+        mismatch = "no uploaded files with a local copy to verify"
+        log.warning(f"{run} {mismatch}")
+    elif checked < local_bytes * MIN_CHECKSUM_FRACTION:
+        # only a few loose files to check => content not verified
+        mismatch = (
+            f"only {sizeof_fmt(checked)} of {sizeof_fmt(local_bytes)} "
+            "local has an uploaded copy to verify"
+        )
+        log.warning(f"{run} {mismatch}")
+    else:
+        mismatched = [
+            os.path.relpath(x, run_path)
+            for x in checksum_engine.verify(files)
+        ]
+        mismatch = None
+
+        if mismatched:
+            mismatch = (
+                f"{len(mismatched)} files differ from their upload, "
+                f"including {mismatched[0]}"
+            )
+            log.info(f"{run} {mismatch}")
+
+    return {
+        "files": len(files),
+        "bytes": checked,
+        "local_bytes": local_bytes,
+        "mismatched": mismatched,
+        "mismatch": mismatch,
+    }
+
+
+def verify_planned_checksums(runs, policy, checksum_rate=None) -> dict:
+    """
+    Verify the checksums of the runs planned for deletion of the
+    policy's checksum_assays that weren't verified when planned, i.e.
+    by a dry run scan. The checksums are added to each run's details
+
+    Inputs
+    ------
+    runs : dict
+        mapping of run ID to dict of run details to delete from a plan
+    policy : bin.policy.Policy
+        deletion policy giving the checksum_assays
+    checksum_rate : int
+        (optional) MB/s to cap reads to, None for no cap
+
+    Returns
+    -------
+    dict
+        mapping of run ID to the mismatch found for runs not verified
+    """
+    to_verify = [
+        run
+        for run, details in runs.items()
+        if details.get("assay") in policy.checksum_assays
+        and not details.get("checksums")
+    ]
+
+    if not to_verify:
+        return {}
+
+    checksum_engine = get_checksum_engine(checksum_rate)
+    size_index = SizeIndex(
+        os.path.join(get_monitoring_dir(), SIZE_INDEX_CACHE)
+    )
+    failed = {}
+
+    for run in to_verify:
+        details = runs[run]
+        run_path = os.path.join(details["root"], details["seq"], run)
+
+        try:
+            details["checksums"] = verify_run_checksums(
+                run, run_path, checksum_engine, size_index
+            )
+        except OSError as err:
+            failed[run] = str(err)
+            continue
+
+        if details["checksums"]["mismatch"]:
+            failed[run] = details["checksums"]["mismatch"]
+
+    size_index.save()
+
+    return failed
+
+
+def get_evidence_details(evidence) -> dict:
+    """
+    Get the run details for the plan from the checks made so far, those
+    not made are left empty
+
+    Inputs
+    ------
+    evidence : bin.evidence.RunEvidence
+        evidence gathered for the run
+
+    Returns
+    -------
+    dict
+        Jira, DNAnexus, size, upload manifest and checksum details of
+        the run
+    """
+    project_data = evidence.get("project", {})
+
+    if project_data:
+        # found 002 project => generate link
+        trimmed_id = (
+            project_data.get("describe", "")
+            .get("id", "")
+            .replace("project-", "")
+        )
+        url = (
+            f"https://platform.dnanexus.com/panx/projects/"
+            f"{trimmed_id}/data"
+        )
+    else:
+        url = "NA"
+
+    return {
+        "status": evidence.get("status"),
+        "key": evidence.get("key"),
+        "assay": evidence.get("assay"),
+        "uploaded": evidence.get("uploaded"),
+        "project": project_data,
+        "url": url,
+        "size": evidence.get("size"),
+        "size_error": evidence.get("size_error"),
+        "manifest": evidence.get("manifest"),
+        "checksums": evidence.get("checksums"),
+    }
+
+
+def record_check_decision(decisions, run, details, timings, dry_run):
+    """
+    Write the decision made for a run in check_for_deletion() to the
+    decision log
+
+    Inputs
+    ------
+    decisions : DecisionLog
+        decision log to write to
+    run : str
+        run ID
+    details : dict
+        run details from the plan, including the decision and reason
+    timings : dict
+        mapping of check to seconds taken
+    dry_run : bool
+        if the check was a dry run
+    """
+    decisions.record(
+        stage="check",
+        run=run,
+        decision=details["decision"],
+        reason=details["reason"],
+        rule=details.get("rule"),
+        dry_run=dry_run,
+        seq=details["seq"],
+        size=details["size"],
+        evidence={
+            "uploaded": details["uploaded"],
+            "project": details["project"].get("id"),
+            "old_enough": details["old_enough"],
+            "created": details["created"],
+            "age_weeks": details["duration"],
+            "status": details["status"],
+            "key": details["key"],
+            "assay": details["assay"],
+        },
+        timings={k: round(v, 4) for k, v in timings.items()},
+    )
+
+
+def load_size_estimator() -> SizeEstimator:
+    """
+    Get a run size estimator calibrated from the run sizes in the
+    history store. Errors with the store are logged and give an
+    estimator with no calibration, so that runs are sized exactly
+
+    Returns
+    -------
+    SizeEstimator
+        run size estimator
+    """
+    path = os.path.join(get_monitoring_dir(), HISTORY_DB)
+
+    if not os.path.exists(path):
+        # nothing to calibrate from yet
+        return SizeEstimator()
+
+    try:
+        with HistoryStore(path) as history:
+            return SizeEstimator(history.get_run_sizes())
+    except sqlite3.Error as err:
+        log.warning(f"Unable to read run sizes from history: {err}")
+
+    return SizeEstimator()
+
+
+def record_run_sizes(today, samples) -> None:
+    """
+    Add the exact sizes of runs sized to the history store, to
+    calibrate size estimates from
+
+    Inputs
+    ------
+    today : datetime
+        time the runs were sized
+    samples : dict
+        mapping of run ID to tuple of instrument, geometry units and
+        size in bytes
+    """
+    if not samples:
+        return
+
+    try:
+        with HistoryStore(
+            os.path.join(get_monitoring_dir(), HISTORY_DB)
+        ) as history:
+            history.add_run_sizes(today, samples)
+    except sqlite3.Error as err:
+        log.warning(f"Unable to add run sizes to history: {err}")
+
+
+def record_usage_history(
+    genetics_dir, today, usage, seq_usage=None, deleted=None, dry_run=False
+):
+    """
+    Add a usage sample to the history store and forecast the days until
+    the genetics directory is full. Errors with the store are logged and
+    don't stop the checks or deletion
+
+    Inputs
+    ------
+    genetics_dir : str
+        parent path to run directories
+    today : datetime
+        time of the sample
+    usage : tuple
+        disk usage of the genetics directory
+    seq_usage : dict
+        (optional) mapping of sequencer ID to total bytes and runs
+    deleted : dict
+        (optional) mapping of run ID to details of runs deleted
+    dry_run : bool
+        if True, only forecast from the samples already stored without
+        adding any
+
+    Returns
+    -------
+    float | None
+        days until full, None if it can't be forecast
+    """
+    path = os.path.join(get_monitoring_dir(), HISTORY_DB)
+
+    if dry_run and not os.path.exists(path):
+        return None
+
+    try:
+        with HistoryStore(path) as history:
+            if dry_run:
+                return history.days_until_full(genetics_dir, today)
+
+            for run, details in (deleted or {}).items():
+                history.add_reclaimed(
+                    today, genetics_dir, run, details["seq"], details["size"]
+                )
+
+            history.add_usage(today, genetics_dir, usage)
+
+            if seq_usage:
+                history.add_sequencer_usage(today, genetics_dir, seq_usage)
+
+            return history.days_until_full(genetics_dir, today)
+    except sqlite3.Error as err:
+        log.warning(f"Unable to update usage history: {err}")
+
+        return None
+
+
+def send_notifications(
+    to_delete,
+    manual_review,
+    pickle_file,
+    slack_token,
+    debug,
+    ansible_week,
+    usage,
+    today,
+    jira_url,
+    days_until_full=None,
+    totals=None,
+    filesystems=None,
+    delete_statuses=None,
+) -> None:
+    """
+    Write the runs flagged for deletion to the pickle file and send the
+    Slack alerts for runs to be deleted and those needing manual review
+
+    Inputs
+    ------
+    to_delete : dict
+        mapping of run ID to details of runs flagged for deletion
+    manual_review : dict
+        mapping of run ID to details of runs requiring manual review
+    pickle_file : str
+        name of pickle file to write runs to delete to
+    slack_token : str
+        Slack API token
+    debug : bool
+        If running in debug
+    ansible_week : int
+        number of weeks at which to automatically delete a run
+    usage : tuple
+        disk usage of the genetics directory
+    today : datetime
+        date of checking
+    jira_url : str
+        URL endpoint for our Jira
+    days_until_full : float
+        (optional) forecast days until the genetics directory is full
+    totals : dict
+        (optional) total bytes, runs and oldest run per sequencer and
+        assay from plan.get_totals()
+    filesystems : dict
+        (optional) mapping of genetics root to its disk usage
+    delete_statuses : list
+        (optional) Jira statuses valid for deletion from the deletion
+        policy
+    """
+    if to_delete:
+        # found more than one run to delete => update the pickle file
+        # for deletion on Wednesday
+        log.info("Writing runs flagged to delete into pickle file")
+        with open(pickle_file, "wb") as f:
+            pickle.dump(to_delete, f)
+
+        # alert us that some runs will be deleted on the next Wednesday
+        post_message_to_slack(
+            channel="egg-alerts",
+            token=slack_token,
+            data=to_delete,
+            debug=debug,
+            n_weeks=ansible_week,
+            usage=usage,
+            today=today,
+            jira_url=jira_url,
+            action="delete",
+            days_until_full=days_until_full,
+            totals=totals,
+            filesystems=filesystems,
+            delete_statuses=delete_statuses,
+        )
+
+    if manual_review:
+        # found more than one run requiring manually reviewing, only
+        # send alerts for these on a Monday morning to not get too spammy
+        post_message_to_slack(
+            channel="egg-alerts",
+            token=slack_token,
+            data=manual_review,
+            debug=debug,
+            n_weeks=ansible_week,
+            usage=usage,
+            today=today,
+            jira_url=jira_url,
+            action="manual",
+            days_until_full=days_until_full,
+            totals=totals,
+            filesystems=filesystems,
+            delete_statuses=delete_statuses,
+        )
+
+
+def verify_run(
+    run, values, genetics_dirs, statuses, jira, server_testing, policy
+) -> dict:
+    """
+    Verify a run flagged for deletion is still valid to delete, i.e.
+    its Jira status is still valid for deletion and its path exists
+    within one of the genetics roots. Has no side effects so that runs
+    can be verified ahead of those being deleted
+
+    Inputs
+    ------
+    run : str
+        run ID
+    values : dict
+        run details from the pickle file or plan
+    genetics_dirs : list
+        parent dirs of sequencing runs runs may be deleted from
+    statuses : dict
+        mapping of Jira ticket key to status from get_issue_statuses()
+    jira : Jira
+        jira.Jira object, used to search for runs without a known key
+    server_testing : bool
+        controls if running test
+    policy : bin.policy.Policy
+        deletion policy giving the Jira statuses valid for deletion
+
+    Outputs
+    -------
+    dict
+        run details, path and outcome, one of ok, skip (Jira status no
+        longer valid) or invalid (path not valid)
+    """
+    key = (values.get("key") or "").strip()
+    start = perf_counter()
+
+    if key in statuses:
+        status = statuses[key]
+    else:
+        # no usable key stored => search for the ticket by run ID
+        _, status, _ = jira.get_issue_detail(run, server_testing)
+
+    timings = {"jira": round(perf_counter() - start, 4)}
+
+    # runs from before multiple roots were supported are all in the
+    # first root
+    root = values.get("root") or genetics_dirs[0]
+    seq = values["seq"].strip()
+    run_path = os.path.join(root, seq, run)
+
+    if status.upper() not in policy.delete_statuses:
+        outcome = "skip"
+    elif (
+        not seq
+        or not run
+        or root not in genetics_dirs
+        or not os.path.exists(run_path)
+    ):
+        # sense check that the full path to the run exists so we
+        # don't accidentally try delete the whole of /genetics
+        outcome = "invalid"
+    else:
+        outcome = "ok"
+
+    return {
+        "outcome": outcome,
+        "root": root,
+        "seq": seq,
+        "run_path": run_path,
+        "status": status,
+        "key": key,
+        "assay": values["assay"].strip(),
+        "size": str(values["size"]).strip(),
+        "timings": timings,
+    }
+
+
+def delete_runs(
+    pickle_file,
+    genetics_dirs,
+    jira_project_id,
+    jira_reporter_id,
+    slack_token,
+    server_testing,
+    debug,
+    jira,
+    plan_file=None,
+    delete_day=3,
+    policy=None,
+    checksum_rate=None,
+) -> None:
+    """
+    Delete the specified runs in the pickle file that have been
+    previously checked and flagged for automatic deletion, or those
+    marked for deletion in the given plan file. Runs from a plan of the
+    policy's checksum_assays not verified when planned are verified
+    first, and not deleted if not verified
+
+    Inputs
+    ------
+    pickle : str
+        pickle file with runs to be deleted
+    genetics_dirs : list
+        parent dirs of sequencing runs (i.e. each genetics root), runs
+        may only be deleted from within these
+    jira_project_id : str
+        ID of Jira project
+    jira_reporter_id : str
+        ID reporting to Jira as
+    slack_token : str
+        Slack API token
+    server_testing : bool
+        controls if running test
+    debug : bool
+        controls debug level
+    jira : Jira
+        jira.Jira object
+    plan_file : str
+        (optional) JSON or CSV plan file from check_for_deletion() to
+        read runs to delete from instead of the pickle file
+    delete_day : int
+        ISO weekday to perform deletion on (Wednesday by default), if
+        None deletion will be performed on any day
+    policy : bin.policy.Policy
+        (optional) deletion policy giving the Jira statuses still valid
+        for deletion, defaults to the policy from get_policy()
+    checksum_rate : int
+        (optional) MB/s to cap reads to when verifying checksums
+
+    Outputs
+    -------
+    file
+        JSON lines decision log with a record for every run checked
+    """
+    deleted_details = dict()
+    deleted_runs = []
+
+    # get /genetic disk usage stat of each root
+    _, init_usage = get_disk_usage(genetics_dirs)
+    today = datetime.today()
+
+    if delete_day is not None and today.isoweekday() != delete_day:
+        # today is not the deletion day => don't do anything
+        log.info(
+            f"Today is {today.strftime('%A')} therefore no "
+            "deletion will be performed"
+        )
+
+        return
+
+    if policy is None:
+        policy = get_policy()
+
+    if plan_file:
+        runs_pickle = plan.get_runs_to_delete(plan.read_plan(plan_file))
+    else:
+        runs_pickle = read_or_new_pickle(pickle_file)
+
+    if not runs_pickle:
+        # pickle file empty or doesn't exist => exit
+        log.info(
+            f"{plan_file or pickle_file} empty or doesn't exist, nothing "
+            "to delete. Exiting now."
+        )
+        sys.exit(0)
+
+    decisions = DecisionLog(os.path.join(get_monitoring_dir(), DECISION_LOG))
+
+    if plan_file:
+        failed = verify_planned_checksums(runs_pickle, policy, checksum_rate)
+
+        for run, mismatch in failed.items():
+            log.warning(
+                f"Checksums of {run} not verified ({mismatch}) - skipping "
+                "deletion"
+            )
+            decisions.record(
+                "delete",
+                run,
+                "skip",
+                f"checksums not verified: {mismatch}",
+                seq=runs_pickle[run]["seq"],
+                size=int(runs_pickle[run]["size"]),
+            )
+            runs_pickle.pop(run)
+
+    # last check to see if Jira statuses are still valid for deleting,
+    # looking up all the stored ticket keys in one query
+    start = perf_counter()
+    statuses = jira.get_issue_statuses(
+        [
+            values["key"].strip()
+            for values in runs_pickle.values()
+            if values.get("key") and values["key"].strip() != "Multiple"
+        ]
+    )
+
+    log.info(
+        f"Fetched Jira status of {len(statuses)} tickets in "
+        f"{perf_counter() - start:.2f}s"
+    )
+
+    # verify later runs concurrently while earlier ones are deleted,
+    # map() gives the results in order so deletion stays sequential
+    executor = ThreadPoolExecutor(max_workers=VERIFY_WORKERS)
+
+    try:
+        verified = executor.map(
+            lambda x: verify_run(
+                *x, genetics_dirs, statuses, jira, server_testing, policy
+            ),
+            runs_pickle.items(),
+        )
+
+        for run, details in zip(runs_pickle, verified):
+            root = details["root"]
+            seq = details["seq"]
+            run_path = details["run_path"]
+            status = details["status"]
+            key = details["key"]
+            assay = details["assay"]
+            size = details["size"]
+            timings = details["timings"]
+
+            # details recorded in the decision log for this run
+            run_fields = {
+                "seq": seq,
+                "size": int(size),
+                "evidence": {"status": status, "key": key, "assay": assay},
+            }
+
+            if details["outcome"] == "skip":
+                log.info(
+                    f"Jira status not valid to delete ({status}) - "
+                    f"skipping deletion of {root}/{seq}/{run}"
+                )
+                decisions.record(
+                    "delete",
+                    run,
+                    "skip",
+                    f"Jira status {status.upper()} no longer valid for "
+                    "deletion",
+                    timings=timings,
+                    **run_fields,
+                )
+                continue
+
+            if details["outcome"] == "invalid":
+                error = (
+                    ":warning: ANSIBLE-MONITORING: Error in deleting run, "
+                    "full path does not seem valid!\nSequencer dir: "
+                    f"{seq}\nRun dir: {run}\nRoot: {root}\nFull path: "
+                    f"{run_path}. Stopping further deletion"
+                )
+
+                log.error(error)
+                decisions.record(
+                    "delete",
+                    run,
+                    "error",
+                    "run path not valid",
+                    timings=timings,
+                    **run_fields,
+                )
+
+                post_simple_message_to_slack(
+                    message=error,
+                    channel="egg-alerts",
+                    slack_token=slack_token,
+                    debug=debug,
+                )
+
+                sys.exit("END SCRIPT")
+
+            try:
+                log.info(f"DELETING {run_path}")
+                start = perf_counter()
+                shutil.rmtree(run_path)
+                timings["delete"] = round(perf_counter() - start, 4)
+
+                decisions.record(
+                    "delete",
+                    run,
+                    "deleted",
+                    f"Jira status {status.upper()}",
+                    timings=timings,
+                    **run_fields,
+                )
+
+                deleted_details[run] = {
+                    "root": root,
+                    "seq": seq,
+                    "status": status,
+                    "key": key,
+                    "assay": assay,
+                    "size": size,
+                }
+
+                deleted_runs.append(f"{run_path} {today}\n")
+
+            except OSError as err:
+                log.error(
+                    f"Error in deleting {run_path}. Stopping further "
+                    "automatic deletion."
+                )
+                decisions.record(
+                    "delete",
+                    run,
+                    "error",
+                    str(err),
+                    timings=timings,
+                    **run_fields,
+                )
+
+                clear_memory(pickle_file)
+
+                msg = (
+                    ":warning:"
+                    f"ANSIBLE-MONITORING: ERROR with deleting `{run}`."
+                    " Stopping further automatic deletion."
+                    f"\n```{err}```"
+                )
+
+                post_simple_message_to_slack(
+                    message=msg,
+                    channel="egg-alerts",
+                    slack_token=slack_token,
+                    debug=debug,
+                )
+
+                sys.exit("END SCRIPT")
+    finally:
+        # pending verifications are cancelled if deletion stopped early
+        executor.shutdown(wait=False, cancel_futures=True)
+        decisions.close()
+
+    if deleted_details:
+        # something deleted => create Jira ticket to acknowledge
+
+        # get after deletion disk usage
+        _, post_usage = get_disk_usage(genetics_dirs)
+
+        for root in genetics_dirs:
+            record_usage_history(
+                root,
+                today,
+                post_usage[root],
+                deleted={
+                    run: details
+                    for run, details in deleted_details.items()
+                    if details["root"] == root
+                },
+            )
+
+        # make datetime into str type
+        jira_date = today.strftime("%d/%m/%Y")
+
+        # format deleted run for issue description
+        jira_data = [
+            f"{k} in {v['root']}/{v['seq']}"
+            for k, v in deleted_details.items()
+        ]
+
+        # description body
+        body = "\n".join(jira_data)
+
+        desc = f"Runs deleted on {jira_date}\n"
+
+        # all disk space data, for each root
+        disk_usage = ""
+
+        for root in genetics_dirs:
+            # format disk usage for Jira issue description
+            init_total = round(init_usage[root][0] / 1024 / 1024 / 1024, 2)
+            init_used = round(init_usage[root][1] / 1024 / 1024 / 1024, 2)
+            init_percent = round(
+                (init_usage[root][1] / init_usage[root][0]) * 100, 2
+            )
+
+            p_total = round(post_usage[root][0] / 1024 / 1024 / 1024, 2)
+            p_used = round(post_usage[root][1] / 1024 / 1024 / 1024, 2)
+            p_percent = round(
+                (post_usage[root][1] / post_usage[root][0]) * 100, 2
+            )
+
+            disk_usage += (
+                f"\n{root} disk usage before: "
+                f"{init_used} / {init_total} {init_percent}%"
+                f"\n{root} disk usage after: "
+                f"{p_used} / {p_total} {p_percent}%"
+            )
+
+        # break down of what was reclaimed per sequencer and assay
+        reclaimed = plan.get_totals(
+            {run: runs_pickle[run] for run in deleted_details}
+        )
+        disk_usage += (
+            "\n\nReclaimed by sequencer:\n"
+            f"{format_totals(reclaimed, 'sequencers')}"
+            "\n\nReclaimed by assay:\n"
+            f"{format_totals(reclaimed, 'assays')}"
+        )
+
+        desc += body + disk_usage
+
+        # create Jira issue
+        # issue type for acknowledgement 10124
+        # helpdesk 10042 for debug 10040 for prod
+
+        log.info("Creating Jira acknowledgement issue")
+        issue_title = (
+            f"{jira_date} Automated deletion of runs from ansible server"
+        )
+        response = jira.create_issue(
+            summary=issue_title,
+            issue_id=10124,
+            project_id=jira_project_id,
+            reporter_id=jira_reporter_id,
+            priority_id=3,
+            desc=desc,
+            assay=False,
+        )
+
+        if "id" in response:
+            # log the raised issue key for reference in future
+            issue_key = response["key"]
+            log.info(f"{issue_key} {jira_project_id}")
+        else:
+            # if jira ticket creation issue
+            # send msg to Slack - stop script
             err_msg = response["errors"]
             msg = (
                 ":warning:"
@@ -553,29 +1888,485 @@ def delete_runs(
             sys.exit("END SCRIPT")
 
     # write to /log just for own record
-    if os.path.exists("/log/monitoring"):
-        log_file = "/log/monitoring/ansible_delete.txt"
-    else:
-        log_file = "ansible_delete.txt"
+    log_file = os.path.join(get_monitoring_dir(), "ansible_delete.txt")
 
     with open(log_file, "a") as f:
         for deleted in deleted_runs:
             f.write(deleted)
 
 
-def main():
+def add_schedule_arguments(parser, suppress=False) -> None:
+    """
+    Add the arguments to override the notification and deletion days
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        parser to add arguments to
+    suppress : bool
+        if True, don't set defaults so that values given before a
+        subcommand aren't overwritten by the subcommand parser
+    """
+    parser.add_argument(
+        "--notify-day",
+        type=int,
+        choices=range(1, 8),
+        default=argparse.SUPPRESS if suppress else 1,
+        help=(
+            "ISO weekday to update the pickle file and send Slack alerts "
+            "on (default: 1 - Monday)"
+        ),
+    )
+    parser.add_argument(
+        "--delete-day",
+        type=int,
+        choices=range(1, 8),
+        default=argparse.SUPPRESS if suppress else 3,
+        help="ISO weekday to delete runs on (default: 3 - Wednesday)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="run the notify / delete stages regardless of the day",
+    )
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    """
+    Parse command line arguments
+
+    Parameters
+    ----------
+    args : list
+        (optional) arguments to parse, defaults to no arguments
+
+    Returns
+    -------
+    argparse.Namespace
+        parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description=(
+            "Monitor and delete sequencing runs from /genetics. Without a "
+            "subcommand all runs are checked, alerts sent on the notify day "
+            "and runs deleted on the delete day"
+        )
+    )
+    add_schedule_arguments(parser)
+    parser.add_argument(
+        "--plan",
+        help=(
+            "dry run: check all runs and write the deletion plan to this "
+            "JSON or CSV file, without writing the pickle file, sending "
+            "Slack notifications or deleting anything"
+        ),
+    )
+    parser.add_argument(
+        "--from-plan",
+        help=(
+            "JSON or CSV plan file to read runs to delete from instead of "
+            "the pickle file"
+        ),
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help=(
+            "with --plan, make every check for every run (including those "
+            "too young to delete) so the plan reports them in full"
+        ),
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+
+    scan = subparsers.add_parser(
+        "scan",
+        help=(
+            "check all runs and write the deletion plan, without any "
+            "other side effects"
+        ),
+    )
+    scan.add_argument(
+        "--output",
+        help="plan file to write (default: plan file in ANSIBLE_PICKLE_PATH)",
+    )
+    scan.add_argument(
+        "--verbose",
+        action="store_true",
+        default=argparse.SUPPRESS,
+        help=(
+            "make every check for every run (including those too young to "
+            "delete) so the plan reports them in full"
+        ),
+    )
+
+    notify = subparsers.add_parser(
+        "notify",
+        help=(
+            "update the pickle file and send Slack alerts from the plan "
+            "written by scan"
+        ),
+    )
+    add_schedule_arguments(notify, suppress=True)
+    notify.add_argument(
+        "--input",
+        help="plan file to read (default: plan file in ANSIBLE_PICKLE_PATH)",
+    )
+
+    delete = subparsers.add_parser(
+        "delete",
+        help=(
+            "re-check Jira status of and delete the runs in the pickle "
+            "file (or plan file)"
+        ),
+    )
+    add_schedule_arguments(delete, suppress=True)
+    delete.add_argument(
+        "--from-plan",
+        default=argparse.SUPPRESS,
+        help="plan file to read runs to delete from instead of the pickle",
+    )
+
+    subparsers.add_parser(
+        "status",
+        help="show runs pending deletion and the summary of the last plan",
+    )
+
+    daemon = subparsers.add_parser(
+        "daemon",
+        help=(
+            "stay resident and run the checking and deletion daily on an "
+            "internal schedule"
+        ),
+    )
+    add_schedule_arguments(daemon, suppress=True)
+    daemon.add_argument(
+        "--run-time",
+        default="06:00",
+        help="time of day to run at in HH:MM format (default: 06:00)",
+    )
+    daemon.add_argument(
+        "--port",
+        type=int,
+        default=8080,
+        help="port to serve the health endpoint on, 0 to disable",
+    )
+    daemon.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to serve the health endpoint on",
+    )
+    daemon.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "keep a live inventory of runs with inotify (or polling where "
+            "unavailable) and only re-size runs that have changed"
+        ),
+    )
+    daemon.add_argument(
+        "--run-now",
+        action="store_true",
+        help="run a cycle immediately on starting",
+    )
+
+    return parser.parse_args(args or [])
+
+
+def notify_from_plan(
+    plan_file,
+    pickle_file,
+    genetics_dirs,
+    slack_token,
+    debug,
+    ansible_week,
+    jira_url,
+    notify_day=1,
+    policy=None,
+    checksum_rate=None,
+) -> None:
+    """
+    Update the pickle file and send the Slack alerts from the runs in a
+    previously written plan file. Runs to delete of the policy's
+    checksum_assays not verified when planned are verified first, those
+    not verified are sent for manual review instead
+
+    Parameters
+    ----------
+    plan_file : str
+        JSON or CSV plan file written by the scan command
+    pickle_file : str
+        name of pickle file to write runs to delete to
+    genetics_dirs : list
+        parent paths to run directories (i.e. each genetics root)
+    slack_token : str
+        Slack API token
+    debug : bool
+        If running in debug
+    ansible_week : int
+        number of weeks at which to automatically delete a run
+    jira_url : str
+        URL endpoint for our Jira
+    notify_day : int
+        ISO weekday to send notifications on, if None will send on any day
+    policy : bin.policy.Policy
+        (optional) deletion policy, defaults to the policy from
+        get_policy()
+    checksum_rate : int
+        (optional) MB/s to cap reads to when verifying checksums
+    """
+    today = datetime.today()
+
+    if policy is None:
+        policy = get_policy()
+
+    if notify_day is not None and today.isoweekday() != notify_day:
+        log.info(
+            f"Today is {today.strftime('%A')} therefore no "
+            "notifications will be sent"
+        )
+
+        return
+
+    runs = plan.read_plan(plan_file)
+    failed = verify_planned_checksums(
+        plan.get_runs_to_delete(runs), policy, checksum_rate
+    )
+
+    for run, mismatch in failed.items():
+        runs[run]["decision"] = plan.MANUAL_REVIEW
+        runs[run]["reason"] = f"checksums not verified: {mismatch}"
+
+    usage, filesystems = get_disk_usage(genetics_dirs)
+
+    # forecast the first root to fill
+    forecasts = [
+        record_usage_history(root, today, filesystems[root])
+        for root in genetics_dirs
+    ]
+    forecasts = [x for x in forecasts if x is not None]
+
+    send_notifications(
+        to_delete=plan.get_runs_to_delete(runs),
+        manual_review={
+            run: details
+            for run, details in runs.items()
+            if details["decision"] == plan.MANUAL_REVIEW
+        },
+        pickle_file=pickle_file,
+        slack_token=slack_token,
+        debug=debug,
+        ansible_week=ansible_week,
+        usage=usage,
+        today=today,
+        jira_url=jira_url,
+        days_until_full=min(forecasts) if forecasts else None,
+        totals=plan.get_totals(runs),
+        filesystems=filesystems,
+        delete_statuses=policy.delete_statuses,
+    )
+
+
+def show_status(pickle_file, plan_file, genetics_dirs) -> None:
+    """
+    Log the runs currently pending deletion in the pickle file, the
+    summary of the last written plan and the current disk usage
+
+    Parameters
+    ----------
+    pickle_file : str
+        pickle file of runs to delete
+    plan_file : str
+        plan file written by the scan command
+    genetics_dirs : list
+        parent paths to run directories (i.e. each genetics root)
+    """
+    _, filesystems = get_disk_usage(genetics_dirs)
+
+    for genetics_dir, (total, used, _) in filesystems.items():
+        log.info(
+            f"{genetics_dir} usage: {sizeof_fmt(used)} / "
+            f"{sizeof_fmt(total)} ({round(used / total * 100, 2)}%)"
+        )
+
+    if os.path.isfile(pickle_file):
+        with open(pickle_file, "rb") as f:
+            pending = pickle.load(f)
+    else:
+        pending = {}
+
+    pending_size = sum(int(x["size"]) for x in pending.values())
+
+    log.info(
+        f"{len(pending)} runs pending deletion in {pickle_file} "
+        f"({sizeof_fmt(pending_size)})"
+    )
+
+    for run, details in pending.items():
+        log.info(
+            f"\t{details['seq']}/{run} {details['status']} "
+            f"{sizeof_fmt(int(details['size']))}"
+        )
+
+    if os.path.isfile(plan_file) and plan_file.lower().endswith(".json"):
+        with open(plan_file) as f:
+            last_plan = json.load(f)
+
+        summary = last_plan["summary"]
+
+        log.info(
+            f"Last plan generated {last_plan['generated']}: "
+            f"{summary['delete']} to delete, {summary['manual_review']} for "
+            f"manual review, {summary['skip']} skipped, projected to reclaim "
+            f"{sizeof_fmt(summary['projected_reclaimed_bytes'])}"
+        )
+    else:
+        log.info(f"No plan found at {plan_file}")
+
+
+def run_cycle(
+    env,
+    jira,
+    notify_day=1,
+    delete_day=3,
+    plan_file=None,
+    watchers=None,
+    size_cache=None,
+):
+    """
+    Run a full monitoring cycle of checking runs for deletion followed by
+    deleting runs, the stages will only notify / delete on the given days
+
+    Parameters
+    ----------
+    env : SimpleNamespace
+        environment variables from get_env_variables()
+    jira : jira.Jira
+        Jira class object for querying Jira
+    notify_day : int
+        ISO weekday to send notifications on, None for any day
+    delete_day : int
+        ISO weekday to delete on, None for any day
+    plan_file : str
+        (optional) plan file to read runs to delete from
+    watchers : dict
+        (optional) mapping of genetics_dir to the bin.watcher.RunWatcher
+        to take the run inventory of each root from, only runs these
+        have seen change since the last cycle will be re-sized
+    size_cache : dict
+        (optional) mapping of run path to size kept between cycles,
+        only used with watchers
+    """
+    inventory = None
+
+    if not watchers:
+        # nothing to tell which cached sizes are out of date
+        size_cache = None
+    else:
+        inventory = {}
+        changed = set()
+        current = set()
+
+        for genetics_dir, watcher in watchers.items():
+            inventory[genetics_dir] = watcher.snapshot()
+            tmp_seq = inventory[genetics_dir][2]
+
+            # sizes are cached by run path, as the same run ID may be
+            # in more than one root
+            paths = {
+                run: os.path.join(genetics_dir, seq, run)
+                for run, seq in tmp_seq.items()
+            }
+            current.update(paths.values())
+
+            if watcher.mode == "polling":
+                # polling doesn't see files written within runs => size
+                # every run again, only changed directories are listed
+                watcher.pop_changed()
+                changed.update(paths.values())
+            else:
+                # runs removed have no path, they're no longer current
+                changed.update(
+                    paths[run] for run in watcher.pop_changed() if run in paths
+                )
+
+        # drop sizes of changed runs and those no longer on disk
+        for run_path in list(size_cache):
+            if run_path in changed or run_path not in current:
+                size_cache.pop(run_path)
+
+        log.info(
+            f"{len(changed)} runs changed since last cycle, "
+            f"{len(size_cache)} run sizes reused"
+        )
+
+    check_for_deletion(
+        roots=env.roots,
+        server_testing=env.server_testing,
+        slack_token=env.slack_token,
+        pickle_file=env.pickle_file,
+        debug=env.debug,
+        jira=jira,
+        jira_assay=env.jira_assay,
+        jira_url=env.jira_url,
+        notify_day=notify_day,
+        inventory=inventory,
+        size_cache=size_cache,
+        policy=env.policy,
+        size_mode=env.size_mode,
+        checksum_rate=env.checksum_rate,
+    )
+
+    delete_runs(
+        pickle_file=env.pickle_file,
+        genetics_dirs=env.genetics_dirs,
+        jira_project_id=env.jira_project_id,
+        jira_reporter_id=env.jira_reporter_id,
+        slack_token=env.slack_token,
+        server_testing=env.server_testing,
+        debug=env.debug,
+        jira=jira,
+        plan_file=plan_file,
+        delete_day=delete_day,
+        policy=env.policy,
+        checksum_rate=env.checksum_rate,
+    )
+
+
+def run(args=None):
+    if args is None:
+        args = parse_args()
+
+    command = args.command or "run"
     env = get_env_variables()
 
     # log debug status
     if env.debug:
         log.info("Running in debug mode")
+        env.plan_file = f"{env.pickle_file}/ansible_plan.test.json"
         env.pickle_file = f"{env.pickle_file}/ansible_dict.test.pickle"
     else:
         log.info("Running in PRODUCTION mode")
+        env.plan_file = f"{env.pickle_file}/ansible_plan.json"
         env.pickle_file = f"{env.pickle_file}/ansible_dict.pickle"
 
-    # dxpy login
-    if not dx_login(env.dnanexus_token):
+    # schedule overrides, a day of None runs the stage on any day
+    notify_day = None if args.force else args.notify_day
+    delete_day = None if args.force else args.delete_day
+
+    if command == "status":
+        show_status(env.pickle_file, env.plan_file, env.genetics_dirs)
+        return
+
+    # dxpy login, only required for the stages checking runs or
+    # verifying the checksums of runs from a plan
+    needs_dx = command in ["run", "scan", "daemon"] or (
+        env.policy.checksum_assays
+        and (command == "notify" or args.from_plan)
+    )
+
+    if needs_dx and not dx_login(env.dnanexus_token):
         message = ":warning:ANSIBLE-RUN-MONITORING: ERROR with dxpy login!"
 
         post_simple_message_to_slack(
@@ -588,7 +2379,9 @@ def main():
         sys.exit("END SCRIPT")
 
     # check if /genetics & /logs/dx-streaming-upload exist
-    if not directory_check([env.genetics_dir, env.logs_dir]):
+    if not directory_check(
+        [x.genetics_dir for x in env.roots] + [x.logs_dir for x in env.roots]
+    ):
         message = ":warning:ANSIBLE-MONITORING: ERROR with missing directory!"
 
         post_simple_message_to_slack(
@@ -604,6 +2397,10 @@ def main():
     today = datetime.today()
     log.info(today)
 
+    # only import the Jira client once past the status command, it
+    # pulls in requests which is slow to import
+    from bin.jira import Jira
+
     jira = Jira(
         token=env.jira_token,
         email=env.jira_email,
@@ -611,33 +2408,124 @@ def main():
         debug=env.debug,
     )
 
-    check_for_deletion(
-        seqs=env.seqs,
-        genetics_dir=env.genetics_dir,
-        logs_dir=env.logs_dir,
-        ansible_week=env.ansible_week,
-        server_testing=env.server_testing,
-        slack_token=env.slack_token,
-        pickle_file=env.pickle_file,
-        debug=env.debug,
-        jira=jira,
-        jira_assay=env.jira_assay,
-        jira_url=env.jira_url,
-    )
+    if command == "notify":
+        notify_from_plan(
+            plan_file=args.input or env.plan_file,
+            pickle_file=env.pickle_file,
+            genetics_dirs=env.genetics_dirs,
+            slack_token=env.slack_token,
+            debug=env.debug,
+            ansible_week=env.ansible_week,
+            jira_url=env.jira_url,
+            notify_day=notify_day,
+            policy=env.policy,
+            checksum_rate=env.checksum_rate,
+        )
 
-    delete_runs(
-        pickle_file=env.pickle_file,
-        genetics_dir=env.genetics_dir,
-        jira_project_id=env.jira_project_id,
-        jira_reporter_id=env.jira_reporter_id,
-        slack_token=env.slack_token,
-        server_testing=env.server_testing,
-        debug=env.debug,
-        jira=jira,
-    )
+        return
+
+    if command == "delete":
+        delete_runs(
+            pickle_file=env.pickle_file,
+            genetics_dirs=env.genetics_dirs,
+            jira_project_id=env.jira_project_id,
+            jira_reporter_id=env.jira_reporter_id,
+            slack_token=env.slack_token,
+            server_testing=env.server_testing,
+            debug=env.debug,
+            jira=jira,
+            plan_file=args.from_plan,
+            delete_day=delete_day,
+            policy=env.policy,
+            checksum_rate=env.checksum_rate,
+        )
+
+        return
+
+    if command == "scan" or args.plan:
+        deletion_plan = check_for_deletion(
+            roots=env.roots,
+            server_testing=env.server_testing,
+            slack_token=env.slack_token,
+            pickle_file=env.pickle_file,
+            debug=env.debug,
+            jira=jira,
+            jira_assay=env.jira_assay,
+            jira_url=env.jira_url,
+            dry_run=True,
+            policy=env.policy,
+            full_evidence=args.verbose,
+            size_mode=env.size_mode,
+            checksum_rate=env.checksum_rate,
+        )
+
+        plan_file = getattr(args, "output", None) or args.plan
+        plan.write_plan(deletion_plan, plan_file or env.plan_file)
+
+        summary = deletion_plan["summary"]
+
+        log.info(
+            f"{summary['delete']} runs planned for deletion, projected to "
+            f"reclaim {sizeof_fmt(summary['projected_reclaimed_bytes'])}"
+        )
+
+        return
+
+    if command == "daemon":
+        # only import the daemon when requested, the same Jira session
+        # and dxpy login are reused for every cycle
+        from bin.daemon import Daemon
+
+        watchers = {}
+        # run sizes are only reused between cycles when watching, as
+        # the watchers give the runs changed and removed to drop
+        size_cache = {} if args.watch else None
+
+        if args.watch:
+            from bin.watcher import RunWatcher
+
+            for root in env.roots:
+                watchers[root.genetics_dir] = RunWatcher(
+                    root.seqs, root.genetics_dir, root.logs_dir
+                ).start()
+
+        Daemon(
+            cycle=lambda: run_cycle(
+                env,
+                jira,
+                notify_day,
+                delete_day,
+                watchers=watchers,
+                size_cache=size_cache,
+            ),
+            run_time=args.run_time,
+            port=args.port or None,
+            host=args.host,
+        ).run_forever(run_now=args.run_now)
+
+        for watcher in watchers.values():
+            watcher.stop()
+
+        return
+
+    run_cycle(env, jira, notify_day, delete_day, plan_file=args.from_plan)
+
+
+def main(args=None):
+    args = parse_args(args)
+    profile_mode = os.environ.get("ANSIBLE_PROFILE")
+
+    if profile_mode:
+        # only import the profiler when requested so that normal runs
+        # have no profiling overhead
+        from bin.profiler import run_with_profiler
+
+        run_with_profiler(lambda: run(args), profile_mode)
+    else:
+        run(args)
 
 
 if __name__ == "__main__":
     log.info("STARTING SCRIPT")
-    main()
+    main(sys.argv[1:])
     log.info("END SCRIPT")
@@ -28,7 +28,12 @@ The above needs to be tested on following days of the week:
     - other days of the week
         - should log issues but not send notifications
 
+
+Passing --offline will run against a local fake Jira server (from
+test/fake_servers.py) instead of the live Jira helpdesk, and will not
+send any Slack notifications.
 """
+import argparse
 from calendar import day_name
 from datetime import datetime
 import hashlib
@@ -46,6 +51,7 @@ from faker import Faker
 
 from bin.jira import Jira
 import monitor
+from test.fake_servers import FakeJiraServer
 
 
 class SetUp:
@@ -105,13 +111,20 @@ class SetUp:
         os.makedirs("simulate_test/logs/seq1", exist_ok=True)
         os.makedirs("simulate_test/logs/seq2", exist_ok=True)
 
+        # logs are last written when the upload finished, so are set to
+        # the same age as their run
+        today = datetime(2024, 3, 4)
+
         for idx in range(0, 8):
             seq = "seq1" if idx < 5 else "seq2"
-            open(
+            log_file = (
                 f"simulate_test/logs/{seq}/"
-                f"run.run{idx}_{self.suffix}.lane.all.log",
-                "w",
-            ).close()
+                f"run.run{idx}_{self.suffix}.lane.all.log"
+            )
+            open(log_file, "w").close()
+
+            age = (today + relativedelta(weeks=-idx)).timestamp()
+            os.utime(log_file, (age, age))
 
     def jira_tickets(self) -> list:
         """
@@ -445,7 +458,7 @@ def pickle_check() -> str:
         return hashlib.md5(str.encode(str(f))).hexdigest()
 
 
-def simulate_end_to_end(day, suffix) -> list:
+def simulate_end_to_end(day, suffix, offline=False) -> list:
     """
     Run everything to test the checking of runs for deletion
 
@@ -468,6 +481,9 @@ def simulate_end_to_end(day, suffix) -> list:
         day of the week we're checking for
     suffix : str
         randomly generated suffix string used for naming test directories
+    offline : bool
+        if running offline, Slack notifications will be counted but
+        not sent
 
     Returns
     -------
@@ -476,31 +492,35 @@ def simulate_end_to_end(day, suffix) -> list:
     """
     print("Simulating end to end running of checking and deletion")
     # below we will mock the function calls to dxpy to not need to create
-    # a load of test projects, we're simulating 7 runs there will be
-    # 7 returns for each patch
+    # a load of test projects, the mocks return based on the run number
+    # since runs too young to delete are never checked against DNAnexus
 
     # patch over logging in to DNAnexus
     patch("monitor.dx_login", return_value=True).start()
 
     # patch over the check for a run uploaded to StagingArea52
+    # n.b. run 2 is set as not uploaded
     patch(
         "monitor.check_run_uploaded",
-        side_effect=[True, False, True, True, True, True, True],
+        side_effect=lambda run: not run.startswith("run2_"),
+    ).start()
+
+    # patch over listing the files uploaded for a run, every run
+    # uploaded is set as fully uploaded
+    patch(
+        "monitor.get_upload_manifest",
+        side_effect=lambda run: {"files": 1, "bytes": 1024**5, "open": 0},
     ).start()
 
     # patch over check of 002 project with minimal required describe details
     # n.b. for runs 2, 3 and 6 we are setting it to have no 002 project
     patch(
         "monitor.get_describe_data",
-        side_effect=[
-            {"describe": {"id": "project-xxx"}},
-            {},
-            {},
-            {"describe": {"id": "project-xxx"}},
-            {"describe": {"id": "project-xxx"}},
-            {},
-            {"describe": {"id": "project-xxx"}},
-        ],
+        side_effect=lambda run: (
+            {}
+            if run.split("_")[0] in ["run2", "run3", "run6"]
+            else {"describe": {"id": "project-xxx"}}
+        ),
     ).start()
 
     # patch over datetime to simulate running on each day of the week,
@@ -513,7 +533,8 @@ def simulate_end_to_end(day, suffix) -> list:
     # mock the function that sends notifications to Slack to check for
     # how many times it is called without stopping the actual requests
     slack_mock = patch(
-        "monitor.post_message_to_slack", wraps=monitor.post_message_to_slack
+        "monitor.post_message_to_slack",
+        wraps=None if offline else monitor.post_message_to_slack,
     )
     slack_mock = slack_mock.start()
 
@@ -534,8 +555,23 @@ def simulate_end_to_end(day, suffix) -> list:
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="run against a local fake Jira server and don't send to Slack",
+    )
+    args = parser.parse_args()
+
     print("Starting test run simulation...")
 
+    if args.offline:
+        # start local fake Jira and point everything at it, monitor.main
+        # reads the URL from the environment so we override it there
+        jira_server = FakeJiraServer().start()
+        os.environ["JIRA_API_URL"] = jira_server.api_url
+        print(f"Running offline against fake Jira at {jira_server.api_url}")
+
     if os.environ.get("HTTPS_PROXY"):
         # check if proxy set, if running locally and not on server this
         # will cause POST requests to time out
@@ -563,7 +599,7 @@ def main():
         print(f"\nStarting simulated check for {day_name[day - 1]}")
         try:
             daily_errors = simulate_end_to_end(
-                day=day, suffix=test_data.suffix
+                day=day, suffix=test_data.suffix, offline=args.offline
             )
             errors[day_name[day - 1]] = daily_errors
         except Exception:
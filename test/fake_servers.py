@@ -0,0 +1,646 @@
+"""
+In-process HTTP stand-ins for the Jira REST API endpoints used by
+bin.jira.Jira and the DNAnexus API routes used by bin.util, to allow
+running the monitoring and load testing without any network access.
+
+Each server runs in a background thread and supports configurable:
+
+    - latency : seconds to wait before responding to each request
+    - error_rate : fraction of requests to fail with a 500 error
+    - throttle_rate : fraction of requests to reject as rate limited
+        (429 for Jira, 503 with Retry-After for DNAnexus as the platform
+        does), with a Retry-After of `retry_after` seconds
+    - dataset size : via populate() or the add_issue() / add_run() methods
+
+Example usage:
+
+    with FakeJiraServer(latency=0.05) as jira_server, \\
+            FakeDNAnexusServer(latency=0.1) as dx_server:
+        populate(jira_server, dx_server, runs)
+
+        jira = Jira("token", "email", jira_server.api_url, debug=False)
+        dx_server.configure_dxpy()
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import random
+import re
+import threading
+from time import sleep
+from urllib.parse import parse_qs, urlparse
+
+
+# Jira project IDs as used in bin.jira and simulate_test_runs.py
+JIRA_PROJECTS = {"10040": "EBH", "10042": "EBHD"}
+
+# transition IDs to resulting status, as used in simulate_test_runs.py
+JIRA_TRANSITIONS = {
+    "31": "Data received",
+    "41": "Data processed",
+    "21": "All samples released",
+    "61": "Data cannot be processed",
+    "71": "Data cannot be released",
+}
+
+STAGING_PROJECT = "project-FpVG0G84X7kzq58g19vF1YJQ"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Request handler passing all requests through to the owning fake
+    server's handle() method
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        status, payload, headers = self.server.fake.handle(
+            method, self.path, body, self.headers
+        )
+
+        data = b"" if payload is None else json.dumps(payload).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+
+        for key, value in headers.items():
+            self.send_header(key, value)
+
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        # don't spam stderr with a line per request
+        pass
+
+
+class FakeServer:
+    """
+    Base fake server, handles running the HTTP server in a background
+    thread and injecting latency, errors and rate limiting
+
+    Parameters
+    ----------
+    latency : float
+        seconds to wait before responding to each request
+    error_rate : float
+        fraction of requests to respond to with a 500 error
+    throttle_rate : float
+        fraction of requests to respond to as rate limited
+    retry_after : int
+        seconds to set in Retry-After header of rate limited responses
+    seed : int
+        seed for the random error / rate limiting selection
+    """
+
+    throttle_status = 429
+
+    def __init__(
+        self,
+        latency=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1,
+        seed=None,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.throttled_count = 0
+        self.error_count = 0
+        self.httpd = None
+        self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        """
+        Start the server on a free local port in a background thread
+        """
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+        self.thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def handle(self, method, path, body, headers) -> tuple:
+        """
+        Handle a request, applying latency and randomly failing or
+        rate limiting it before passing to route()
+
+        Returns
+        -------
+        tuple
+            status code, JSON payload and dict of extra headers
+        """
+        with self.lock:
+            self.request_count += 1
+            roll = self.random.random()
+
+        if self.latency:
+            sleep(self.latency)
+
+        if roll < self.throttle_rate:
+            with self.lock:
+                self.throttled_count += 1
+
+            return (
+                self.throttle_status,
+                {"error": "rate limited"},
+                {"Retry-After": str(self.retry_after)},
+            )
+
+        if roll < self.throttle_rate + self.error_rate:
+            with self.lock:
+                self.error_count += 1
+
+            return 500, {"error": "injected server error"}, {}
+
+        parsed = urlparse(path)
+        query = parse_qs(parsed.query)
+        data = json.loads(body) if body else {}
+
+        with self.lock:
+            return self.route(method, parsed.path, query, data, headers)
+
+    def route(self, method, path, query, data, headers) -> tuple:
+        raise NotImplementedError
+
+
+class FakeJiraServer(FakeServer):
+    """
+    Fake of the Jira REST endpoints used by bin.jira.Jira, the api_url
+    property should be passed as the api_url to Jira()
+    """
+
+    throttle_status = 429
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.issues = {}
+        self.ids = itertools.count(10000)
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/rest"
+
+    def add_issue(
+        self,
+        summary,
+        status="New",
+        assay="MYE",
+        project="EBH",
+        issue_type="10179",
+    ) -> dict:
+        """
+        Add an issue to the fake Jira
+
+        Returns
+        -------
+        dict
+            issue as returned by the Jira API
+        """
+        issue_id = str(next(self.ids))
+        key = f"{project}-{issue_id}"
+
+        issue = {
+            "id": issue_id,
+            "key": key,
+            "fields": {
+                "summary": summary,
+                "created": "2024-01-01T00:00:00.000+0000",
+                "updated": "2024-01-01T00:00:00.000+0000",
+                "issuetype": {"id": str(issue_type)},
+                "status": {"id": "1", "name": status},
+                "project": {"id": "", "key": project, "name": project},
+                "priority": {"id": "3", "name": "Medium"},
+                "creator": {},
+                "reporter": {},
+                "assignee": None,
+                "customfield_10070": [{"value": assay}] if assay else None,
+            },
+        }
+
+        self.issues[issue_id] = issue
+
+        return issue
+
+    def find_issue(self, issue_id) -> dict:
+        """
+        Find an issue by ID or key
+        """
+        if issue_id in self.issues:
+            return self.issues[issue_id]
+
+        for issue in self.issues.values():
+            if issue["key"] == issue_id:
+                return issue
+
+        return None
+
+    def search(self, jql) -> list:
+        """
+        Minimal JQL evaluation supporting the `project = X` and
+        `summary ~ "Y"` clauses used by Jira.search_issue() and the
+        `key in (...)` clause used by Jira.get_issue_statuses()
+        """
+        project = re.search(r"project\s*=\s*(\w+)", jql)
+        summary = re.search(r'summary\s*~\s*"([^"]*)"', jql)
+        keys = re.search(r"key\s+in\s*\(([^)]*)\)", jql)
+
+        if keys:
+            keys = {x.strip() for x in keys.group(1).split(",")}
+
+        results = []
+
+        for issue in self.issues.values():
+            fields = issue["fields"]
+
+            if keys is not None and issue["key"] not in keys:
+                continue
+
+            if project and fields["project"]["key"] != project.group(1):
+                continue
+
+            if (
+                summary
+                and summary.group(1).lower() not in fields["summary"].lower()
+            ):
+                continue
+
+            results.append(issue)
+
+        return results
+
+    def route(self, method, path, query, data, headers) -> tuple:
+        parts = [x for x in path.split("/") if x]
+
+        if parts[:1] != ["rest"]:
+            return 404, {"errorMessages": ["Not found"]}, {}
+
+        parts = parts[1:]
+
+        if parts == ["servicedeskapi", "servicedesk"]:
+            return 200, {"values": [], "isLastPage": True}, {}
+
+        if parts[:2] != ["api", "3"]:
+            return 404, {"errorMessages": ["Not found"]}, {}
+
+        parts = parts[2:]
+
+        if parts == ["search"] and method == "GET":
+            jql = query.get("jql", [""])[0]
+            start = int(query.get("startAt", [0])[0])
+            max_results = int(query.get("maxResults", [50])[0])
+            issues = self.search(jql)
+
+            return (
+                200,
+                {
+                    "startAt": start,
+                    "maxResults": max_results,
+                    "total": len(issues),
+                    "issues": issues[start : start + max_results],
+                },
+                {},
+            )
+
+        if parts == ["issue"] and method == "POST":
+            fields = data.get("fields", {})
+            project = JIRA_PROJECTS.get(
+                str(fields.get("project", {}).get("id")), "EBH"
+            )
+            assay = fields.get("customfield_10070", [{}])[0].get("value")
+            issue = self.add_issue(
+                summary=fields.get("summary", ""),
+                assay=assay,
+                project=project,
+                issue_type=fields.get("issuetype", {}).get("id", "10179"),
+            )
+
+            return (
+                201,
+                {"id": issue["id"], "key": issue["key"], "self": ""},
+                {},
+            )
+
+        if len(parts) >= 2 and parts[0] == "issue":
+            issue = self.find_issue(parts[1])
+
+            if not issue:
+                return (
+                    404,
+                    {"errorMessages": ["Issue does not exist"]},
+                    {},
+                )
+
+            if len(parts) == 2 and method == "GET":
+                return 200, issue, {}
+
+            if len(parts) == 2 and method == "DELETE":
+                self.issues.pop(issue["id"])
+                return 204, None, {}
+
+            if parts[2:] == ["transitions"] and method == "GET":
+                transitions = [
+                    {"id": k, "name": v} for k, v in JIRA_TRANSITIONS.items()
+                ]
+                return 200, {"transitions": transitions}, {}
+
+            if parts[2:] == ["transitions"] and method == "POST":
+                transition = str(data.get("transition", {}).get("id"))
+                issue["fields"]["status"]["name"] = JIRA_TRANSITIONS.get(
+                    transition, issue["fields"]["status"]["name"]
+                )
+                return 204, None, {}
+
+        return 404, {"errorMessages": ["Not found"]}, {}
+
+
+class FakeDNAnexusServer(FakeServer):
+    """
+    Fake of the DNAnexus API routes used by bin.util, call
+    configure_dxpy() to point dxpy at the server
+
+    Parameters
+    ----------
+    token : str
+        auth token to accept, all others will be rejected
+    """
+
+    # DNAnexus signals rate limiting with a 503 and Retry-After header
+    throttle_status = 503
+
+    def __init__(self, token="fake-token", **kwargs):
+        super().__init__(**kwargs)
+        self.token = token
+        self.files = []
+        self.projects = []
+        self.ids = itertools.count(1)
+
+    def configure_dxpy(self) -> None:
+        """
+        Point dxpy at the fake server and log in with the accepted token
+        """
+        import dxpy as dx
+
+        dx.set_api_server_info(
+            host="127.0.0.1", port=self.port, protocol="http"
+        )
+        dx.set_security_context(
+            {"auth_token_type": "Bearer", "auth_token": self.token}
+        )
+
+    def add_run(
+        self, run, uploaded=True, project=True, n_files=1, file_size=1024
+    ) -> None:
+        """
+        Add the DNAnexus data for a run
+
+        Parameters
+        ----------
+        run : str
+            run ID
+        uploaded : bool
+            if to add files for the run to the staging project
+        project : bool
+            if to add a 002 project for the run
+        n_files : int
+            number of files to add to the staging project
+        file_size : int
+            size of each uploaded file in bytes
+        """
+        if uploaded:
+            for idx in range(n_files):
+                self.files.append(
+                    {
+                        "id": f"file-{next(self.ids):024}",
+                        "project": STAGING_PROJECT,
+                        "folder": f"/{run}",
+                        "name": f"run.{run}.lane.all_{idx:03}.tar.gz",
+                        "size": file_size,
+                        "state": "closed",
+                        "class": "file",
+                    }
+                )
+
+        if project:
+            project_id = f"project-{next(self.ids):024}"
+            self.projects.append(
+                {
+                    "id": project_id,
+                    "name": f"002_{run}_MYE",
+                    "class": "project",
+                }
+            )
+
+    @staticmethod
+    def paginate(results, data) -> dict:
+        """
+        Page results in the same way as the platform find routes
+        """
+        start = int(data.get("starting") or 0)
+        limit = int(data.get("limit") or 1000)
+        page = results[start : start + limit]
+        next_page = start + limit if start + limit < len(results) else None
+
+        return {"results": page, "next": next_page}
+
+    def find_data_objects(self, data) -> dict:
+        scope = data.get("scope", {})
+        folder = scope.get("folder", "/")
+        recurse = scope.get("recurse", True)
+
+        results = []
+
+        for obj in self.files:
+            if scope.get("project") and obj["project"] != scope["project"]:
+                continue
+
+            if recurse:
+                matched = obj["folder"] == folder or obj["folder"].startswith(
+                    folder.rstrip("/") + "/"
+                )
+            else:
+                matched = obj["folder"] == folder
+
+            if not matched:
+                continue
+
+            result = {"project": obj["project"], "id": obj["id"]}
+
+            if data.get("describe"):
+                result["describe"] = self.describe(obj, data["describe"])
+
+            results.append(result)
+
+        return self.paginate(results, data)
+
+    def find_projects(self, data) -> dict:
+        name = data.get("name", {})
+        pattern = name.get("regexp") if isinstance(name, dict) else None
+
+        results = []
+
+        for project in self.projects:
+            if pattern and not re.search(pattern, project["name"]):
+                continue
+            if isinstance(name, str) and project["name"] != name:
+                continue
+
+            result = {"id": project["id"], "level": "VIEW"}
+
+            if data.get("describe"):
+                result["describe"] = project
+
+            results.append(result)
+
+        return self.paginate(results, data)
+
+    @staticmethod
+    def describe(obj, describe) -> dict:
+        """
+        Describe a data object, restricted to the requested fields
+        """
+        fields = None
+
+        if isinstance(describe, dict):
+            fields = describe.get("fields")
+
+        if not fields:
+            return dict(obj)
+
+        return {k: v for k, v in obj.items() if k in fields or k == "id"}
+
+    def route(self, method, path, query, data, headers) -> tuple:
+        auth = headers.get("Authorization", "")
+
+        if auth != f"Bearer {self.token}":
+            return (
+                401,
+                {
+                    "error": {
+                        "type": "InvalidAuthentication",
+                        "message": "The token could not be found",
+                    }
+                },
+                {},
+            )
+
+        if path == "/system/whoami":
+            return 200, {"id": "user-fake"}, {}
+
+        if path == "/system/findDataObjects":
+            return 200, self.find_data_objects(data), {}
+
+        if path == "/system/findProjects":
+            return 200, self.find_projects(data), {}
+
+        match = re.match(r"^/(file-\w+)/describe$", path)
+
+        if match:
+            for obj in self.files:
+                if obj["id"] == match.group(1):
+                    return 200, self.describe(obj, data), {}
+
+        return (
+            404,
+            {
+                "error": {
+                    "type": "ResourceNotFound",
+                    "message": f"Route {path} not found",
+                }
+            },
+            {},
+        )
+
+
+def populate(
+    jira_server, dx_server, runs, project="EBH", seed=None, run_size=1024
+) -> None:
+    """
+    Populate the fake servers with a random mix of run states, the
+    majority of runs being uploaded, processed and released
+
+    Parameters
+    ----------
+    jira_server : FakeJiraServer
+        fake Jira to add tickets to
+    dx_server : FakeDNAnexusServer
+        fake DNAnexus to add run data to
+    runs : list
+        list of run IDs to add
+    project : str
+        Jira project key to add tickets to (EBH or EBHD)
+    seed : int
+        seed for random selection of run states
+    run_size : int
+        bytes of each local run, split over the files uploaded for it
+        so that uploads cover the run
+    """
+    rand = random.Random(seed)
+    statuses = [
+        "All samples released",
+        "All samples released",
+        "All samples released",
+        "Data cannot be processed",
+        "Data cannot be released",
+        "On hold",
+        "New",
+    ]
+
+    for run in runs:
+        jira_server.add_issue(
+            summary=run, status=rand.choice(statuses), project=project
+        )
+        uploaded = rand.random() > 0.05
+        has_project = rand.random() > 0.05
+        n_files = rand.randint(1, 4)
+        dx_server.add_run(
+            run,
+            uploaded=uploaded,
+            project=has_project,
+            n_files=n_files,
+            file_size=-(-run_size // n_files),
+        )
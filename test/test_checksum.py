@@ -0,0 +1,77 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from bin.checksum import ChecksumEngine, RateLimiter
+
+
+class TestChecksumEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "RunInfo.xml")
+        self.data = os.urandom(2500)
+
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+        self.cache = os.path.join(self.tmp_dir.name, "checksums.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def parts(self, *sizes):
+        # expected size and MD5 of each part of the file
+        parts = []
+        start = 0
+
+        for size in sizes:
+            chunk = self.data[start : start + size]
+            parts.append((size, hashlib.md5(chunk).hexdigest()))
+            start += size
+
+        return parts
+
+    def test_hash_parts(self):
+        engine = ChecksumEngine()
+
+        self.assertEqual(
+            engine.hash_parts(self.path, [1000, 1000, 500]),
+            [x[1] for x in self.parts(1000, 1000, 500)],
+        )
+
+    def test_verify_mismatch(self):
+        engine = ChecksumEngine()
+        parts = self.parts(2500)
+
+        self.assertEqual(engine.verify({self.path: parts}), [])
+        self.assertEqual(
+            engine.verify({self.path: [(2500, "0" * 32)]}), [self.path]
+        )
+
+    def test_resumes_from_cache(self):
+        ChecksumEngine(self.cache).verify({self.path: self.parts(2500)})
+
+        engine = ChecksumEngine(self.cache)
+        parts = self.parts(2500)
+
+        with patch("bin.checksum.hashlib.md5") as mock_md5:
+            self.assertEqual(engine.verify({self.path: parts}), [])
+
+        mock_md5.assert_not_called()
+
+    def test_rate_limit(self):
+        limiter = RateLimiter(rate=1000)
+
+        with patch("bin.checksum.sleep") as mock_sleep:
+            limiter.consume(500)
+            mock_sleep.assert_not_called()
+
+            # a second's burst is allowed, beyond it reads are slowed
+            limiter.consume(2500)
+            self.assertAlmostEqual(mock_sleep.call_args[0][0], 2, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import datetime as dt
+import json
+import sys
+import unittest
+from urllib.request import urlopen
+
+from bin.daemon import Daemon
+
+
+class TestDaemon(unittest.TestCase):
+    def test_get_next_run(self):
+        """
+        Function should return today's run time if not yet passed and
+        tomorrow's otherwise
+        """
+        daemon = Daemon(cycle=lambda: None, run_time="06:00", port=None)
+
+        before = daemon.get_next_run(dt.datetime(2024, 3, 4, 5, 0))
+        after = daemon.get_next_run(dt.datetime(2024, 3, 4, 7, 0))
+
+        with self.subTest():
+            self.assertEqual(
+                before, dt.datetime(2024, 3, 4, 6, 0), "wrong same day run"
+            )
+            self.assertEqual(
+                after, dt.datetime(2024, 3, 5, 6, 0), "wrong next day run"
+            )
+
+    def test_run_cycle_survives_exit(self):
+        """
+        Cycles calling sys.exit() or raising should be recorded as errors
+        without stopping the daemon, and clean exits recorded as ok
+        """
+        cycles = iter(
+            [
+                lambda: sys.exit("END SCRIPT"),
+                lambda: 1 / 0,
+                lambda: sys.exit(0),
+            ]
+        )
+        daemon = Daemon(cycle=lambda: next(cycles)(), port=None, history=2)
+
+        for _ in range(3):
+            daemon.run_cycle()
+
+        with self.subTest():
+            self.assertEqual(
+                [x["status"] for x in daemon.history],
+                ["error", "ok"],
+                "cycle outcomes or history bound wrong",
+            )
+
+    def test_health_endpoint(self):
+        """
+        Health endpoint should serve the daemon state as JSON
+        """
+        daemon = Daemon(cycle=lambda: None, port=0)
+        daemon.start_server()
+        daemon.run_cycle()
+
+        with urlopen(f"http://127.0.0.1:{daemon.port}/health") as response:
+            health = json.load(response)
+
+        daemon.httpd.shutdown()
+        daemon.httpd.server_close()
+
+        self.assertEqual(health["last_run"]["status"], "ok", "bad health")
+
+
+if __name__ == "__main__":
+    unittest.main()
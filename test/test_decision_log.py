@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+
+from bin.decision_log import DecisionLog, read_decisions
+
+
+class TestDecisionLog(unittest.TestCase):
+    def test_records_read_back_across_rotation(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "decisions.jsonl")
+
+            with DecisionLog(path) as decisions:
+                decisions.record(
+                    "check", "run1", "delete", "released", size=10
+                )
+                # rotate as would happen at midnight
+                decisions.handler.doRollover()
+                decisions.record("delete", "run1", "deleted", "released")
+
+            rotated = [x for x in os.listdir(tmp_dir) if x.endswith(".gz")]
+            records = read_decisions(path)
+
+        self.assertEqual(len(rotated), 1)
+        self.assertEqual(
+            [(x["stage"], x["decision"]) for x in records],
+            [("check", "delete"), ("delete", "deleted")],
+        )
+        self.assertEqual(records[0]["size"], 10)
+        self.assertEqual(records[0]["invocation"], records[1]["invocation"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from unittest.mock import Mock
+
+from bin.evidence import RunEvidence
+from bin.policy import get_policy
+
+
+class TestRunEvidence(unittest.TestCase):
+    def setUp(self):
+        self.checks = {
+            "jira": Mock(return_value=("MYE", "On hold", "EBH-1")),
+            "uploaded": Mock(return_value=True),
+            "project": Mock(return_value={"describe": {"id": "project-1"}}),
+            "size": Mock(return_value=(10, None)),
+        }
+        self.evidence = RunEvidence(self.checks)
+
+    def test_checks_made_once_on_use(self):
+        self.assertIsNone(self.evidence.get("status"))
+        self.assertEqual(self.evidence["status"], "On hold")
+        self.assertEqual(self.evidence["key"], "EBH-1")
+
+        self.checks["jira"].assert_called_once()
+        self.checks["size"].assert_not_called()
+        self.assertEqual(list(self.evidence.timings), ["jira"])
+
+        self.evidence.collect()
+
+        self.assertEqual(self.evidence.get("size"), 10)
+        self.checks["jira"].assert_called_once()
+
+    def test_policy_only_uses_needed_checks(self):
+        """
+        A run whose Jira status matches no rule should be decided
+        without checking DNAnexus or sizing the run
+        """
+        match = get_policy(["MYE"]).match(self.evidence, 4)
+
+        self.assertIsNone(match.decision)
+        self.checks["uploaded"].assert_not_called()
+        self.checks["project"].assert_not_called()
+        self.checks["size"].assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+from bin.jira import Jira
+from test.fake_servers import FakeJiraServer
+
+
+class TestFakeServers(unittest.TestCase):
+    def test_fake_jira_get_issue_detail(self):
+        """
+        Jira.get_issue_detail should find tickets on the fake Jira
+        and reflect transitions made to them
+        """
+        with FakeJiraServer() as server:
+            jira = Jira("token", "email", server.api_url, debug=True)
+
+            issue = jira.create_issue(
+                summary="run1_fake",
+                issue_id=10179,
+                project_id=10042,
+                reporter_id="",
+                priority_id=3,
+                desc="",
+                assay=True,
+            )
+            jira.make_transition(issue["id"], 61)
+
+            assay, status, key = jira.get_issue_detail("run1_fake", False)
+            missing = jira.get_issue_detail("run2_fake", False)
+
+        with self.subTest():
+            self.assertEqual(
+                [assay, status, key],
+                ["MYE", "Data cannot be processed", issue["key"]],
+                "fake Jira returned wrong issue detail",
+            )
+            self.assertIsNone(missing[2], "fake Jira found missing ticket")
+
+    def test_fake_jira_get_issue_statuses(self):
+        """
+        Jira.get_issue_statuses should get the status of every existing
+        key in a single request, leaving out keys that don't exist
+        """
+        with FakeJiraServer() as server:
+            jira = Jira("token", "email", server.api_url, debug=True)
+
+            keys = [
+                jira.create_issue(
+                    summary=f"run{idx}_fake",
+                    issue_id=10179,
+                    project_id=10042,
+                    reporter_id="",
+                    priority_id=3,
+                    desc="",
+                    assay=True,
+                )["key"]
+                for idx in range(3)
+            ]
+            jira.make_transition(keys[0], 61)
+
+            count = server.request_count
+            statuses = jira.get_issue_statuses(keys + ["EBHD-999"])
+            requests = server.request_count - count
+
+        with self.subTest():
+            self.assertEqual(requests, 1, "statuses not fetched in one query")
+            self.assertEqual(
+                sorted(statuses), sorted(keys), "wrong tickets returned"
+            )
+            self.assertEqual(statuses[keys[0]], "Data cannot be processed")
+
+    def test_fake_jira_rate_limit(self):
+        """
+        Fake Jira should rate limit every request with a throttle rate
+        of 1 and include a Retry-After header
+        """
+        with FakeJiraServer(throttle_rate=1, retry_after=5) as server:
+            jira = Jira("token", "email", server.api_url, debug=True)
+            response = jira.http.get(f"{server.api_url}/api/3/search")
+
+        with self.subTest():
+            self.assertEqual(response.status_code, 429, "not rate limited")
+            self.assertEqual(
+                response.headers["Retry-After"], "5", "wrong Retry-After"
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
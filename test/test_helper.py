@@ -0,0 +1,54 @@
+import io
+import json
+import logging
+import logging.handlers
+import unittest
+from unittest.mock import patch
+
+from bin import helper
+
+
+class TestGetLogger(unittest.TestCase):
+    """
+    Tests for the shared handlers set up by get_logger()
+    """
+
+    def tearDown(self):
+        helper.configure_logging(log_format="text", use_queue=False)
+
+    def test_handlers_not_duplicated(self):
+        logger = helper.get_logger("test helper log")
+        n_handlers = len(logger.handlers)
+
+        logger = helper.get_logger("test helper log")
+        other = helper.get_logger("other test helper log")
+
+        self.assertEqual(len(logger.handlers), n_handlers)
+        self.assertEqual(logger.handlers, other.handlers)
+
+    def test_json_lines_through_queue(self):
+        stream = io.StringIO()
+
+        with patch.object(helper.sys, "stdout", stream):
+            helper.configure_logging(log_format="json", use_queue=True)
+            logger = helper.get_logger("test helper log")
+
+            self.assertTrue(
+                any(
+                    isinstance(x, logging.handlers.QueueHandler)
+                    for x in logger.handlers
+                )
+            )
+
+            logger.info("deleting %s", "run1")
+            # stopping the listener flushes any queued records
+            helper.stop_logging()
+
+        lines = stream.getvalue().splitlines()
+
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["message"], "deleting run1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from bin.history import HistoryStore
+
+
+TB = 1024**4
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.history = HistoryStore(
+            os.path.join(self.tmp_dir.name, "history.db")
+        )
+        self.start = datetime(2024, 3, 1)
+
+    def tearDown(self):
+        self.history.close()
+        self.tmp_dir.cleanup()
+
+    def test_days_until_full_adds_back_reclaimed(self):
+        # 1TB of new data a day with 2TB deleted on day 5, leaving 72TB
+        # free by day 10 => 72 days until full
+        for day in range(11):
+            used = 20 * TB + day * TB - (2 * TB if day >= 5 else 0)
+            self.history.add_usage(
+                self.start + timedelta(days=day),
+                "/genetics",
+                (100 * TB, used, 100 * TB - used),
+            )
+
+        self.history.add_reclaimed(
+            self.start + timedelta(days=5), "/genetics", "run1", "A", 2 * TB
+        )
+
+        days = self.history.days_until_full(
+            "/genetics", self.start + timedelta(days=10)
+        )
+
+        self.assertAlmostEqual(days, 72, places=5)
+
+    def test_no_forecast_without_enough_samples(self):
+        self.history.add_usage(self.start, "/genetics", (10, 5, 5))
+
+        self.assertIsNone(
+            self.history.days_until_full("/genetics", self.start)
+        )
+
+    def test_sequencer_usage_per_root(self):
+        for path in ["/genetics", "/genetics2"]:
+            self.history.add_sequencer_usage(
+                self.start, path, {"A01295a": {"bytes": 10, "runs": 1}}
+            )
+
+        rows = self.history.conn.execute(
+            "SELECT path, seq, bytes FROM sequencer_usage ORDER BY path"
+        ).fetchall()
+
+        self.assertEqual(
+            rows,
+            [("/genetics", "A01295a", 10), ("/genetics2", "A01295a", 10)],
+        )
+
+    def test_sequencer_usage_path_added(self):
+        # store from before sequencer usage had a path
+        path = os.path.join(self.tmp_dir.name, "old.db")
+
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                "CREATE TABLE sequencer_usage (time TEXT NOT NULL, seq TEXT "
+                "NOT NULL, bytes INTEGER NOT NULL, runs INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT INTO sequencer_usage VALUES ('2024', 'A', 1, 1)"
+            )
+
+        conn.close()
+        history = HistoryStore(path)
+        history.add_sequencer_usage(
+            self.start, "/genetics", {"A": {"bytes": 2, "runs": 1}}
+        )
+        rows = history.conn.execute(
+            "SELECT path, bytes FROM sequencer_usage ORDER BY bytes"
+        ).fetchall()
+        history.close()
+
+        self.assertEqual(rows, [(None, 1), ("/genetics", 2)])
+
+    def test_run_sizes_replaced(self):
+        self.history.add_run_sizes(self.start, {"run1": ("A01295", 10, 100)})
+        self.history.add_run_sizes(
+            self.start + timedelta(days=1),
+            {"run1": ("A01295", 10, 200), "run2": ("M00123", 5, 50)},
+        )
+
+        self.assertEqual(
+            self.history.get_run_sizes(),
+            {"run1": ("A01295", 10, 200), "run2": ("M00123", 5, 50)},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
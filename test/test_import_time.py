@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(ROOT, "test", "import_time_budget.json")
+
+
+def get_import_times(module: str) -> dict:
+    """
+    Import the given module in a fresh interpreter with -X importtime
+
+    Returns
+    -------
+    dict
+        mapping of imported module name to cumulative import time in us
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+
+    times = {}
+
+    # lines are 'import time: self [us] | cumulative | imported package'
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    """
+    Check importing monitor.py stays within the stored budget and does
+    not load the heavy clients, these should only be imported by the
+    stage that needs them
+    """
+
+    def setUp(self):
+        with open(BUDGET_FILE) as f:
+            self.budget = json.load(f)
+
+        # take the best of a few runs to reduce noise from a busy host
+        runs = [get_import_times(self.budget["module"]) for _ in range(3)]
+        self.times = min(runs, key=lambda x: x[self.budget["module"]])
+
+    def test_within_budget(self):
+        self.assertLessEqual(
+            self.times[self.budget["module"]],
+            self.budget["max_cumulative_us"],
+            "import time of monitor.py over budget",
+        )
+
+    def test_heavy_modules_not_imported(self):
+        for module in self.budget["not_imported"]:
+            with self.subTest(module=module):
+                self.assertNotIn(module, self.times)
+
+
+if __name__ == "__main__":
+    unittest.main()
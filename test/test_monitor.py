@@ -0,0 +1,553 @@
+from datetime import datetime
+import hashlib
+import os
+import tempfile
+from types import SimpleNamespace
+import unittest
+from unittest.mock import Mock, patch
+
+import monitor
+from bin import plan
+from bin.checksum import CHECKSUM_CACHE, ChecksumEngine
+from bin.history import HISTORY_DB
+from bin.run_metadata import RUN_METADATA_CACHE
+from bin.size_index import SIZE_INDEX_CACHE
+
+
+ENV = {
+    "SLACK_TOKEN": "token",
+    "SLACK_NOTIFY_JIRA_URL": "url",
+    "DNANEXUS_TOKEN": "token",
+    "JIRA_TOKEN": "token",
+    "JIRA_EMAIL": "email",
+    "JIRA_API_URL": "url",
+    "JIRA_ASSAY": "MYE,TSO500",
+    "JIRA_PROJECT_ID": "10042",
+    "JIRA_REPORTER_ID": "id",
+    "ANSIBLE_PICKLE_PATH": "/log/monitoring",
+    "ANSIBLE_GENETICDIR": "/genetics",
+    "ANSIBLE_LOGSDIR": "/var/log/dx-streaming-upload",
+    "ANSIBLE_WEEK": "2",
+    "ANSIBLE_SEQ": "A01295a,A01295b",
+    "ANSIBLE_TESTING": "true",
+    "ANSIBLE_DEBUG": "false",
+}
+
+
+class TestGetEnvVariables(unittest.TestCase):
+    def test_single_root(self):
+        with patch.dict(os.environ, ENV):
+            env = monitor.get_env_variables()
+
+        self.assertEqual(len(env.roots), 1)
+        self.assertEqual(env.roots[0].seqs, ["A01295a", "A01295b"])
+        self.assertEqual(env.genetics_dirs, ["/genetics"])
+
+    def test_multiple_roots(self):
+        """
+        Each root should get its own sequencers and log directory, with
+        a single number of weeks applying to all roots
+        """
+        multi_env = {
+            **ENV,
+            "ANSIBLE_GENETICDIR": "/genetics;/genetics2",
+            "ANSIBLE_LOGSDIR": "/logs;/logs2",
+            "ANSIBLE_SEQ": "A01295a,A01295b;A01303a",
+        }
+
+        with patch.dict(os.environ, multi_env):
+            env = monitor.get_env_variables()
+
+        self.assertEqual(
+            [
+                (x.genetics_dir, x.logs_dir, x.seqs, x.ansible_week)
+                for x in env.roots
+            ],
+            [
+                ("/genetics", "/logs", ["A01295a", "A01295b"], 2),
+                ("/genetics2", "/logs2", ["A01303a"], 2),
+            ],
+        )
+
+    def test_mismatched_roots(self):
+        with patch.dict(
+            os.environ, {**ENV, "ANSIBLE_GENETICDIR": "/genetics;/genetics2"}
+        ):
+            with self.assertRaises(AssertionError):
+                monitor.get_env_variables()
+
+
+class TestGetDiskUsage(unittest.TestCase):
+    def test_same_filesystem_counted_once(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            roots = [os.path.join(tmp_dir, x) for x in ["a", "b"]]
+
+            for root in roots:
+                os.mkdir(root)
+
+            usage, filesystems = monitor.get_disk_usage(roots)
+
+        self.assertEqual(list(filesystems), roots)
+        self.assertEqual(usage, tuple(filesystems[roots[0]]))
+
+
+class TestCheckForDeletion(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.genetics_dir = os.path.join(self.tmp_dir.name, "genetics")
+        self.logs_dir = os.path.join(self.tmp_dir.name, "logs")
+        self.monitoring_dir = os.path.join(self.tmp_dir.name, "monitoring")
+        self.pickle_file = os.path.join(self.monitoring_dir, "dict.pickle")
+        os.makedirs(self.monitoring_dir)
+
+        # run old enough to delete, one too young and an old run still
+        # uploading (upload log recently modified)
+        for run, age_days, log_age_days in [
+            ("old_run", 400, 400),
+            ("young_run", 1, 1),
+            ("active_run", 400, 0),
+        ]:
+            run_path = os.path.join(self.genetics_dir, "seq1", run)
+            log_file = os.path.join(
+                self.logs_dir, "seq1", f"run.{run}.lane.all.log"
+            )
+            os.makedirs(os.path.join(run_path, "L001"))
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            open(log_file, "w").close()
+            open(os.path.join(run_path, "CopyComplete.txt"), "w").close()
+
+            for path, days in [(run_path, age_days), (log_file, log_age_days)]:
+                mtime = datetime.now().timestamp() - days * 86400
+                os.utime(path, (mtime, mtime))
+
+        self.root = SimpleNamespace(
+            genetics_dir=self.genetics_dir,
+            logs_dir=self.logs_dir,
+            seqs=["seq1"],
+            ansible_week=2,
+        )
+        self.jira = Mock()
+        self.jira.get_issue_detail.return_value = (
+            "MYE",
+            "ALL SAMPLES RELEASED",
+            "EBH-1",
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def check(self, dry_run=True, size_mode="exact", **mocks):
+        """
+        Run check_for_deletion over the runs with DNAnexus and Slack
+        mocked, returning the plan and mocks
+        """
+        mocks = {
+            "check_run_uploaded": Mock(return_value=True),
+            "get_describe_data": Mock(
+                return_value={"describe": {"id": "project-xxx"}}
+            ),
+            "get_upload_manifest": Mock(
+                return_value={"files": 1, "bytes": 10**9, "open": 0}
+            ),
+            "send_notifications": Mock(),
+            "post_message_to_slack": Mock(),
+            "post_simple_message_to_slack": Mock(),
+            "get_monitoring_dir": Mock(return_value=self.monitoring_dir),
+            **mocks,
+        }
+
+        with patch.multiple(monitor, **mocks):
+            deletion_plan = monitor.check_for_deletion(
+                roots=[self.root],
+                server_testing=False,
+                slack_token="token",
+                pickle_file=self.pickle_file,
+                debug=False,
+                jira_assay=["MYE"],
+                jira_url="url",
+                jira=self.jira,
+                dry_run=dry_run,
+                notify_day=None,
+                policy=monitor.get_policy(["MYE"]),
+                size_mode=size_mode,
+            )
+
+        return deletion_plan, mocks
+
+    def test_dry_run_side_effects(self):
+        """
+        Dry runs should only plan, without writing the pickle file,
+        caches or usage history or sending anything
+        """
+        deletion_plan, mocks = self.check()
+
+        self.assertEqual(
+            deletion_plan["runs"]["old_run"]["decision"], plan.DELETE
+        )
+        self.assertFalse(os.path.exists(self.pickle_file))
+        mocks["send_notifications"].assert_not_called()
+        mocks["post_message_to_slack"].assert_not_called()
+        mocks["post_simple_message_to_slack"].assert_not_called()
+
+        for name in [
+            HISTORY_DB,
+            SIZE_INDEX_CACHE,
+            RUN_METADATA_CACHE,
+            CHECKSUM_CACHE,
+        ]:
+            self.assertNotIn(name, os.listdir(self.monitoring_dir))
+
+        # the same check made for real does record the usage history
+        self.check(dry_run=False)
+
+        self.assertIn(HISTORY_DB, os.listdir(self.monitoring_dir))
+
+    def test_young_and_active_runs_not_checked(self):
+        """
+        Runs too young to delete or still active should be decided
+        without any Jira, DNAnexus or sizing calls
+        """
+        for size_mode in ["exact", "estimate"]:
+            self.jira.reset_mock()
+
+            with self.subTest(size_mode):
+                get_run_size = Mock(wraps=monitor.get_run_size)
+                deletion_plan, mocks = self.check(
+                    size_mode=size_mode, get_run_size=get_run_size
+                )
+                runs = deletion_plan["runs"]
+
+                self.assertEqual(
+                    {run: x["decision"] for run, x in runs.items()},
+                    {
+                        "old_run": plan.DELETE,
+                        "young_run": plan.SKIP,
+                        "active_run": plan.SKIP,
+                    },
+                )
+
+                for mock in [
+                    self.jira.get_issue_detail,
+                    mocks["check_run_uploaded"],
+                    mocks["get_describe_data"],
+                    mocks["get_upload_manifest"],
+                    get_run_size,
+                ]:
+                    self.assertEqual(
+                        [x.args[0] for x in mock.call_args_list],
+                        ["old_run"],
+                    )
+
+                self.assertIn("active", runs["active_run"]["reason"])
+
+                # counted in the totals without a size
+                self.assertIsNone(runs["young_run"]["size"])
+                self.assertIsNone(runs["active_run"]["size"])
+                self.assertEqual(
+                    deletion_plan["totals"]["sequencers"]["seq1"]["unsized"],
+                    2,
+                )
+
+
+class TestRunCycle(unittest.TestCase):
+    def test_size_cache_per_root(self):
+        """
+        Cached sizes should only be dropped for the root a run changed
+        in, when the same run ID is in more than one root
+        """
+        watchers = {}
+
+        for genetics_dir, changed in [("/genetics", {"run1"}), ("/g2", set())]:
+            watchers[genetics_dir] = Mock(mode="inotify")
+            watchers[genetics_dir].snapshot.return_value = (
+                ["run1"],
+                ["run1"],
+                {"run1": "seq1"},
+            )
+            watchers[genetics_dir].pop_changed.return_value = changed
+
+        size_cache = {
+            "/genetics/seq1/run1": 1,
+            "/g2/seq1/run1": 2,
+            "/g2/seq1/removed_run": 3,
+        }
+
+        with patch.multiple(
+            monitor, check_for_deletion=Mock(), delete_runs=Mock()
+        ):
+            monitor.run_cycle(
+                Mock(), Mock(), watchers=watchers, size_cache=size_cache
+            )
+
+        self.assertEqual(size_cache, {"/g2/seq1/run1": 2})
+
+
+class TestVerifyRun(unittest.TestCase):
+    def test_outcomes(self):
+        """
+        Runs should only verify as ok with a valid Jira status and an
+        existing path, falling back to searching for runs without a key
+        """
+        policy = monitor.get_policy()
+        statuses = {"EBH-1": "All samples released", "EBH-2": "On hold"}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, "seq1", "run1"))
+
+            jira = Mock()
+            jira.get_issue_detail.return_value = (
+                "MYE",
+                "All samples released",
+                None,
+            )
+
+            def verify(run, key):
+                values = {"seq": "seq1", "key": key, "assay": "MYE", "size": 1}
+
+                return monitor.verify_run(
+                    run, values, [tmp_dir], statuses, jira, False, policy
+                )["outcome"]
+
+            self.assertEqual(verify("run1", "EBH-1"), "ok")
+            self.assertEqual(verify("run1", "EBH-2"), "skip")
+            self.assertEqual(verify("run2", "EBH-1"), "invalid")
+
+            jira.get_issue_detail.assert_not_called()
+            self.assertEqual(verify("run1", "Multiple"), "ok")
+            jira.get_issue_detail.assert_called_once_with("run1", False)
+
+
+class TestDeleteRuns(unittest.TestCase):
+    def delete(self, outcomes, rmtree=None, error=SystemExit):
+        """
+        Run delete_runs over runs verified with the given outcomes,
+        returning the paths removed and the decision log
+        """
+        runs = {
+            f"run{idx}": {"seq": "seq1", "key": f"EBH-{idx}"}
+            for idx in range(len(outcomes))
+        }
+
+        def verify(run, values, *args):
+            if outcomes[int(run[3:])] == "raise":
+                raise RuntimeError("Jira unavailable")
+
+            return {
+                "root": "/genetics",
+                "seq": "seq1",
+                "run_path": f"/genetics/seq1/{run}",
+                "status": "all samples released",
+                "key": values["key"],
+                "assay": "MYE",
+                "size": 1,
+                "timings": {},
+                "outcome": outcomes[int(run[3:])],
+            }
+
+        jira = Mock()
+        jira.get_issue_statuses.return_value = {}
+
+        decisions = Mock()
+
+        with patch.multiple(
+            monitor,
+            get_disk_usage=Mock(return_value=(None, {})),
+            get_monitoring_dir=Mock(return_value="/log/monitoring"),
+            DecisionLog=Mock(return_value=decisions),
+            read_or_new_pickle=Mock(return_value=runs),
+            verify_run=verify,
+            clear_memory=Mock(),
+            post_simple_message_to_slack=Mock(),
+        ), patch("shutil.rmtree", side_effect=rmtree) as mock_rmtree:
+            with self.assertRaises(error):
+                monitor.delete_runs(
+                    "pickle",
+                    ["/genetics"],
+                    "EBH",
+                    "reporter",
+                    "token",
+                    False,
+                    False,
+                    jira,
+                    delete_day=None,
+                    policy=Mock(),
+                )
+
+        return [x.args[0] for x in mock_rmtree.call_args_list], decisions
+
+    def test_stops_at_invalid_path(self):
+        """
+        No runs should be deleted after one with an invalid path
+        """
+        deleted, _ = self.delete(["ok", "invalid", "ok", "ok"])
+
+        self.assertEqual(deleted, ["/genetics/seq1/run0"])
+
+    def test_stops_at_deletion_error(self):
+        """
+        No runs should be deleted after one that fails to delete
+        """
+
+        def rmtree(path):
+            if path.endswith("run1"):
+                raise OSError("Permission denied")
+
+        deleted, _ = self.delete(["ok", "ok", "ok", "ok"], rmtree=rmtree)
+
+        self.assertEqual(
+            deleted, ["/genetics/seq1/run0", "/genetics/seq1/run1"]
+        )
+
+    def test_verification_error(self):
+        """
+        Errors verifying a run should stop deletion, still closing the
+        decision log
+        """
+        deleted, decisions = self.delete(
+            ["ok", "raise", "ok", "ok"], error=RuntimeError
+        )
+
+        self.assertEqual(deleted, ["/genetics/seq1/run0"])
+        decisions.close.assert_called_once()
+
+
+class TestVerifyUploadManifest(unittest.TestCase):
+    def test_mismatches(self):
+        """
+        Uploads should only match with every file closed and enough
+        bytes uploaded to cover the local run
+        """
+        with tempfile.TemporaryDirectory() as run_path:
+            with open(os.path.join(run_path, "file.bcl"), "wb") as f:
+                f.truncate(1000)
+
+            def verify(files, size, n_open=0):
+                with patch(
+                    "monitor.get_upload_manifest",
+                    return_value={
+                        "files": files,
+                        "bytes": size,
+                        "open": n_open,
+                    },
+                ):
+                    return monitor.verify_upload_manifest("run1", run_path)
+
+            manifest = verify(2, 900)
+
+            self.assertIsNone(manifest["mismatch"])
+            self.assertEqual(
+                (manifest["local_files"], manifest["local_bytes"]), (1, 1000)
+            )
+            self.assertEqual(verify(0, 0)["mismatch"], "no files uploaded")
+            self.assertEqual(
+                verify(2, 900, 1)["mismatch"], "1 uploaded files not closed"
+            )
+            self.assertIn("uploaded of", verify(1, 100)["mismatch"])
+
+
+class TestVerifyRunChecksums(unittest.TestCase):
+    def test_mismatches(self):
+        """
+        Runs should only verify with every uploaded file with a local
+        copy matching, and runs with no files to check should not
+        """
+        with tempfile.TemporaryDirectory() as run_path:
+            with open(os.path.join(run_path, "RunInfo.xml"), "wb") as f:
+                f.write(b"run info")
+
+            md5 = hashlib.md5(b"run info").hexdigest()
+            engine = ChecksumEngine()
+
+            def verify(uploaded):
+                with patch(
+                    "monitor.get_uploaded_parts", return_value=uploaded
+                ):
+                    return monitor.verify_run_checksums(
+                        "run1", run_path, engine
+                    )
+
+            checksums = verify(
+                {
+                    "RunInfo.xml": [(8, md5)],
+                    "run.run1.lane.all_000.tar.gz": [(10, md5)],
+                }
+            )
+
+            self.assertIsNone(checksums["mismatch"])
+            self.assertEqual(checksums["files"], 1)
+
+            checksums = verify({"RunInfo.xml": [(8, "0" * 32)]})
+
+            self.assertEqual(checksums["mismatched"], ["RunInfo.xml"])
+
+            checksums = verify({"run.run1.lane.all_000.tar.gz": [(10, md5)]})
+
+            self.assertEqual(checksums["files"], 0)
+            self.assertEqual(
+                checksums["mismatch"],
+                "no uploaded files with a local copy to verify",
+            )
+
+    def test_coverage(self):
+        """
+        Runs should not verify when the files with an uploaded copy are
+        only a small part of the run, without hashing them
+        """
+        with tempfile.TemporaryDirectory() as run_path:
+            with open(os.path.join(run_path, "RunInfo.xml"), "wb") as f:
+                f.write(b"run info")
+
+            with open(os.path.join(run_path, "1.cbcl"), "wb") as f:
+                f.truncate(1000)
+
+            engine = Mock()
+
+            with patch(
+                "monitor.get_uploaded_parts",
+                return_value={
+                    "RunInfo.xml": [(8, "0" * 32)],
+                    "run.run1.lane.all_000.tar.gz": [(1000, "0" * 32)],
+                },
+            ):
+                checksums = monitor.verify_run_checksums(
+                    "run1", run_path, engine
+                )
+
+        self.assertEqual(
+            (checksums["bytes"], checksums["local_bytes"]), (8, 1008)
+        )
+        self.assertIn("uploaded copy to verify", checksums["mismatch"])
+        engine.verify.assert_not_called()
+
+    def test_planned_runs_verified(self):
+        """
+        Runs planned for deletion without verified checksums should be
+        verified, and those already verified left as they are
+        """
+        policy = Mock(checksum_assays=["TSO500"])
+        runs = {
+            "run1": {"root": "/genetics", "seq": "seq1", "assay": "TSO500"},
+            "run2": {
+                "root": "/genetics",
+                "seq": "seq1",
+                "assay": "TSO500",
+                "checksums": {"mismatch": None},
+            },
+            "run3": {"root": "/genetics", "seq": "seq1", "assay": "MYE"},
+        }
+
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            "monitor.get_monitoring_dir", return_value=tmp_dir
+        ), patch(
+            "monitor.verify_run_checksums",
+            return_value={"mismatch": "1 files differ from their upload"},
+        ) as verify:
+            failed = monitor.verify_planned_checksums(runs, policy)
+
+        self.assertEqual(failed, {"run1": "1 files differ from their upload"})
+        self.assertEqual(verify.call_count, 1)
+        self.assertEqual(verify.call_args.args[1], "/genetics/seq1/run1")
+
+
+if __name__ == "__main__":
+    unittest.main()
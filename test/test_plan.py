@@ -0,0 +1,117 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+from bin import plan
+
+
+RUNS = {
+    "run1": {
+        "seq": "A01295a",
+        "status": "All samples released",
+        "key": "EBH-1",
+        "assay": "MYE",
+        "created": "2024-01-01",
+        "duration": 9.0,
+        "uploaded": True,
+        "project": {"describe": {"id": "project-xxx"}},
+        "old_enough": True,
+        "url": "NA",
+        "size": 1024,
+        "decision": plan.DELETE,
+        "reason": "uploaded, has 002 project and samples released",
+    },
+    "run2": {
+        "seq": "A01295a",
+        "status": "New",
+        "key": None,
+        "assay": "No Jira ticket found",
+        "created": "2024-01-01",
+        "duration": 9.0,
+        "uploaded": False,
+        "project": {},
+        "old_enough": True,
+        "url": "NA",
+        "size": 2048,
+        "decision": plan.MANUAL_REVIEW,
+        "reason": "no Jira ticket found",
+    },
+}
+
+
+class TestPlan(unittest.TestCase):
+    def test_build_plan(self):
+        """
+        Function should only count runs to delete towards the projected
+        reclaimed bytes
+        """
+        deletion_plan = plan.build_plan(
+            RUNS, (10000, 5000, 5000), dt.datetime(2024, 3, 4)
+        )
+
+        with self.subTest():
+            self.assertEqual(
+                deletion_plan["summary"]["projected_reclaimed_bytes"],
+                1024,
+                "projected reclaimed bytes wrong",
+            )
+            self.assertEqual(
+                deletion_plan["summary"]["projected_used_bytes"],
+                3976,
+                "projected used bytes wrong",
+            )
+
+    def test_get_totals(self):
+        """
+        Runs should be summed per sequencer and per assay
+        """
+        totals = plan.get_totals(RUNS)
+
+        with self.subTest():
+            self.assertEqual(
+                totals["sequencers"]["A01295a"],
+                {
+                    "bytes": 3072,
+                    "runs": 2,
+                    "unsized": 0,
+                    "oldest_run": "run1",
+                    "oldest": "2024-01-01",
+                },
+                "wrong sequencer totals",
+            )
+            self.assertEqual(
+                list(totals["assays"].keys()),
+                ["No Jira ticket found", "MYE"],
+                "assays not ordered largest first",
+            )
+
+    def test_write_read_plan(self):
+        """
+        Plans written as JSON and CSV should read back the runs to delete
+        """
+        deletion_plan = plan.build_plan(
+            RUNS, (10000, 5000, 5000), dt.datetime(2024, 3, 4)
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for ext in ["json", "csv"]:
+                plan_file = os.path.join(tmp_dir, f"plan.{ext}")
+                plan.write_plan(deletion_plan, plan_file)
+
+                to_delete = plan.get_runs_to_delete(plan.read_plan(plan_file))
+
+                with self.subTest(ext):
+                    self.assertEqual(
+                        list(to_delete.keys()), ["run1"], "wrong runs read"
+                    )
+                    self.assertEqual(
+                        to_delete["run1"]["size"], 1024, "wrong size read"
+                    )
+                    self.assertEqual(
+                        to_delete["run1"]["key"], "EBH-1", "wrong key read"
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import unittest
+
+from bin import plan
+from bin.policy import Policy, get_policy
+
+
+class TestPolicy(unittest.TestCase):
+    def setUp(self):
+        self.policy = get_policy(["MYE", "TSO500"])
+
+    def test_default_rules(self):
+        """
+        Default policy should flag the same runs for deletion as the
+        previously hard coded rules
+        """
+        cases = [
+            # uploaded, project, status, assay, expected decision
+            (True, True, "All samples released", "MYE", plan.DELETE),
+            (True, False, "All samples released", "MYE", None),
+            (False, True, "All samples released", "MYE", None),
+            (True, False, "Data cannot be processed", "MYE", plan.DELETE),
+            (True, True, "Data cannot be released", "TSO500", plan.DELETE),
+            (True, True, "All samples released", "CEN", None),
+            (True, True, "On hold", "MYE", None),
+        ]
+
+        for uploaded, project, status, assay, expected in cases:
+            match = self.policy.evaluate(uploaded, project, status, assay, 4)
+
+            with self.subTest(status=status, assay=assay):
+                self.assertEqual(match.decision, expected)
+
+    def test_reason_and_rule(self):
+        match = self.policy.evaluate(
+            True, False, "Data cannot be processed", "MYE", 4
+        )
+
+        self.assertEqual(match.rule, "data_not_processed_or_released")
+        self.assertEqual(
+            match.reason, "uploaded and Jira status DATA CANNOT BE PROCESSED"
+        )
+
+    def test_policy_file(self):
+        """
+        Rules from a policy file should apply their own assays and
+        minimum ages
+        """
+        config = {
+            "rules": [
+                {
+                    "name": "cen_released",
+                    "statuses": ["ALL SAMPLES RELEASED"],
+                    "assays": ["CEN"],
+                    "min_weeks": 8,
+                }
+            ]
+        }
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            policy_file = os.path.join(tmp_dir, "policy.json")
+
+            with open(policy_file, "w") as f:
+                json.dump(config, f)
+
+            policy = get_policy(["MYE"], path=policy_file)
+
+        released = "All samples released"
+
+        with self.subTest("too young"):
+            match = policy.evaluate(True, True, released, "CEN", 4)
+            self.assertEqual(match.decision, plan.SKIP)
+
+        with self.subTest("old enough"):
+            match = policy.evaluate(True, True, released, "CEN", 9)
+            self.assertEqual(match.decision, plan.DELETE)
+
+        with self.subTest("other assay"):
+            match = policy.evaluate(True, True, released, "MYE", 9)
+            self.assertIsNone(match.decision)
+
+    def test_retention(self):
+        """
+        Assays in the retention table should use their own weeks, others
+        the given default, and the default rules should still apply
+        """
+        policy = Policy({"retention": {"MYE": 1, "TWE": 6}}, ["MYE"])
+
+        self.assertEqual(policy.get_retention_weeks("MYE", 2), 1)
+        self.assertEqual(policy.get_retention_weeks("TWE", 2), 6)
+        self.assertEqual(policy.get_retention_weeks("CEN", 2), 2)
+        self.assertEqual(len(policy.rules), 2)
+
+        with self.assertRaises(AssertionError):
+            Policy({"retention": {"MYE": -1}})
+
+    def test_checksum_assays(self):
+        policy = Policy({"checksum_assays": ["TSO500"]}, ["MYE"])
+
+        self.assertEqual(policy.checksum_assays, {"TSO500"})
+        self.assertEqual(Policy({}).checksum_assays, set())
+
+    def test_unknown_rule_key(self):
+        with self.assertRaises(AssertionError):
+            Policy({"rules": [{"statuses": ["NEW"], "status": "NEW"}]})
+
+
+if __name__ == "__main__":
+    unittest.main()
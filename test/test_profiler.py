@@ -0,0 +1,50 @@
+import glob
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from bin import profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def test_run_with_cprofile(self):
+        """
+        Function should return the wrapped function's value and write
+        a timestamped pstats file
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch(
+                "bin.profiler.get_monitoring_dir", return_value=tmp_dir
+            ):
+                result = profiler.run_with_profiler(lambda: 42, "cprofile")
+
+            outputs = glob.glob(os.path.join(tmp_dir, "ansible_profile_*"))
+
+            with self.subTest():
+                self.assertEqual(result, 42, "profiled return value lost")
+                self.assertEqual(len(outputs), 1, "pstats file not written")
+                self.assertTrue(
+                    outputs[0].endswith(".prof"), "wrong profile extension"
+                )
+
+    def test_run_with_unknown_mode(self):
+        """
+        Function should still run the wrapped function without
+        writing anything on an unknown mode
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch(
+                "bin.profiler.get_monitoring_dir", return_value=tmp_dir
+            ):
+                result = profiler.run_with_profiler(lambda: 42, "invalid")
+
+            with self.subTest():
+                self.assertEqual(result, 42, "profiled return value lost")
+                self.assertEqual(
+                    os.listdir(tmp_dir), [], "profile written on bad mode"
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+from datetime import datetime
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from bin import run_metadata
+
+RUN_INFO = """<?xml version="1.0"?>
+<RunInfo Version="5">
+  <Run Id="240101_A01295_0001_AHXXXXXXX" Number="1">
+    <Flowcell>HXXXXXXX</Flowcell>
+    <Instrument>A01295</Instrument>
+    <Date>1/1/2024 10:30:00 AM</Date>
+    <Reads>
+      <Read Number="1" NumCycles="151" IsIndexedRead="N" />
+      <Read Number="2" NumCycles="8" IsIndexedRead="Y" />
+      <Read Number="3" NumCycles="151" IsIndexedRead="N" />
+    </Reads>
+    <FlowcellLayout LaneCount="2" SurfaceCount="2" SwathCount="4"
+      TileCount="88" />
+  </Run>
+</RunInfo>
+"""
+
+RUN_PARAMETERS = """<?xml version="1.0"?>
+<RunParameters>
+  <InstrumentType>NovaSeq</InstrumentType>
+  <RunStartDate>231231</RunStartDate>
+</RunParameters>
+"""
+
+
+class TestRunMetadata(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.run_path = self.tmp_dir.name
+
+        for name, contents in [
+            ("RunInfo.xml", RUN_INFO),
+            ("RunParameters.xml", RUN_PARAMETERS),
+        ]:
+            with open(os.path.join(self.run_path, name), "w") as f:
+                f.write(contents)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parse(self):
+        metadata = run_metadata.RunMetadataIndex().get(self.run_path)
+
+        self.assertEqual(metadata["instrument"], "A01295")
+        self.assertEqual(metadata["flowcell"], "HXXXXXXX")
+        self.assertEqual(metadata["instrument_type"], "NovaSeq")
+        self.assertEqual(metadata["cycles"], 310)
+        self.assertEqual(metadata["lanes"], 2)
+        self.assertEqual(metadata["tiles"], 704)
+        self.assertEqual(
+            run_metadata.get_run_date(metadata), datetime(2024, 1, 1, 10, 30)
+        )
+
+    def test_cached_until_modified(self):
+        """
+        Files should only be parsed again once modified, including
+        when the cache is read back from its file
+        """
+        cache = os.path.join(self.run_path, "cache.json")
+        parse = run_metadata.parse_run_info
+
+        with patch.object(
+            run_metadata, "parse_run_info", side_effect=parse
+        ) as mock:
+            index = run_metadata.RunMetadataIndex(cache)
+            index.get(self.run_path)
+            index.save()
+
+            run_metadata.RunMetadataIndex(cache).get(self.run_path)
+            self.assertEqual(mock.call_count, 1)
+
+            os.utime(os.path.join(self.run_path, "RunInfo.xml"), (1, 1))
+            run_metadata.RunMetadataIndex(cache).get(self.run_path)
+            self.assertEqual(mock.call_count, 2)
+
+    def test_no_run_info(self):
+        os.remove(os.path.join(self.run_path, "RunInfo.xml"))
+
+        metadata = run_metadata.RunMetadataIndex().get(self.run_path)
+
+        self.assertIsNone(metadata)
+        self.assertIsNone(run_metadata.get_run_date(metadata))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+import os
+import tempfile
+import unittest
+
+from bin import scan
+
+
+class TestScan(unittest.TestCase):
+    def test_iter_runs(self):
+        """
+        Only runs with a dx-streaming-upload log should be yielded, in
+        order of sequencer
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            genetics_dir = os.path.join(tmp_dir, "genetics")
+            logs_dir = os.path.join(tmp_dir, "logs")
+
+            for seq, runs in [("seq1", ["b", "a", "c"]), ("seq2", ["d"])]:
+                os.makedirs(os.path.join(logs_dir, seq))
+
+                for run in runs:
+                    os.makedirs(os.path.join(genetics_dir, seq, run))
+
+                    if run != "c":
+                        open(
+                            os.path.join(logs_dir, seq, f"run.{run}.log"), "w"
+                        ).close()
+
+            runs = list(
+                scan.iter_runs(["seq2", "seq1"], genetics_dir, logs_dir)
+            )
+
+        self.assertEqual(
+            [x[:2] for x in runs],
+            [("d", "seq2"), ("a", "seq1"), ("b", "seq1")],
+        )
+        self.assertEqual(
+            runs[0][2], os.path.join(logs_dir, "seq2", "run.d.log")
+        )
+
+    def test_get_activity(self):
+        """
+        Runs should be active if their upload log was recently modified,
+        or if recently modified without a completion marker
+        """
+        now = datetime(2024, 3, 4)
+        hour = 3600
+        old = (now - timedelta(weeks=4)).timestamp()
+        recent = (now - timedelta(hours=2)).timestamp()
+
+        with tempfile.TemporaryDirectory() as run_path:
+            with self.subTest("complete"):
+                self.assertIsNone(scan.get_activity(run_path, old, old, now))
+
+            with self.subTest("uploading"):
+                activity = scan.get_activity(run_path, old, recent, now)
+                self.assertTrue(activity.startswith("uploading"))
+
+            with self.subTest("sequencing"):
+                activity = scan.get_activity(run_path, recent, None, now)
+                self.assertTrue(activity.startswith("sequencing"))
+
+            open(os.path.join(run_path, "CopyComplete.txt"), "w").close()
+
+            with self.subTest("sequencing complete"):
+                activity = scan.get_activity(
+                    run_path, recent, recent - 48 * hour, now
+                )
+                self.assertIsNone(activity)
+
+    def test_prefetch(self):
+        """
+        Items should be passed through in order, and errors raised
+        whilst iterating re-raised in the consumer
+        """
+
+        def fail():
+            yield 1
+            raise ValueError("listing failed")
+
+        items = list(scan.prefetch(range(100), maxsize=2))
+
+        self.assertEqual(items, list(range(100)))
+
+        with self.assertRaises(ValueError):
+            list(scan.prefetch(fail()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from bin.size_estimate import SizeEstimator, get_units
+
+METADATA = {"instrument": "A01295", "cycles": 310, "lanes": 2, "tiles": 704}
+
+
+class TestSizeEstimator(unittest.TestCase):
+    def setUp(self):
+        self.units = get_units(METADATA)
+        self.estimator = SizeEstimator(
+            {
+                f"run{idx}": ("A01295", self.units, size * self.units)
+                for idx, size in enumerate([95, 100, 105])
+            }
+        )
+
+    def test_get_units(self):
+        self.assertEqual(self.units, 310 * 2 * 704)
+        self.assertIsNone(get_units({**METADATA, "tiles": None}))
+        self.assertIsNone(get_units(None))
+
+    def test_estimate(self):
+        size, error = self.estimator.estimate(METADATA)
+
+        self.assertEqual(size, 100 * self.units)
+        self.assertEqual(error, 10 * self.units)
+
+    def test_no_estimate_without_calibration(self):
+        self.assertIsNone(
+            self.estimator.estimate({**METADATA, "instrument": "M00123"})
+        )
+
+    def test_add_new_sample(self):
+        self.estimator.add("run3", METADATA, 100 * self.units)
+        self.estimator.add("run4", {**METADATA, "lanes": None}, 1)
+
+        self.assertEqual(
+            self.estimator.new_samples,
+            {"run3": ("A01295", self.units, 100 * self.units)},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+from bin import size_index
+from bin.size_index import SizeIndex
+from bin.util import get_size
+
+
+class TestSizeIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.run_path = os.path.join(self.tmp_dir.name, "run")
+
+        for lane in ["L001", "L002"]:
+            for cycle in ["C1.1", "C2.1"]:
+                os.makedirs(os.path.join(self.run_path, lane, cycle))
+                self.write(os.path.join(lane, cycle, "1.cbcl"), 10)
+
+        self.write("RunInfo.xml", 5)
+        self.write("RTAComplete.txt", 0)
+        self.age(self.run_path)
+
+        self.cache = os.path.join(self.tmp_dir.name, "index.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, size):
+        with open(os.path.join(self.run_path, name), "w") as f:
+            f.write("x" * size)
+
+    @staticmethod
+    def age(path, mtime=1e9):
+        # set every directory's mtime well before it is listed
+        for root, dirs, _ in os.walk(path):
+            for name in [".", *dirs]:
+                os.utime(os.path.join(root, name), (mtime, mtime))
+
+    def test_only_changed_directories_listed(self):
+        index = SizeIndex(self.cache)
+
+        self.assertEqual(index.get_size(self.run_path), 45)
+        self.assertEqual(index.listed, 7)
+
+        index.save()
+
+        # new cycle written to one lane
+        os.makedirs(os.path.join(self.run_path, "L001", "C3.1"))
+        self.write(os.path.join("L001", "C3.1", "1.cbcl"), 10)
+        os.utime(os.path.join(self.run_path, "L001"), (1.5e9, 1.5e9))
+        self.age(os.path.join(self.run_path, "L001", "C3.1"), 1.5e9)
+
+        index = SizeIndex(self.cache)
+
+        self.assertEqual(index.get_manifest(self.run_path), (7, 55))
+        self.assertEqual(
+            index.get_size(self.run_path), get_size(self.run_path)
+        )
+        # L001 and C3.1 listed on the first re-size, nothing on the second
+        self.assertEqual(index.listed, 2)
+
+    def test_recently_modified_directories_not_cached(self):
+        index = SizeIndex()
+        os.utime(self.run_path)
+        index.get_size(self.run_path)
+
+        self.assertIsNone(index.entries[self.run_path][size_index.MTIME])
+
+    def test_indexed_size_not_listed(self):
+        index = SizeIndex()
+
+        self.assertIsNone(index.get_indexed_size(self.run_path))
+
+        index.get_size(self.run_path)
+        self.write("RunInfo.xml", 50)
+
+        # size as last indexed, without re-stat'ing the run
+        self.assertEqual(index.get_indexed_size(self.run_path), 45)
+        self.assertEqual(index.listed, 7)
+
+    def test_incomplete_runs_not_indexed(self):
+        index = SizeIndex()
+        index.get_size(self.run_path)
+        os.remove(os.path.join(self.run_path, "RTAComplete.txt"))
+        self.age(self.run_path)
+
+        # file appended to in place, without its directory changing
+        with open(os.path.join(self.run_path, "RunInfo.xml"), "a") as f:
+            f.write("x" * 10)
+
+        self.assertEqual(index.get_size(self.run_path), 55)
+        self.assertNotIn(self.run_path, index.entries)
+        self.assertIsNone(index.get_indexed_size(self.run_path))
+
+    def test_save_drops_deleted_runs(self):
+        index = SizeIndex(self.cache)
+        index.get_size(self.run_path)
+        index.entries["/removed/run"] = [1, 1, 1, {}, 1, 1]
+        index.save()
+
+        self.assertEqual(list(SizeIndex(self.cache).entries), [self.run_path])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ import unittest
 import datetime as dt
 import pickle
 import collections
+from unittest.mock import patch
 
 from bin import util
 
@@ -233,6 +234,46 @@ class TestUtil(unittest.TestCase):
 
         self.assertEqual(memory, result, "clear_memory function faulty")
 
+    def test_slack_message_uses_run_root(self):
+        """
+        Runs should be given with the path under their own genetics root
+        """
+        data = {
+            "run1": {
+                "root": "/genetics2",
+                "seq": "A01295a",
+                "key": "EBH-1",
+                "status": "ALL SAMPLES RELEASED",
+                "assay": "MYE",
+                "size": 1024,
+                "uploaded": True,
+                "project": {"describe": {"id": "project-xxx"}},
+                "created": "2024-01-01",
+                "url": "NA",
+            }
+        }
+
+        with patch("requests.Session") as session:
+            session.return_value.post.return_value.json.return_value = {
+                "ok": True
+            }
+            util.post_message_to_slack(
+                "egg-alerts",
+                "token",
+                data,
+                False,
+                2,
+                usage=(100, 10, 90),
+                today=dt.datetime(2024, 3, 4),
+                jira_url="https://jira/",
+                action="delete",
+            )
+
+        text = session.return_value.post.call_args[0][1]["attachments"]
+
+        self.assertIn("/genetics2/A01295a/run1", text)
+        self.assertNotIn("/genetics/A01295a", text)
+
 
 if __name__ == "__main__":
     unittest.main()
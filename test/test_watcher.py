@@ -0,0 +1,199 @@
+import os
+import tempfile
+from time import sleep
+import unittest
+
+from bin.watcher import RunWatcher
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.genetics_dir = os.path.join(self.tmp_dir.name, "genetics")
+        self.logs_dir = os.path.join(self.tmp_dir.name, "logs")
+
+        os.makedirs(os.path.join(self.genetics_dir, "seq1", "run1"))
+        os.makedirs(os.path.join(self.logs_dir, "seq1"))
+        open(
+            os.path.join(self.logs_dir, "seq1", "run.run1.lane.all.log"), "w"
+        ).close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def add_run(self, run):
+        os.makedirs(os.path.join(self.genetics_dir, "seq1", run))
+        open(
+            os.path.join(self.logs_dir, "seq1", f"run.{run}.lane.all.log"),
+            "w",
+        ).close()
+
+    def check_new_run_detected(self, watcher):
+        watcher.pop_changed()
+        self.add_run("run2")
+
+        for _ in range(50):
+            if "run2" in watcher.snapshot()[1]:
+                break
+            sleep(0.05)
+
+        genetics, logs, tmp_seq = watcher.snapshot()
+
+        with self.subTest():
+            self.assertEqual(
+                sorted(genetics), ["run1", "run2"], "new run not found"
+            )
+            self.assertEqual(sorted(logs), ["run1", "run2"], "log not found")
+            self.assertEqual(tmp_seq["run2"], "seq1", "wrong sequencer")
+            self.assertEqual(
+                watcher.pop_changed(), {"run2"}, "wrong changed runs"
+            )
+
+    def test_polling(self):
+        """
+        Polling watcher should pick up new runs on rescan
+        """
+        watcher = RunWatcher(
+            ["seq1"], self.genetics_dir, self.logs_dir, use_inotify=False
+        )
+        watcher.pop_changed()
+        self.add_run("run2")
+        watcher.rescan()
+
+        self.assertEqual(watcher.mode, "polling", "wrong watcher mode")
+        self.assertEqual(
+            watcher.pop_changed(), {"run2"}, "wrong changed runs"
+        )
+
+    def test_polling_missing_sequencer(self):
+        """
+        Sequencer directories not present should have no runs rather
+        than stopping the watcher
+        """
+        watcher = RunWatcher(
+            ["seq1", "seq2"],
+            self.genetics_dir,
+            self.logs_dir,
+            use_inotify=False,
+        )
+        watcher.rescan()
+
+        self.assertEqual(watcher.snapshot()[2], {"run1": "seq1"})
+
+    def test_inotify_nested_change(self):
+        """
+        Files written deep within a run should mark it changed,
+        including within directories created after watching started
+        """
+        watcher = RunWatcher(["seq1"], self.genetics_dir, self.logs_dir)
+        watcher.start()
+
+        try:
+            if watcher.mode != "inotify":
+                self.skipTest("inotify unavailable")
+
+            lane = os.path.join(self.genetics_dir, "seq1", "run1", "L001")
+            os.makedirs(lane)
+
+            for _ in range(50):
+                if len(watcher.run_watches["run1"]) == 2:
+                    break
+                sleep(0.05)
+
+            watcher.pop_changed()
+            os.makedirs(os.path.join(lane, "C1.1"))
+
+            for _ in range(50):
+                changed = watcher.pop_changed()
+
+                if changed:
+                    break
+                sleep(0.05)
+
+            self.assertEqual(changed, {"run1"})
+        finally:
+            watcher.stop()
+
+    def test_inotify_finished_run(self):
+        """
+        Finished runs should only have their top level watched, and runs
+        stop being watched within once they finish
+        """
+        run_path = os.path.join(self.genetics_dir, "seq1", "run1")
+        os.makedirs(os.path.join(run_path, "L001", "C1.1"))
+        open(os.path.join(run_path, "CopyComplete.txt"), "w").close()
+        self.add_run("run2")
+        os.makedirs(os.path.join(self.genetics_dir, "seq1", "run2", "L001"))
+
+        watcher = RunWatcher(["seq1"], self.genetics_dir, self.logs_dir)
+        watcher.start()
+
+        try:
+            if watcher.mode != "inotify":
+                self.skipTest("inotify unavailable")
+
+            self.assertEqual(len(watcher.run_watches["run1"]), 1)
+            self.assertEqual(len(watcher.run_watches["run2"]), 2)
+
+            open(
+                os.path.join(
+                    self.genetics_dir, "seq1", "run2", "RTAComplete.txt"
+                ),
+                "w",
+            ).close()
+
+            for _ in range(50):
+                if len(watcher.run_watches["run2"]) == 1:
+                    break
+                sleep(0.05)
+
+            self.assertEqual(len(watcher.run_watches["run2"]), 1)
+            self.assertNotIn("run2", watcher.recursive)
+        finally:
+            watcher.stop()
+
+    def test_inotify_missing_sequencer(self):
+        """
+        Sequencer directories created after watching started should be
+        watched once retried
+        """
+        watcher = RunWatcher(
+            ["seq1", "seq2"], self.genetics_dir, self.logs_dir
+        )
+        watcher.start_inotify()
+
+        try:
+            if watcher.mode != "inotify":
+                self.skipTest("inotify unavailable")
+
+            self.assertEqual(
+                watcher.missing, {("genetics", "seq2"), ("logs", "seq2")}
+            )
+
+            os.makedirs(os.path.join(self.genetics_dir, "seq2", "run3"))
+            watcher.retry_missing()
+
+            self.assertEqual(watcher.missing, {("logs", "seq2")})
+            self.assertEqual(watcher.snapshot()[2]["run3"], "seq2")
+            self.assertIn("run3", watcher.run_watches)
+        finally:
+            watcher.stop()
+
+    def test_inotify(self):
+        """
+        inotify watcher should pick up new runs and logs as created
+        """
+        watcher = RunWatcher(["seq1"], self.genetics_dir, self.logs_dir)
+        watcher.start()
+
+        try:
+            if watcher.mode != "inotify":
+                self.skipTest("inotify unavailable")
+
+            self.check_new_run_detected(watcher)
+        finally:
+            watcher.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()